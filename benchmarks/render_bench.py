@@ -0,0 +1,115 @@
+"""Micro-benchmark: cost of rendering task lists, per 1,000 tasks.
+
+Compares the previous string-concatenation renderer (kept here as a
+reference) with the rendering package, for message text and for text plus
+the page keyboard (the same keyboard builder in both columns; its pydantic
+buttons dominate the pending view). The rendering column also pays for
+HTML escaping, which the old renderer skipped. Run from the repository root:
+
+    python -m benchmarks.render_bench [--tasks 1000] [--repeat 50]
+"""
+import argparse
+import timeit
+from collections import namedtuple
+from datetime import datetime, timedelta
+from database.queries import PAGE_SIZES, VIEW_PENDING, VIEW_COMPLETED
+from keyboard import get_task_page_keyboard
+from rendering import render_completed_tasks, render_pending_tasks
+
+Row = namedtuple("Row", "id title description created_at completed_at due_at")
+
+# Page cursor carried by the keyboard buttons
+CURSOR = (datetime(2024, 1, 1), 1)
+
+
+def make_rows(count: int):
+    started = datetime(2024, 1, 1)
+    return [
+        Row(
+            id=i,
+            title=f"Task {i} <with> some & markup",
+            description=("Description of the task " * 10) if i % 2 else None,
+            created_at=started + timedelta(minutes=i),
+            completed_at=started + timedelta(hours=i),
+            due_at=None
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_pending(rows, total):
+    text = f"📋 <b>Your Pending Tasks ({total}):</b>\n\n"
+    for i, task in enumerate(rows, 1):
+        text += f"{i}. 📝 <b>{task.title}</b>\n"
+        if task.description:
+            desc = task.description[:150]
+            if len(task.description) > 150:
+                desc += "..."
+            text += f"   📋 {desc}\n"
+        text += f"   🕐 Created: {task.created_at.strftime('%Y-%m-%d %H:%M')}\n\n"
+    return text
+
+
+def legacy_completed(rows, total):
+    text = f"✅ <b>Completed Tasks ({total}):</b>\n\n"
+    for i, task in enumerate(rows, 1):
+        text += f"{i}. <b>{task.title}</b>\n"
+        if task.description:
+            desc = task.description[:100]
+            if len(task.description) > 100:
+                desc += "..."
+            text += f"   📋 {desc}\n"
+        if task.completed_at:
+            text += f"   ✅ Completed: {task.completed_at.strftime('%Y-%m-%d %H:%M')}\n"
+        text += "\n"
+    return text
+
+
+def paged(rows, view):
+    size = PAGE_SIZES[view]
+    return [rows[i:i + size] for i in range(0, len(rows), size)]
+
+
+def render_pages(pages, view, render_text, with_keyboard):
+    for page in pages:
+        render_text(page, len(page))
+        if with_keyboard:
+            get_task_page_keyboard(
+                view=view,
+                task_ids=[task.id for task in page],
+                anchor=CURSOR if view == VIEW_PENDING else None,
+                prev_cursor=CURSOR,
+                next_cursor=(CURSOR[0], 9)
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = make_rows(args.tasks)
+    cases = [
+        ("pending", VIEW_PENDING, legacy_pending, render_pending_tasks),
+        ("completed", VIEW_COMPLETED, legacy_completed, render_completed_tasks),
+    ]
+
+    print(f"{'case':<28}{'legacy':>12}{'rendering':>12}   (ms per 1,000 tasks)")
+    for name, view, legacy, current in cases:
+        pages = paged(rows, view)
+        for with_keyboard in (False, True):
+            label = f"{name} text{' + keyboard' if with_keyboard else ''}"
+            timings = []
+            for render_text in (legacy, current):
+                seconds = min(timeit.repeat(
+                    lambda: render_pages(pages, view, render_text, with_keyboard),
+                    number=1,
+                    repeat=args.repeat
+                ))
+                timings.append(seconds * 1000 * 1000 / args.tasks)
+            print(f"{label:<28}{timings[0]:>12.2f}{timings[1]:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,157 @@
 import asyncio
 import logging
-import sys
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
-from config import BOT_TOKEN
-from database.connection import init_db
-from handlers import commands_router, messages_router, callbacks_router
-from middleware import LoggingMiddleware
-
-# Configure logging to console
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
+from config import (
+    BOT_TOKEN, BOT_MODE, FSM_STORAGE, FSM_STATE_TTL, FSM_CACHE_TTL, FSM_CACHE_SIZE,
+    WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_MAX_CONNECTIONS,
+    WORKER_PROCESSES, WORKER_QUEUE_SIZE, WORKER_STATS_INTERVAL,
+    UPDATE_CONCURRENCY, UPDATE_MAX_PENDING, UPDATE_MAX_PENDING_PER_USER,
+    THROTTLE_LIST_RATE, THROTTLE_LIST_BURST, THROTTLE_COMMAND_RATE, THROTTLE_COMMAND_BURST,
+    THROTTLE_MESSAGE_RATE, THROTTLE_MESSAGE_BURST, THROTTLE_CALLBACK_RATE, THROTTLE_CALLBACK_BURST,
+    DUPLICATE_CALLBACK_WINDOW,
+    OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_GROUP_RATE, OUTBOUND_MAX_RETRIES,
+    USER_TRACKING_FLUSH_INTERVAL, ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL,
+    LOG_SAMPLE_RATE, METRICS_HOST, METRICS_PORT, N_PLUS_ONE_THRESHOLD,
+    REMINDER_WINDOW, REMINDER_MAX_LOADED, REMINDER_BATCH_SIZE, REMINDER_SENDERS,
+    BROADCAST_RESUME_INTERVAL
 )
+from database.connection import init_db, engine, read_engine
+from database.fsm_storage import DatabaseStorage
+from database.task_cache import start_stats_reporter, stop_stats_reporter
+from database.write_behind import write_behind
+from handlers import commands_router, messages_router, callbacks_router, transfer_router, admin_router
+from jobs import run_archiver, start_reminders, stop_reminders, run_broadcast_resumer, stop_broadcasts
+from middleware import (
+    LoggingMiddleware, OutboundRateLimiter, ThrottlingMiddleware, UpdateScheduler, UserTrackingMiddleware
+)
+from middleware.throttling import CLASS_LIST, CLASS_COMMAND, CLASS_MESSAGE, CLASS_CALLBACK
+from server import run_webhook, start_metrics_server
+from utils import setup_logging
+from workers import Supervisor
+
+# Configure logging to console, written from a background thread
+setup_logging('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+def create_bot() -> Bot:
+    """Create the Bot instance used for all outgoing API calls"""
+    bot = Bot(
+        token=BOT_TOKEN,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+    # Every worker process sends with its own bot, so split the global budget
+    bot.session.middleware(OutboundRateLimiter(
+        global_rate=OUTBOUND_GLOBAL_RATE / max(WORKER_PROCESSES, 1),
+        chat_rate=OUTBOUND_CHAT_RATE,
+        group_rate=OUTBOUND_GROUP_RATE,
+        max_retries=OUTBOUND_MAX_RETRIES
+    ))
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    """Create the dispatcher with FSM storage, middleware and routers"""
+    if FSM_STORAGE == "memory":
+        storage = MemoryStorage()
+    else:
+        storage = DatabaseStorage(
+            engine,
+            state_ttl=FSM_STATE_TTL,
+            cache_ttl=FSM_CACHE_TTL,
+            cache_size=FSM_CACHE_SIZE,
+            read_engine=read_engine
+        )
+    # The FSM middleware is registered by hand below, after the scheduler
+    dp = Dispatcher(storage=storage, disable_fsm=True)
+
+    # Floods are dropped first, before they wait for a handler or read state
+    dp.update.outer_middleware(ThrottlingMiddleware(
+        limits={
+            CLASS_LIST: (THROTTLE_LIST_RATE, THROTTLE_LIST_BURST),
+            CLASS_COMMAND: (THROTTLE_COMMAND_RATE, THROTTLE_COMMAND_BURST),
+            CLASS_MESSAGE: (THROTTLE_MESSAGE_RATE, THROTTLE_MESSAGE_BURST),
+            CLASS_CALLBACK: (THROTTLE_CALLBACK_RATE, THROTTLE_CALLBACK_BURST),
+        },
+        duplicate_window=DUPLICATE_CALLBACK_WINDOW
+    ))
+    # A user's state is read only once their previous update is done
+    scheduler = UpdateScheduler(
+        max_concurrency=UPDATE_CONCURRENCY,
+        max_pending=UPDATE_MAX_PENDING,
+        max_pending_per_user=UPDATE_MAX_PENDING_PER_USER
+    )
+    dp.update.outer_middleware(scheduler)
+    # The webhook server answers 503 instead of letting the scheduler drop updates
+    dp["update_scheduler"] = scheduler
+    dp.update.outer_middleware(dp.fsm)
+
+    user_tracking = UserTrackingMiddleware(flush_interval=USER_TRACKING_FLUSH_INTERVAL)
+    dp.update.outer_middleware(user_tracking)
+    dp.shutdown.register(user_tracking.close)
+    dp.startup.register(start_stats_reporter)
+    dp.shutdown.register(stop_stats_reporter)
+    if write_behind is not None:
+        dp.shutdown.register(write_behind.close)
+
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware(LoggingMiddleware(
+            sample_rate=LOG_SAMPLE_RATE,
+            n_plus_one_threshold=N_PLUS_ONE_THRESHOLD
+        ))
+
+    dp.include_router(commands_router)
+    dp.include_router(transfer_router)
+    dp.include_router(admin_router)
+    dp.include_router(messages_router)
+    dp.include_router(callbacks_router)
+    return dp
+
+
+async def run_polling(dp: Dispatcher, bot: Bot):
+    """Receive updates with getUpdates long polling"""
+    # A webhook left over from webhook mode would make getUpdates fail
+    await bot.delete_webhook()
+    # Stop fetching while the scheduler's backlog is full instead of dropping updates
+    await dp.start_polling(
+        bot,
+        allowed_updates=dp.resolve_used_update_types(),
+        tasks_concurrency_limit=UPDATE_CONCURRENCY + UPDATE_MAX_PENDING
+    )
+
+
+async def start_webhook(dp: Dispatcher, bot: Bot):
+    """Receive updates on the embedded aiohttp webhook server"""
+    await run_webhook(
+        dp,
+        bot,
+        host=WEBHOOK_HOST,
+        port=WEBHOOK_PORT,
+        path=WEBHOOK_PATH,
+        base_url=WEBHOOK_BASE_URL,
+        secret_token=WEBHOOK_SECRET,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        is_busy=dp["update_scheduler"].is_busy
+    )
+
+
+async def start_supervisor(bot: Bot):
+    """Poll Telegram here and hand updates to user-sharded worker processes"""
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+    supervisor = Supervisor(
+        bot,
+        workers=WORKER_PROCESSES,
+        allowed_updates=allowed_updates,
+        queue_size=WORKER_QUEUE_SIZE,
+        stats_interval=WORKER_STATS_INTERVAL
+    )
+    await supervisor.run()
+
+
 async def main():
     logger.info("=" * 60)
     logger.info("Starting Task Tracker Bot...")
@@ -33,39 +165,64 @@ async def main():
         logger.error(f"✗ Failed to initialize database: {e}")
         return
 
+    archiver = None
+    if ARCHIVE_AFTER_DAYS > 0:
+        # Runs once here, also when updates are handled by worker processes
+        archiver = asyncio.create_task(
+            run_archiver(ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL)
+        )
+
+    metrics_server = None
+    if METRICS_PORT > 0:
+        metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+
+    bot = None
+    resumer = None
     try:
         logger.info("Creating bot instance...")
-        bot = Bot(
-            token=BOT_TOKEN,
-            default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-        )
-        
-        logger.info("Creating dispatcher with FSM storage...")
-        storage = MemoryStorage()
-        dp = Dispatcher(storage=storage)
+        bot = create_bot()
 
-        logger.info("Setting up middleware...")
-        dp.message.middleware(LoggingMiddleware())
-        dp.callback_query.middleware(LoggingMiddleware())
+        # Broadcasts interrupted by a crash or restart continue from here
+        resumer = asyncio.create_task(run_broadcast_resumer(bot, BROADCAST_RESUME_INTERVAL))
+        
+        if WORKER_PROCESSES > 0:
+            logger.info(f"✓ Starting supervisor with {WORKER_PROCESSES} worker processes")
+            logger.info("✓ Press Ctrl+C to stop the bot")
+            await start_supervisor(bot)
+            return
+        
+        logger.info("Creating dispatcher with FSM storage, middleware and handlers...")
+        dp = create_dispatcher()
 
-        logger.info("Registering handlers...")
-        dp.include_router(commands_router)
-        dp.include_router(messages_router)
-        dp.include_router(callbacks_router)
+        if REMINDER_WINDOW > 0:
+            # Worker processes run their own, for their share of the users
+            start_reminders(bot, REMINDER_WINDOW, REMINDER_MAX_LOADED, REMINDER_BATCH_SIZE, REMINDER_SENDERS)
 
         logger.info("=" * 60)
-        logger.info("✓ Bot started successfully!")
+        logger.info(f"✓ Bot started successfully in {BOT_MODE} mode!")
         logger.info("✓ Waiting for messages...")
         logger.info("✓ Press Ctrl+C to stop the bot")
         logger.info("=" * 60)
         
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if BOT_MODE == "webhook":
+            await start_webhook(dp, bot)
+        else:
+            await run_polling(dp, bot)
         
     except Exception as e:
         logger.error(f"✗ Error during bot execution: {e}", exc_info=True)
     finally:
+        if archiver is not None:
+            archiver.cancel()
+        await stop_reminders()
+        if resumer is not None:
+            resumer.cancel()
+        await stop_broadcasts()
+        if metrics_server is not None:
+            await metrics_server.cleanup()
         logger.info("Closing bot session...")
-        await bot.session.close()
+        if bot is not None:
+            await bot.session.close()
         logger.info("Bot stopped.")
 
 if __name__ == "__main__":
@@ -76,4 +233,4 @@ if __name__ == "__main__":
         logger.info("Bot stopped by user (Ctrl+C)")
         logger.info("=" * 60)
     except Exception as e:
-        logger.error(f"✗ Unexpected error: {e}", exc_info=True)
\ No newline at end of file
+        logger.error(f"✗ Unexpected error: {e}", exc_info=True)
@@ -6,8 +6,172 @@ load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# FSM storage: "database" (persistent, shared between processes) or "memory"
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'database')
+# Seconds an untouched /add draft is kept before it expires
+FSM_STATE_TTL = int(os.getenv('FSM_STATE_TTL', '86400'))
+FSM_CACHE_SIZE = int(os.getenv('FSM_CACHE_SIZE', '10000'))
+
+# Update delivery: "polling" (getUpdates long polling) or "webhook"
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Public HTTPS base URL Telegram should call; leave empty to not register the webhook
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+# Sent by Telegram with every update; required when the webhook is registered
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or None
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+# Parallel connections Telegram may open to the webhook; how many updates run
+# at once and may wait is set by UPDATE_CONCURRENCY / UPDATE_MAX_PENDING
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Worker processes behind a supervisor; 0 runs everything in this process
+WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '0'))
+# Updates buffered per worker before the supervisor stops reading
+WORKER_QUEUE_SIZE = int(os.getenv('WORKER_QUEUE_SIZE', '1000'))
+# Seconds between per-worker throughput reports
+WORKER_STATS_INTERVAL = float(os.getenv('WORKER_STATS_INTERVAL', '30'))
+
+# Seconds a cached FSM record is trusted without re-reading the database; only
+# safe when a single process handles all updates of a user, so off by default
+# and on for the user-sharded worker processes
+FSM_CACHE_TTL = int(os.getenv('FSM_CACHE_TTL', '300' if WORKER_PROCESSES > 0 else '0'))
+
+# Update handlers running at once per process; keep it below the database pool
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW) so background jobs still get connections.
+# Updates of one user always run one at a time, in order
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '20'))
+# Updates allowed to wait for a handler, in total and per user; more are dropped
+# (in webhook mode the total limit answers 503 instead, so Telegram retries)
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', '1000'))
+UPDATE_MAX_PENDING_PER_USER = int(os.getenv('UPDATE_MAX_PENDING_PER_USER', '10'))
+
+# Incoming updates each user may send, as a rate per second and a burst, per
+# class: list (/list, /completed, /search, /stats, /export), other commands,
+# other messages and button presses. A rate of 0 turns the limit off
+THROTTLE_LIST_RATE = float(os.getenv('THROTTLE_LIST_RATE', '0.5'))
+THROTTLE_LIST_BURST = float(os.getenv('THROTTLE_LIST_BURST', '5'))
+THROTTLE_COMMAND_RATE = float(os.getenv('THROTTLE_COMMAND_RATE', '1'))
+THROTTLE_COMMAND_BURST = float(os.getenv('THROTTLE_COMMAND_BURST', '10'))
+THROTTLE_MESSAGE_RATE = float(os.getenv('THROTTLE_MESSAGE_RATE', '2'))
+THROTTLE_MESSAGE_BURST = float(os.getenv('THROTTLE_MESSAGE_BURST', '20'))
+THROTTLE_CALLBACK_RATE = float(os.getenv('THROTTLE_CALLBACK_RATE', '3'))
+THROTTLE_CALLBACK_BURST = float(os.getenv('THROTTLE_CALLBACK_BURST', '15'))
+# Seconds within which the same button pressed again on the same message is ignored; 0 disables
+DUPLICATE_CALLBACK_WINDOW = float(os.getenv('DUPLICATE_CALLBACK_WINDOW', '1'))
+
+# Outgoing message pacing (Telegram allows ~30 msg/s overall, ~1 msg/s per chat
+# and 20 msg/min per group); the global rate is shared by all worker processes
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))
+OUTBOUND_GROUP_RATE = float(os.getenv('OUTBOUND_GROUP_RATE', str(20 / 60)))
+# Times a send is retried after TelegramRetryAfter before the error reaches the handler
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3'))
+
+# Users remembered as registered, so repeated /start skips the database
+KNOWN_USERS_CACHE_SIZE = int(os.getenv('KNOWN_USERS_CACHE_SIZE', '100000'))
+# Seconds between batched writes of users' last_seen / username
+USER_TRACKING_FLUSH_INTERVAL = float(os.getenv('USER_TRACKING_FLUSH_INTERVAL', '5'))
+
+# Cache of task list pages and /stats per user (entries, seconds); size 0 disables it
+TASK_CACHE_SIZE = int(os.getenv('TASK_CACHE_SIZE', '50000'))
+TASK_CACHE_TTL = float(os.getenv('TASK_CACHE_TTL', '300'))
+TASK_CACHE_STATS_INTERVAL = float(os.getenv('TASK_CACHE_STATS_INTERVAL', '300'))
+
+# Completed tasks older than this many days move to tasks_archive; 0 disables
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '1000'))
+# Seconds between archiver runs
+ARCHIVE_INTERVAL = float(os.getenv('ARCHIVE_INTERVAL', '3600'))
+
+# Fraction of incoming updates written to the log (errors are always logged)
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '1.0'))
+# Local Prometheus /metrics endpoint; 0 disables it. Worker N listens on
+# METRICS_PORT + 1 + N
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
+
+# Statements slower than this are logged with their parameters; 0 disables
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+# Identical statements executed this often while handling one update are
+# reported as a likely N+1 pattern; 0 disables
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', '3'))
+
+# /import: largest accepted upload (Telegram bots can download up to 20 MB),
+# tasks accepted per file and rows inserted per transaction
+IMPORT_MAX_FILE_SIZE = int(os.getenv('IMPORT_MAX_FILE_SIZE', str(20 * 1024 * 1024)))
+IMPORT_MAX_TASKS = int(os.getenv('IMPORT_MAX_TASKS', '10000'))
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+# /export: rows fetched from the server-side cursor at a time
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+# Connection pool per process (PostgreSQL). A pool size of 0 opens a fresh
+# connection per session instead, for running many processes behind pgbouncer
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+# Seconds to wait for a free pooled connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Seconds after which a pooled connection is replaced; -1 keeps connections forever
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+# Test connections with a round trip on checkout (survives database restarts)
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'false').lower() in ('1', 'true', 'yes')
+# Compiled SQL kept by SQLAlchemy, and prepared statements asyncpg keeps per connection
+DB_QUERY_CACHE_SIZE = int(os.getenv('DB_QUERY_CACHE_SIZE', '500'))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '100'))
+# asyncpg connect and per-statement timeouts in seconds; 0 disables the statement timeout
+DB_CONNECT_TIMEOUT = float(os.getenv('DB_CONNECT_TIMEOUT', '10'))
+DB_COMMAND_TIMEOUT = float(os.getenv('DB_COMMAND_TIMEOUT', '30'))
+# DATABASE_URL points at pgbouncer in transaction pooling mode: no prepared
+# statement reuse. Migrations take a session-level advisory lock, so they
+# run over DIRECT_DATABASE_URL (the database itself) when it is set
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'false').lower() in ('1', 'true', 'yes')
+DIRECT_DATABASE_URL = os.getenv('DIRECT_DATABASE_URL', '')
+
+# Embedded SQLite (DATABASE_URL=sqlite+aiosqlite:///path/to/bot.db): reader
+# connections next to the single writer, and how long a locked database is
+# retried before failing
+SQLITE_READ_POOL_SIZE = int(os.getenv('SQLITE_READ_POOL_SIZE', '8'))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+# Due dates typed by users (and shown back to them) are in this timezone
+BOT_TIMEZONE = os.getenv('BOT_TIMEZONE', 'UTC')
+# Minutes before the due time a reminder is sent
+REMINDER_LEAD_MINUTES = int(os.getenv('REMINDER_LEAD_MINUTES', '15'))
+# Seconds of upcoming reminders loaded into memory at a time; 0 disables reminders
+REMINDER_WINDOW = float(os.getenv('REMINDER_WINDOW', '3600'))
+# Most reminders held in memory per process (the window shrinks to fit), rows
+# loaded / claimed per statement, and concurrent sends
+REMINDER_MAX_LOADED = int(os.getenv('REMINDER_MAX_LOADED', '100000'))
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '500'))
+REMINDER_SENDERS = int(os.getenv('REMINDER_SENDERS', '4'))
+
+# Telegram user ids allowed to use admin commands such as /broadcast
+ADMIN_IDS = frozenset(int(user_id) for user_id in os.getenv('ADMIN_IDS', '').replace(',', ' ').split())
+# /broadcast: messages per second (keep below OUTBOUND_GLOBAL_RATE to leave room
+# for replies), users sent to between progress saves, and seconds between
+# progress message updates
+BROADCAST_RATE = float(os.getenv('BROADCAST_RATE', '25'))
+BROADCAST_BATCH_SIZE = int(os.getenv('BROADCAST_BATCH_SIZE', '100'))
+BROADCAST_PROGRESS_INTERVAL = float(os.getenv('BROADCAST_PROGRESS_INTERVAL', '5'))
+# A running broadcast without progress for this many seconds lost its process
+# and is resumed; checked every BROADCAST_RESUME_INTERVAL seconds
+BROADCAST_STALE_AFTER = float(os.getenv('BROADCAST_STALE_AFTER', '120'))
+BROADCAST_RESUME_INTERVAL = float(os.getenv('BROADCAST_RESUME_INTERVAL', '60'))
+
+# Write-behind: task creates and completions are collected for this many
+# milliseconds and committed together in one transaction; 0 writes each
+# one directly. A full batch is written right away
+WRITE_BEHIND_DELAY_MS = float(os.getenv('WRITE_BEHIND_DELAY_MS', '0'))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv('WRITE_BEHIND_MAX_BATCH', '200'))
+
 # Validate required settings
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN not found in .env file")
 if not DATABASE_URL:
-    raise ValueError("DATABASE_URL not found in .env file")
\ No newline at end of file
+    raise ValueError("DATABASE_URL not found in .env file")
+if BOT_MODE not in ('polling', 'webhook'):
+    raise ValueError(f"BOT_MODE must be 'polling' or 'webhook', got '{BOT_MODE}'")
+if WEBHOOK_BASE_URL and not WEBHOOK_SECRET:
+    raise ValueError("WEBHOOK_SECRET is required when WEBHOOK_BASE_URL is set")
+if WORKER_PROCESSES > 0 and BOT_MODE != 'polling':
+    raise ValueError("WORKER_PROCESSES requires BOT_MODE=polling")
@@ -1,39 +1,169 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from database.models import Base
-from config import DATABASE_URL
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql.dml import UpdateBase
+from database.instrumentation import InstrumentedPool, instrument_engine
+from database.migrations import migrate
+from config import (
+    DATABASE_URL, DIRECT_DATABASE_URL, SLOW_QUERY_MS,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_QUERY_CACHE_SIZE, DB_STATEMENT_CACHE_SIZE, DB_CONNECT_TIMEOUT, DB_COMMAND_TIMEOUT,
+    DB_PGBOUNCER, SQLITE_READ_POOL_SIZE, SQLITE_BUSY_TIMEOUT_MS
+)
+from uuid import uuid4
 import logging
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict
 
 logger = logging.getLogger(__name__)
 
-# Create async engine
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,  # Set to True to see SQL queries in console
-    pool_size=10,
-    max_overflow=20
+_url = make_url(DATABASE_URL)
+IS_SQLITE = _url.get_backend_name() == "sqlite"
+# In-memory databases are private to their connection - no reader pool there
+_IN_MEMORY = IS_SQLITE and _url.database in (None, "", ":memory:")
+
+# SQLite settings applied to every new connection. WAL lets readers run
+# while a write is in progress; NORMAL sync is durable across application
+# crashes and only fsyncs at checkpoints.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",  # KiB
+    "PRAGMA mmap_size=268435456",
 )
 
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+def _connect_args() -> Dict[str, Any]:
+    """asyncpg driver settings; other drivers take none"""
+    if _url.get_driver_name() != "asyncpg":
+        return {}
+
+    args = {
+        "timeout": DB_CONNECT_TIMEOUT,
+        "command_timeout": DB_COMMAND_TIMEOUT or None,
+        # Statements SQLAlchemy prepares once per connection and reuses
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+    if DB_PGBOUNCER:
+        # pgbouncer in transaction mode runs every transaction on whatever
+        # server connection is free: a statement prepared on one is missing
+        # on the next, and numbered statement names collide between clients
+        args.update(
+            prepared_statement_cache_size=0,
+            statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+    return args
+
+
+def _create_engine(pool_size: int, max_overflow: int) -> AsyncEngine:
+    if pool_size > 0:
+        pool_options = {
+            "poolclass": InstrumentedPool,  # Accounts pool wait time per update
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+        }
+    else:
+        # Every session opens its own connection - pgbouncer does the pooling
+        pool_options = {"poolclass": NullPool}
+
+    new_engine = create_async_engine(
+        DATABASE_URL,
+        echo=False,  # Set to True to see SQL queries in console
+        pool_pre_ping=DB_POOL_PRE_PING,
+        query_cache_size=DB_QUERY_CACHE_SIZE,
+        connect_args=_connect_args(),
+        **pool_options
+    )
+    if IS_SQLITE:
+        event.listen(new_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    # Per-update query counts and timings, plus the slow-query log
+    instrument_engine(new_engine.sync_engine, slow_query_ms=SLOW_QUERY_MS)
+    return new_engine
+
+
+if IS_SQLITE:
+    # SQLite has a single writer. One pooled writer connection turns
+    # concurrent writes into an async queue instead of busy-waiting on the
+    # database lock, while reads use their own pool and never wait for it.
+    engine = _create_engine(pool_size=1, max_overflow=0)
+    read_engine = engine if _IN_MEMORY else _create_engine(pool_size=SQLITE_READ_POOL_SIZE, max_overflow=0)
+else:
+    engine = _create_engine(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    read_engine = engine
+
+
+class RoutingSession(Session):
+    """Session that runs writes on `engine` and plain reads on `read_engine`
+
+    Once a transaction has written (or locked rows with FOR UPDATE) it stays
+    on the writer until it ends, so it reads its own changes.
+    """
+
+    _writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self._writing
+            or self._flushing
+            or isinstance(clause, UpdateBase)
+            or getattr(clause, "_for_update_arg", None) is not None
+        ):
+            self._writing = True
+            return engine.sync_engine
+        return read_engine.sync_engine
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _reset_routing(session, transaction):
+    if transaction.parent is None:
+        session._writing = False
+
+
 # Create session factory
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession if read_engine is not engine else Session,
     expire_on_commit=False
 )
 
 
 async def init_db():
-    """Initialize database - create all tables"""
+    """Initialize database - create tables and apply pending migrations
+
+    Behind pgbouncer migrations run over DIRECT_DATABASE_URL, because the
+    advisory lock they hold belongs to one server session.
+    """
+    migration_engine = engine
+    if DIRECT_DATABASE_URL:
+        migration_engine = create_async_engine(DIRECT_DATABASE_URL, poolclass=NullPool)
+
     try:
-        async with engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+        await migrate(migration_engine)
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
         raise
+    finally:
+        if migration_engine is not engine:
+            await migration_engine.dispose()
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     """Get database session"""
     async with async_session_maker() as session:
-        yield session
\ No newline at end of file
+        yield session
@@ -0,0 +1,13 @@
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def get_insert(bind):
+    """Dialect-specific `insert` construct supporting ON CONFLICT clauses
+
+    `bind` is anything with a `.dialect` or `.bind.dialect` - an engine,
+    connection or session.
+    """
+    dialect = getattr(bind, "dialect", None) or bind.bind.dialect
+    if dialect.name == "sqlite":
+        return sqlite.insert
+    return postgresql.insert
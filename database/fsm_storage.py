@@ -0,0 +1,182 @@
+"""aiogram FSM storage persisted in the bot's own database.
+
+State survives restarts and can be shared by several bot processes. Reads
+can be served from an in-process write-through cache, so the state filters
+that run on every incoming message do not touch the database.
+
+The cache is off by default (`cache_ttl` 0): with several processes another
+one may change a record behind this one's back. Turn it on only when every
+update of a user is handled by one process; a cached entry is then trusted
+for `cache_ttl` seconds.
+
+Drafts that are not touched for `state_ttl` seconds expire and read back
+as empty; expired rows are purged in the background.
+"""
+import asyncio
+import time
+from copy import deepcopy
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, NamedTuple, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import bindparam, delete, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+from database.dialects import get_insert
+from database.models import FSMRecord
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Built once - the cache-miss read runs for most /add steps
+_LOAD_QUERY = (
+    select(FSMRecord.state, FSMRecord.data, FSMRecord.expires_at)
+    .where(FSMRecord.key == bindparam("key"))
+)
+
+
+class _Entry(NamedTuple):
+    state: Optional[str]
+    data: Dict[str, Any]
+    cached_at: float
+
+
+class DatabaseStorage(BaseStorage):
+    """FSM storage backed by the fsm_states table with a local cache
+
+    Cache misses are read through `read_engine` when given (the SQLite
+    reader pool); writes always go through `engine`.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        state_ttl: int = 24 * 60 * 60,
+        cache_ttl: int = 0,
+        cache_size: int = 10000,
+        purge_interval: int = 10 * 60,
+        key_builder: Optional[KeyBuilder] = None,
+        read_engine: Optional[AsyncEngine] = None
+    ):
+        self.engine = engine
+        self.read_engine = read_engine or engine
+        self.state_ttl = timedelta(seconds=state_ttl)
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.purge_interval = purge_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._last_purge = time.monotonic()
+        self._purge_task: Optional[asyncio.Task] = None
+
+    # -- cache ---------------------------------------------------------------
+
+    def _cached(self, key: str) -> Optional[_Entry]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.cached_at > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _remember(self, key: str, state: Optional[str], data: Dict[str, Any]) -> _Entry:
+        entry = _Entry(state=state, data=data, cached_at=time.monotonic())
+        if self.cache_ttl > 0:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
+    # -- database ------------------------------------------------------------
+
+    async def _load(self, key: str) -> _Entry:
+        entry = self._cached(key)
+        if entry is not None:
+            return entry
+
+        async with self.read_engine.connect() as conn:
+            result = await conn.execute(_LOAD_QUERY, {"key": key})
+            row = result.first()
+
+        if row is None or row.expires_at < datetime.utcnow():
+            # Missing and abandoned records both read as "no state"
+            return self._remember(key, None, {})
+        return self._remember(key, row.state, row.data or {})
+
+    async def _save(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        if state is None and not data:
+            async with self.engine.begin() as conn:
+                await conn.execute(delete(FSMRecord).where(FSMRecord.key == key))
+        else:
+            expires_at = datetime.utcnow() + self.state_ttl
+            insert = get_insert(self.engine)
+            stmt = insert(FSMRecord).values(key=key, state=state, data=data, expires_at=expires_at)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[FSMRecord.key],
+                set_={"state": state, "data": data, "expires_at": expires_at}
+            )
+            async with self.engine.begin() as conn:
+                await conn.execute(stmt)
+
+        self._remember(key, state, data)
+        self._maybe_purge()
+
+    def _maybe_purge(self):
+        if time.monotonic() - self._last_purge < self.purge_interval:
+            return
+        if self._purge_task is not None and not self._purge_task.done():
+            return
+        self._last_purge = time.monotonic()
+        self._purge_task = asyncio.create_task(self.purge_expired())
+
+    async def purge_expired(self) -> int:
+        """Delete expired records, returning how many were removed"""
+        try:
+            async with self.engine.begin() as conn:
+                result = await conn.execute(
+                    delete(FSMRecord).where(FSMRecord.expires_at < datetime.utcnow())
+                )
+            if result.rowcount:
+                logger.info(f"Purged {result.rowcount} expired FSM records")
+            return result.rowcount
+        except Exception as e:
+            logger.error(f"Error purging expired FSM records: {e}")
+            return 0
+
+    # -- BaseStorage ---------------------------------------------------------
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = self.key_builder.build(key)
+        new_state = state.state if isinstance(state, State) else state
+        entry = await self._load(storage_key)
+
+        if entry.state == new_state:
+            return
+        await self._save(storage_key, new_state, entry.data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        entry = await self._load(self.key_builder.build(key))
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise ValueError(f"Data must be a dict, got {type(data).__name__}")
+
+        storage_key = self.key_builder.build(key)
+        entry = await self._load(storage_key)
+
+        if entry.data == data:
+            return
+        await self._save(storage_key, entry.state, deepcopy(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        entry = await self._load(self.key_builder.build(key))
+        return deepcopy(entry.data)
+
+    async def close(self) -> None:
+        if self._purge_task is not None:
+            self._purge_task.cancel()
+        self._cache.clear()
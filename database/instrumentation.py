@@ -0,0 +1,98 @@
+"""Per-update SQL accounting on top of SQLAlchemy engine events.
+
+`track_queries()` opens an accounting scope (one per update, opened by
+LoggingMiddleware); every statement executed inside it - including in the
+greenlets SQLAlchemy's asyncio layer runs them in, which inherit the
+context - adds to its query count and DB time, and waiting for a pooled
+connection adds to its pool-wait time. Outside a scope (background jobs)
+only the slow-query log applies.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Longest parameter repr written to the slow-query log
+_MAX_PARAMS_LENGTH = 500
+
+
+class QueryStats:
+    """SQL work done while handling one update"""
+
+    __slots__ = ("queries", "db_seconds", "pool_wait_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Statements executed at least `threshold` times - likely N+1 loops"""
+        return {statement: count for statement, count in self.statements.items() if count >= threshold}
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Account the SQL executed in this context to a fresh QueryStats"""
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that charges the time spent waiting for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats = _current.get()
+            if stats is not None:
+                stats.pool_wait_seconds += time.perf_counter() - started
+
+
+def instrument_engine(engine: Engine, slow_query_ms: float = 200.0):
+    """Hook query accounting and the slow-query log into a (sync) engine"""
+    slow_query_seconds = slow_query_ms / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += duration
+            stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+        if slow_query_seconds > 0 and duration >= slow_query_seconds:
+            params = repr(parameters)
+            if len(params) > _MAX_PARAMS_LENGTH:
+                params = params[:_MAX_PARAMS_LENGTH] + "..."
+            sql = " ".join(statement.split())
+            logger.warning(f"Slow query ({duration * 1000:.1f}ms): {sql} | params: {params}")
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        # after_cursor_execute does not run for failed statements
+        started = context.connection.info.get("query_started") if context.connection else None
+        if started:
+            started.pop()
@@ -0,0 +1,309 @@
+"""Versioned schema migrations.
+
+Fresh databases get the full schema from the models via `create_all` and
+are stamped with the latest version. Existing databases run every
+migration newer than their stored version. A fingerprint of the compiled
+schema is stored alongside, so a normal restart costs a single SELECT.
+
+Migrations run on an AUTOCOMMIT connection so that Postgres indexes can be
+built with `CREATE INDEX CONCURRENTLY` without locking the tables.
+"""
+from datetime import datetime
+from hashlib import sha256
+from typing import Awaitable, Callable, NamedTuple
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table, inspect, select, text
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateIndex, CreateTable
+from database.models import (
+    Base, Broadcast, FSMRecord, Task, TaskArchive, User, UserTaskStats, TASK_SEARCH_SETUP, TASK_SEARCH_INDEXES
+)
+from database.queries import task_counts_query
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_lock so that concurrently starting
+# processes do not run the same migration twice
+MIGRATION_LOCK_KEY = 7343_2001
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+schema_fingerprint = Table(
+    "schema_fingerprint",
+    migration_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("fingerprint", String(64), nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+
+
+# ---------------------------------------------------------------------------
+# Helpers for writing migrations
+# ---------------------------------------------------------------------------
+
+async def _has_table(conn: AsyncConnection, table_name: str) -> bool:
+    return await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(table_name))
+
+
+async def create_index_online(conn: AsyncConnection, index: Index):
+    """Create an index if missing, concurrently on Postgres"""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+    await create_index_from_ddl(conn, index.name, ddl)
+
+
+async def create_index_from_ddl(conn: AsyncConnection, name: str, ddl: str):
+    """Run a `CREATE INDEX IF NOT EXISTS` statement, concurrently on Postgres
+
+    For indexes the models cannot describe (operator classes, extensions).
+    """
+    if conn.dialect.name == "postgresql":
+        # A failed CONCURRENTLY build leaves an INVALID index behind that
+        # IF NOT EXISTS would happily keep - drop it and build again
+        valid = await conn.scalar(
+            text(
+                "SELECT i.indisvalid FROM pg_class c "
+                "JOIN pg_index i ON i.indexrelid = c.oid WHERE c.relname = :name"
+            ),
+            {"name": name}
+        )
+        if valid is False:
+            logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+            await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        ddl = ddl.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+
+    logger.info(f"Creating index {name}")
+    await conn.execute(text(ddl))
+
+
+async def add_column(conn: AsyncConnection, table: Table, column_name: str):
+    """Add a nullable model column to an existing table if it is not there yet"""
+    columns = await conn.run_sync(
+        lambda sync_conn: [c["name"] for c in inspect(sync_conn).get_columns(table.name)]
+    )
+    if column_name in columns:
+        return
+
+    column = table.c[column_name]
+    column_type = column.type.compile(dialect=conn.dialect)
+    logger.info(f"Adding column {table.name}.{column_name}")
+    await conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_name} {column_type}"))
+
+
+async def create_table(conn: AsyncConnection, table: Table):
+    """Create a table (and its indexes) if it does not exist yet"""
+    await conn.run_sync(lambda sync_conn: table.create(sync_conn, checkfirst=True))
+
+
+# ---------------------------------------------------------------------------
+# Migrations - append only, never renumber
+# ---------------------------------------------------------------------------
+
+async def _create_task_indexes(conn: AsyncConnection):
+    # Only the list indexes - later migrations add the others with their columns
+    for index in Task.__table__.indexes:
+        if index.name in ("ix_tasks_user_status_created", "ix_tasks_user_status_completed"):
+            await create_index_online(conn, index)
+
+
+async def _create_user_task_stats(conn: AsyncConnection):
+    await create_table(conn, UserTaskStats.__table__)
+    # tasks_archive comes in a later migration
+    counts = task_counts_query(include_archive=False)
+    await conn.execute(
+        UserTaskStats.__table__.insert().from_select(
+            [column.name for column in counts.selected_columns],
+            counts
+        )
+    )
+
+
+async def _create_fsm_states(conn: AsyncConnection):
+    await create_table(conn, FSMRecord.__table__)
+
+
+async def _add_users_last_seen(conn: AsyncConnection):
+    await add_column(conn, User.__table__, "last_seen")
+
+
+async def _create_tasks_archive(conn: AsyncConnection):
+    await create_table(conn, TaskArchive.__table__)
+
+
+async def _add_tasks_autoincrement(conn: AsyncConnection):
+    if conn.dialect.name != "sqlite":
+        return  # Postgres sequences never hand out an id twice
+    # SQLite cannot add AUTOINCREMENT to a table - rebuild it in one transaction.
+    # Columns added by later migrations are not there yet
+    existing = await conn.run_sync(
+        lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns(Task.__tablename__)}
+    )
+    columns = ", ".join(column.name for column in Task.__table__.columns if column.name in existing)
+    await conn.execute(text("BEGIN IMMEDIATE"))
+    try:
+        for index in Task.__table__.indexes:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        await conn.execute(text("ALTER TABLE tasks RENAME TO tasks_old"))
+        await create_table(conn, Task.__table__)
+        await conn.execute(text(f"INSERT INTO tasks ({columns}) SELECT {columns} FROM tasks_old"))
+        await conn.execute(text("DROP TABLE tasks_old"))
+        # Continue after the highest id ever used, archived ones included
+        await conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'tasks'"))
+        await conn.execute(text(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'tasks', coalesce(max(id), 0) "
+            "FROM (SELECT id FROM tasks UNION ALL SELECT id FROM tasks_archive)"
+        ))
+        await conn.execute(text("COMMIT"))
+    except Exception:
+        await conn.execute(text("ROLLBACK"))
+        raise
+
+
+async def _add_task_search(conn: AsyncConnection):
+    if conn.dialect.name != "postgresql":
+        return  # /search uses LIKE elsewhere
+    # Adding the stored column rewrites the tasks table once
+    for statement in TASK_SEARCH_SETUP:
+        await conn.execute(text(statement))
+    for name, ddl in TASK_SEARCH_INDEXES.items():
+        await create_index_from_ddl(conn, name, ddl)
+
+
+async def _add_task_due_dates(conn: AsyncConnection):
+    await add_column(conn, Task.__table__, "due_at")
+    await add_column(conn, Task.__table__, "remind_at")
+    for index in Task.__table__.indexes:
+        if index.name == "ix_tasks_remind_at":
+            await create_index_online(conn, index)
+
+
+async def _create_broadcasts(conn: AsyncConnection):
+    await add_column(conn, User.__table__, "blocked_at")
+    await create_table(conn, Broadcast.__table__)
+
+
+MIGRATIONS = [
+    Migration(1, "Composite indexes for /list, /completed and /stats", _create_task_indexes),
+    Migration(2, "Per-user task counters for /stats", _create_user_task_stats),
+    Migration(3, "Persistent FSM storage", _create_fsm_states),
+    Migration(4, "Track users.last_seen", _add_users_last_seen),
+    Migration(5, "Archive table for old completed tasks", _create_tasks_archive),
+    Migration(6, "Never reuse task ids on SQLite", _add_tasks_autoincrement),
+    Migration(7, "Full-text and trigram search on tasks", _add_task_search),
+    Migration(8, "Due dates and reminders on tasks", _add_task_due_dates),
+    Migration(9, "Broadcasts and users.blocked_at", _create_broadcasts),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def compute_fingerprint(dialect) -> str:
+    """Hash of the compiled schema and the migration list for a dialect"""
+    digest = sha256()
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    for migration in MIGRATIONS:
+        digest.update(f"{migration.version}:{migration.description}".encode())
+    return digest.hexdigest()
+
+
+async def _stored_fingerprint(conn: AsyncConnection):
+    try:
+        return await conn.scalar(
+            select(schema_fingerprint.c.fingerprint).where(schema_fingerprint.c.id == 1)
+        )
+    except Exception:
+        # Table does not exist yet - database predates migrations or is empty
+        return None
+
+
+async def _applied_version(conn: AsyncConnection) -> int:
+    version = await conn.scalar(select(schema_migrations.c.version).order_by(
+        schema_migrations.c.version.desc()
+    ).limit(1))
+    return version or 0
+
+
+async def _record_version(conn: AsyncConnection, migration: Migration):
+    await conn.execute(schema_migrations.insert().values(
+        version=migration.version,
+        description=migration.description,
+        applied_at=datetime.utcnow()
+    ))
+
+
+async def _store_fingerprint(conn: AsyncConnection, fingerprint: str):
+    await conn.execute(schema_fingerprint.delete())
+    await conn.execute(schema_fingerprint.insert().values(
+        id=1, fingerprint=fingerprint, updated_at=datetime.utcnow()
+    ))
+
+
+async def migrate(engine: AsyncEngine):
+    """Bring the database schema up to date, skipping work when unchanged"""
+    fingerprint = compute_fingerprint(engine.dialect)
+
+    async with engine.connect() as conn:
+        stored = await _stored_fingerprint(conn)
+    if stored == fingerprint:
+        logger.info("Schema fingerprint matches - skipping schema setup")
+        return
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        is_postgres = conn.dialect.name == "postgresql"
+
+        if is_postgres:
+            await conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+        try:
+            # Same connection: SQLite has a single pooled writer
+            if await _stored_fingerprint(conn) == fingerprint:
+                # Another process finished the same work while we waited for the lock
+                return
+
+            is_fresh = not await _has_table(conn, Task.__tablename__)
+            await conn.run_sync(migration_metadata.create_all)
+
+            if is_fresh:
+                # Models already describe the latest schema - no need to replay history
+                await conn.run_sync(Base.metadata.create_all)
+                for migration in MIGRATIONS:
+                    await _record_version(conn, migration)
+                logger.info(f"Created schema at version {LATEST_VERSION}")
+            else:
+                current = await _applied_version(conn)
+                for migration in MIGRATIONS:
+                    if migration.version <= current:
+                        continue
+                    logger.info(f"Applying migration {migration.version}: {migration.description}")
+                    await migration.apply(conn)
+                    await _record_version(conn, migration)
+                # Create any brand new tables that no migration mentions
+                await conn.run_sync(Base.metadata.create_all)
+
+            await _store_fingerprint(conn, fingerprint)
+        finally:
+            if is_postgres:
+                await conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
@@ -1,5 +1,7 @@
 from datetime import datetime
-from sqlalchemy import BigInteger, String, Text, DateTime, Enum as SQLEnum, ForeignKey
+from sqlalchemy import (
+    BigInteger, Integer, String, Text, DateTime, Enum as SQLEnum, ForeignKey, Index, JSON, DDL, event, text
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 import enum
 
@@ -20,6 +22,9 @@ class User(Base):
     username: Mapped[str] = mapped_column(String(255), nullable=True)
     first_name: Mapped[str] = mapped_column(String(255))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    last_seen: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # Set when a message to the user failed because they blocked the bot
+    blocked_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     
     # Relationship to tasks
     tasks: Mapped[list["Task"]] = relationship("Task", back_populates="user", cascade="all, delete-orphan")
@@ -30,6 +35,20 @@ class User(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # /list: pending tasks of a user, newest first, keyset on (created_at, id)
+        Index("ix_tasks_user_status_created", "user_id", "status", "created_at", "id"),
+        # /completed and /stats: completed tasks of a user by completion time
+        Index("ix_tasks_user_status_completed", "user_id", "status", "completed_at", "id"),
+        # Reminder scheduler: outstanding reminders by time, sent ones drop out
+        Index(
+            "ix_tasks_remind_at", "remind_at", "id",
+            postgresql_where=text("remind_at IS NOT NULL"),
+            sqlite_where=text("remind_at IS NOT NULL")
+        ),
+        # Never reuse the ids of deleted tasks - archived tasks keep theirs
+        {"sqlite_autoincrement": True},
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id", ondelete="CASCADE"))
@@ -38,9 +57,128 @@ class Task(Base):
     status: Mapped[TaskStatus] = mapped_column(SQLEnum(TaskStatus), default=TaskStatus.PENDING)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    due_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    # When the reminder goes out; cleared once it is sent or the task is completed
+    remind_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
     
     # Relationship to user
     user: Mapped["User"] = relationship("User", back_populates="tasks")
     
     def __repr__(self):
-        return f"<Task {self.id} - {self.title[:20]}>"
\ No newline at end of file
+        return f"<Task {self.id} - {self.title[:20]}>"
+
+# /search on PostgreSQL: a stored tsvector of title (weight A) and description
+# (weight B) and trigram matching on titles, both indexed together with
+# user_id (btree_gin) so a search only touches the user's own entries. The
+# "simple" configuration does not stem, which suits mixed-language tasks.
+# Not mapped on the model - SQLite has neither type, and /search falls back
+# to LIKE there.
+SEARCH_CONFIG = "simple"
+
+TASK_SEARCH_SETUP = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS btree_gin",
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(description, '')), 'B')"
+    ") STORED",
+)
+TASK_SEARCH_INDEXES = {
+    "ix_tasks_user_search": "CREATE INDEX IF NOT EXISTS ix_tasks_user_search "
+                            "ON tasks USING gin (user_id, search_vector)",
+    "ix_tasks_user_title_trgm": "CREATE INDEX IF NOT EXISTS ix_tasks_user_title_trgm "
+                                "ON tasks USING gin (user_id, title gin_trgm_ops)",
+}
+
+# Fresh databases get them right after the table; migration 7 adds them to existing ones
+for _statement in (*TASK_SEARCH_SETUP, *TASK_SEARCH_INDEXES.values()):
+    event.listen(Task.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+
+class TaskArchive(Base):
+    """Completed tasks moved out of the tasks table by the archiver
+
+    Rows keep their original task id, so ids stay unique across both tables.
+    """
+    __tablename__ = "tasks_archive"
+    __table_args__ = (
+        # /completed: archived tasks of a user by completion time
+        Index("ix_tasks_archive_user_completed", "user_id", "completed_at", "id"),
+    )
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id", ondelete="CASCADE"))
+    title: Mapped[str] = mapped_column(String(200))
+    description: Mapped[str] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    completed_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<TaskArchive {self.id} - {self.title[:20]}>"
+
+
+class UserTaskStats(Base):
+    """Per-user task counters kept up to date by every task mutation"""
+    __tablename__ = "user_task_stats"
+    
+    user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    pending_count: Mapped[int] = mapped_column(Integer, default=0)
+    completed_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_completed_task_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    last_completed_title: Mapped[str] = mapped_column(String(200), nullable=True)
+    last_completed_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<UserTaskStats {self.user_id} - {self.pending_count}/{self.completed_count}>"
+
+
+class BroadcastStatus(enum.Enum):
+    RUNNING = "running"
+    FINISHED = "finished"
+    CANCELLED = "cancelled"
+
+
+class Broadcast(Base):
+    """An admin message sent to every user, with progress to resume from
+
+    Users are walked in user_id order; `last_user_id` is the last one whose
+    batch was fully sent. The process sending it refreshes `heartbeat_at`
+    with every batch, so a broadcast whose heartbeat went stale lost its
+    process and is picked up again.
+    """
+    __tablename__ = "broadcasts"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    created_by: Mapped[int] = mapped_column(BigInteger)
+    # Either a text, or a message copied from the admin's chat
+    text: Mapped[str] = mapped_column(Text, nullable=True)
+    source_chat_id: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    source_message_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    # Progress message in the admin's chat, edited while the broadcast runs
+    progress_message_id: Mapped[int] = mapped_column(Integer, nullable=True)
+    status: Mapped[BroadcastStatus] = mapped_column(SQLEnum(BroadcastStatus), default=BroadcastStatus.RUNNING)
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    last_user_id: Mapped[int] = mapped_column(BigInteger, default=0)
+    delivered: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    blocked: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    heartbeat_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Broadcast {self.id} - {self.status.value} after {self.last_user_id}>"
+
+
+class FSMRecord(Base):
+    """FSM state and data of one storage key (bot, chat, user, ...)"""
+    __tablename__ = "fsm_states"
+    
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[str] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict] = mapped_column(JSON, default=dict)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+    
+    def __repr__(self):
+        return f"<FSMRecord {self.key} - {self.state}>"
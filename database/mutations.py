@@ -0,0 +1,323 @@
+"""Task mutations that keep the per-user counters in user_task_stats in sync.
+
+Each function works inside the caller's session and leaves committing to
+the caller, so the task change and the counter change land in the same
+transaction. The user's cached task views are dropped once it commits.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import Row, bindparam, delete, insert, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.dialects import get_insert
+from database.models import Task, TaskArchive, TaskStatus, UserTaskStats
+from database.task_cache import invalidate_on_commit
+from utils.task_files import TaskRecord
+
+# Column order of COPY rows in import_tasks
+_COPY_COLUMNS = ("user_id", "title", "description", "status", "created_at", "completed_at")
+
+
+async def adjust_task_counters(
+    session: AsyncSession,
+    user_id: int,
+    pending: int = 0,
+    completed: int = 0,
+    last_completed: Optional[Row] = None
+):
+    """Apply counter deltas for a user, creating the counters row if needed"""
+    values = {
+        "pending_count": UserTaskStats.pending_count + pending,
+        "completed_count": UserTaskStats.completed_count + completed,
+    }
+    initial = {
+        "user_id": user_id,
+        "pending_count": max(pending, 0),
+        "completed_count": max(completed, 0),
+    }
+
+    if last_completed is not None:
+        last = {
+            "last_completed_task_id": last_completed.id,
+            "last_completed_title": last_completed.title,
+            "last_completed_at": last_completed.completed_at,
+        }
+        values.update(last)
+        initial.update(last)
+
+    insert = get_insert(session)
+    stmt = insert(UserTaskStats).values(**initial)
+    stmt = stmt.on_conflict_do_update(index_elements=[UserTaskStats.user_id], set_=values)
+    await session.execute(stmt)
+    invalidate_on_commit(session, user_id)
+
+
+async def adjust_task_counters_many(
+    session: AsyncSession,
+    deltas: Dict[int, Tuple[int, int, Optional[Row]]]
+):
+    """adjust_task_counters for many users at once
+
+    `deltas` maps user ids to (pending, completed, last_completed). Users
+    with and without a new last completed task get one executemany each.
+    """
+    insert = get_insert(session)
+    for with_last in (False, True):
+        params = [
+            {
+                "b_user_id": user_id,
+                "b_pending": pending,
+                "b_completed": completed,
+                "b_initial_pending": max(pending, 0),
+                "b_initial_completed": max(completed, 0),
+                **({
+                    "b_last_id": last.id,
+                    "b_last_title": last.title,
+                    "b_last_at": last.completed_at,
+                } if with_last else {}),
+            }
+            for user_id, (pending, completed, last) in deltas.items()
+            if (last is not None) == with_last
+        ]
+        if not params:
+            continue
+
+        initial = {
+            "user_id": bindparam("b_user_id"),
+            "pending_count": bindparam("b_initial_pending"),
+            "completed_count": bindparam("b_initial_completed"),
+        }
+        values = {
+            "pending_count": UserTaskStats.pending_count + bindparam("b_pending"),
+            "completed_count": UserTaskStats.completed_count + bindparam("b_completed"),
+        }
+        if with_last:
+            last = {
+                "last_completed_task_id": bindparam("b_last_id"),
+                "last_completed_title": bindparam("b_last_title"),
+                "last_completed_at": bindparam("b_last_at"),
+            }
+            initial.update(last)
+            values.update(last)
+
+        stmt = insert(UserTaskStats).values(**initial)
+        stmt = stmt.on_conflict_do_update(index_elements=[UserTaskStats.user_id], set_=values)
+        await session.execute(stmt, params)
+
+    for user_id in deltas:
+        invalidate_on_commit(session, user_id)
+
+
+async def _refresh_last_completed(
+    session: AsyncSession,
+    user_id: int,
+    removed_task_ids: Optional[Sequence[int]] = None
+):
+    """Recompute the latest completed task if it was among the removed ones
+
+    `removed_task_ids=None` recomputes it unconditionally.
+    """
+    completed = union_all(
+        select(Task.id, Task.title, Task.completed_at)
+        .where(Task.user_id == user_id, Task.status == TaskStatus.COMPLETED),
+        select(TaskArchive.id, TaskArchive.title, TaskArchive.completed_at)
+        .where(TaskArchive.user_id == user_id)
+    ).subquery()
+    latest = (
+        select(completed)
+        .order_by(completed.c.completed_at.desc(), completed.c.id.desc())
+        .limit(1)
+        .subquery()
+    )
+    query = update(UserTaskStats).where(UserTaskStats.user_id == user_id)
+    if removed_task_ids is not None:
+        query = query.where(UserTaskStats.last_completed_task_id.in_(removed_task_ids))
+    await session.execute(
+        query.values(
+            last_completed_task_id=select(latest.c.id).scalar_subquery(),
+            last_completed_title=select(latest.c.title).scalar_subquery(),
+            last_completed_at=select(latest.c.completed_at).scalar_subquery()
+        )
+    )
+
+
+async def create_task(
+    session: AsyncSession,
+    user_id: int,
+    title: str,
+    description: Optional[str] = None
+) -> Task:
+    """Add a new pending task for a user"""
+    task = Task(
+        user_id=user_id,
+        title=title,
+        description=description,
+        status=TaskStatus.PENDING
+    )
+    session.add(task)
+    await session.flush()
+    await adjust_task_counters(session, user_id, pending=1)
+    return task
+
+
+async def import_tasks(session: AsyncSession, user_id: int, records: Sequence[TaskRecord]) -> int:
+    """Insert a batch of imported tasks for a user, returning how many
+
+    Postgres receives the rows with COPY, other databases with multi-row
+    INSERT statements. Counters are adjusted once for the whole batch.
+    """
+    if not records:
+        return 0
+
+    rows = [
+        {
+            "user_id": user_id,
+            "title": record.title,
+            "description": record.description,
+            "status": TaskStatus.COMPLETED if record.completed else TaskStatus.PENDING,
+            "created_at": record.created_at,
+            "completed_at": record.completed_at,
+        }
+        for record in records
+    ]
+    completed = sum(1 for record in records if record.completed)
+    # Runs first: it also opens the transaction COPY must take part in
+    await adjust_task_counters(session, user_id, pending=len(records) - completed, completed=completed)
+
+    if session.bind.dialect.name == "postgresql":
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        # The enum column stores member names; COPY takes them as text
+        await raw_connection.driver_connection.copy_records_to_table(
+            Task.__tablename__,
+            columns=_COPY_COLUMNS,
+            records=[
+                tuple(row[column].name if column == "status" else row[column] for column in _COPY_COLUMNS)
+                for row in rows
+            ]
+        )
+    else:
+        await session.execute(insert(Task), rows)
+
+    if completed:
+        # Imported tasks may have been completed before the current latest one
+        await _refresh_last_completed(session, user_id)
+    return len(records)
+
+
+async def complete_tasks(
+    session: AsyncSession,
+    user_id: int,
+    task_ids: Optional[Sequence[int]] = None
+) -> List[Row]:
+    """Complete pending tasks of a user in one UPDATE ... RETURNING
+
+    `task_ids=None` completes every pending task of the user. Returns the
+    (id, title, description, completed_at) rows that actually changed.
+    """
+    query = (
+        update(Task)
+        .where(Task.user_id == user_id, Task.status == TaskStatus.PENDING)
+        .values(status=TaskStatus.COMPLETED, completed_at=datetime.utcnow(), remind_at=None)
+        .returning(Task.id, Task.title, Task.description, Task.completed_at)
+        .execution_options(synchronize_session=False)
+    )
+    if task_ids is not None:
+        query = query.where(Task.id.in_(task_ids))
+
+    rows = list((await session.execute(query)).all())
+    if rows:
+        await adjust_task_counters(
+            session, user_id, pending=-len(rows), completed=len(rows), last_completed=rows[-1]
+        )
+    return rows
+
+
+async def complete_task(session: AsyncSession, user_id: int, task_id: int) -> Optional[Row]:
+    """Complete one pending task, returning None if there is no such task"""
+    rows = await complete_tasks(session, user_id, [task_id])
+    return rows[0] if rows else None
+
+
+async def set_task_due(
+    session: AsyncSession,
+    user_id: int,
+    task_id: int,
+    due_at: Optional[datetime],
+    remind_at: Optional[datetime]
+) -> Optional[Row]:
+    """Set or clear (None) the due date and reminder time of a pending task
+
+    Returns the (id, title, due_at, remind_at) row, or None if there is no
+    such pending task.
+    """
+    row = (await session.execute(
+        update(Task)
+        .where(Task.id == task_id, Task.user_id == user_id, Task.status == TaskStatus.PENDING)
+        .values(due_at=due_at, remind_at=remind_at)
+        .returning(Task.id, Task.title, Task.due_at, Task.remind_at)
+        .execution_options(synchronize_session=False)
+    )).first()
+    if row is not None:
+        invalidate_on_commit(session, user_id)
+    return row
+
+
+async def delete_tasks(
+    session: AsyncSession,
+    user_id: int,
+    task_ids: Optional[Sequence[int]] = None,
+    status: Optional[TaskStatus] = None
+) -> List[Row]:
+    """Delete tasks of a user with DELETE ... RETURNING
+
+    Filters by `task_ids` and/or `status`; completed tasks are deleted from
+    tasks_archive as well. Returns the removed rows (`id` and `title`).
+    """
+    query = (
+        delete(Task)
+        .where(Task.user_id == user_id)
+        .returning(Task.id, Task.title, Task.status)
+        .execution_options(synchronize_session=False)
+    )
+    if task_ids is not None:
+        query = query.where(Task.id.in_(task_ids))
+    if status is not None:
+        query = query.where(Task.status == status)
+
+    rows = list((await session.execute(query)).all())
+
+    archived = []
+    if status in (None, TaskStatus.COMPLETED):
+        # Only look in the archive for ids the tasks table did not have
+        remaining = None if task_ids is None else set(task_ids) - {row.id for row in rows}
+        if remaining is None or remaining:
+            archive_query = (
+                delete(TaskArchive)
+                .where(TaskArchive.user_id == user_id)
+                .returning(TaskArchive.id, TaskArchive.title)
+                .execution_options(synchronize_session=False)
+            )
+            if remaining is not None:
+                archive_query = archive_query.where(TaskArchive.id.in_(remaining))
+            archived = list((await session.execute(archive_query)).all())
+
+    if not rows and not archived:
+        return rows
+
+    completed_ids = [row.id for row in rows if row.status == TaskStatus.COMPLETED]
+    completed_ids.extend(row.id for row in archived)
+    await adjust_task_counters(
+        session,
+        user_id,
+        pending=-(len(rows) + len(archived) - len(completed_ids)),
+        completed=-len(completed_ids)
+    )
+    if completed_ids:
+        await _refresh_last_completed(session, user_id, completed_ids)
+    return rows + archived
+
+
+async def delete_task(session: AsyncSession, user_id: int, task_id: int) -> Optional[Row]:
+    """Delete one task, returning None if there is no such task"""
+    rows = await delete_tasks(session, user_id, [task_id])
+    return rows[0] if rows else None
@@ -0,0 +1,437 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import (
+    Executable, Integer, bindparam, select, func, tuple_, case, literal, literal_column, or_, and_, union_all
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.dialects import get_insert
+from database.models import Task, TaskArchive, TaskStatus, User, UserTaskStats, SEARCH_CONFIG
+
+# Views that can be paged and the column each one is ordered by
+VIEW_PENDING = "pending"
+VIEW_COMPLETED = "completed"
+VIEW_SEARCH = "search"
+
+# Page directions relative to a keyset cursor
+DIRECTION_NEXT = "n"   # older than the cursor
+DIRECTION_PREV = "p"   # newer than the cursor
+DIRECTION_FROM = "f"   # the cursor row itself and older (re-render a page)
+
+PAGE_SIZES = {
+    VIEW_PENDING: 5,
+    VIEW_COMPLETED: 10,
+    VIEW_SEARCH: 5,
+}
+
+# Words of a /search query that are matched; longer queries are cut
+MAX_SEARCH_WORDS = 8
+_SEARCH_WORD = re.compile(r"[^\W_]+")
+
+Cursor = Tuple[datetime, int]
+
+
+class TaskPage(NamedTuple):
+    """One page of task rows plus what is needed to render navigation"""
+    view: str
+    rows: Sequence
+    total: int
+    has_prev: bool
+    has_next: bool
+    offset: int = 0  # search pages are addressed by offset
+
+
+class UserStats(NamedTuple):
+    """Everything /stats shows for a user"""
+    first_name: str
+    member_since: datetime
+    pending_count: int
+    completed_count: int
+    last_completed_title: Optional[str]
+    last_completed_at: Optional[datetime]
+
+    @property
+    def total_count(self) -> int:
+        return self.pending_count + self.completed_count
+
+
+def row_cursor(view: str, row) -> Cursor:
+    """Keyset cursor of a row belonging to the given view"""
+    if view == VIEW_COMPLETED:
+        return row.completed_at, row.id
+    return row.created_at, row.id
+
+
+def _view_source(view: str, user_id):
+    """The table a view reads from and the filters selecting the user's rows
+
+    Completed tasks live partly in tasks_archive, so the completed view reads
+    from a UNION ALL of both tables (filtered inside each branch, which keeps
+    both index range scans).
+    """
+    if view != VIEW_COMPLETED:
+        tasks = Task.__table__
+        return tasks, (tasks.c.user_id == user_id, tasks.c.status == TaskStatus.PENDING)
+
+    columns = ("id", "title", "description", "created_at", "completed_at")
+    live = select(*(Task.__table__.c[name] for name in columns)).where(
+        Task.user_id == user_id, Task.status == TaskStatus.COMPLETED
+    )
+    archived = select(*(TaskArchive.__table__.c[name] for name in columns)).where(
+        TaskArchive.user_id == user_id
+    )
+    return union_all(live, archived).subquery("completed_tasks"), ()
+
+
+@lru_cache(maxsize=None)
+def _page_statements(view: str) -> Dict[str, Executable]:
+    """The statements paging a view, built once with bound parameters
+
+    Reusing the statement objects skips rebuilding them and their cache keys
+    on every call; the SQL text stays identical, so SQLAlchemy's compiled
+    cache and asyncpg's prepared statement cache are hit every time.
+    Parameters: user_id, cursor_at and cursor_id.
+    """
+    source, filters = _view_source(view, bindparam("user_id"))
+    sort_column = source.c.completed_at if view == VIEW_COMPLETED else source.c.created_at
+    keyset = tuple_(sort_column, source.c.id)
+    cursor = tuple_(
+        bindparam("cursor_at", type_=sort_column.type), bindparam("cursor_id", type_=Integer)
+    )
+    newest_first = (sort_column.desc(), source.c.id.desc())
+    oldest_first = (sort_column.asc(), source.c.id.asc())
+    limit = PAGE_SIZES[view] + 1
+
+    columns = [source.c.id, source.c.title, source.c.description, source.c.created_at, source.c.completed_at]
+    if view == VIEW_PENDING:
+        columns.append(source.c.due_at)
+    query = select(*columns).where(*filters)
+
+    return {
+        "first": query.order_by(*newest_first).limit(limit),
+        DIRECTION_NEXT: query.where(keyset < cursor).order_by(*newest_first).limit(limit),
+        DIRECTION_PREV: query.where(keyset > cursor).order_by(*oldest_first).limit(limit),
+        DIRECTION_FROM: query.where(keyset <= cursor).order_by(*newest_first).limit(limit),
+        "has_newer": select(select(source.c.id).where(*filters, keyset > cursor).exists()),
+        "count": select(func.count()).select_from(source).where(*filters),
+    }
+
+
+async def fetch_task_page(
+    session: AsyncSession,
+    user_id: int,
+    view: str,
+    cursor: Optional[Cursor] = None,
+    direction: str = DIRECTION_NEXT
+) -> TaskPage:
+    """Fetch one page of a view using keyset pagination on (timestamp, id).
+
+    Rows are ordered newest first. Only the columns needed for rendering
+    are loaded, and one extra row is fetched to detect a further page.
+    """
+    limit = PAGE_SIZES[view]
+    statements = _page_statements(view)
+    params = {"user_id": user_id}
+
+    if cursor is None:
+        query = statements["first"]
+    else:
+        query = statements.get(direction, statements[DIRECTION_NEXT])
+        params.update(cursor_at=cursor[0], cursor_id=cursor[1])
+
+    result = await session.execute(query, params)
+    rows = list(result.all())
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if cursor is not None and direction == DIRECTION_PREV:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    elif cursor is not None and direction == DIRECTION_NEXT:
+        has_prev, has_next = True, has_more
+    else:
+        has_next = has_more
+        has_prev = False
+        if cursor is not None and rows:
+            # Re-rendered pages may have newer rows above them
+            newest_at, newest_id = row_cursor(view, rows[0])
+            has_prev = bool(await session.scalar(
+                statements["has_newer"],
+                {"user_id": user_id, "cursor_at": newest_at, "cursor_id": newest_id}
+            ))
+
+    if not rows and cursor is not None:
+        # The page emptied out (e.g. its last task was completed) - start over
+        return await fetch_task_page(session, user_id, view)
+
+    total = await session.scalar(statements["count"], {"user_id": user_id})
+    return TaskPage(view=view, rows=rows, total=total or 0, has_prev=has_prev, has_next=has_next)
+
+
+async def stream_user_tasks(session: AsyncSession, user_id: int, batch_size: int = 1000) -> AsyncIterator:
+    """All tasks of a user for /export, archived ones first, each table by id
+
+    Rows come from a server-side cursor `batch_size` at a time, so an
+    export never holds more than one batch in memory. Rows have title,
+    description, status, created_at and completed_at.
+    """
+    archived = (
+        select(
+            TaskArchive.title, TaskArchive.description, literal("completed").label("status"),
+            TaskArchive.created_at, TaskArchive.completed_at
+        )
+        .where(TaskArchive.user_id == user_id)
+        .order_by(TaskArchive.id)
+    )
+    live = (
+        select(Task.title, Task.description, Task.status, Task.created_at, Task.completed_at)
+        .where(Task.user_id == user_id)
+        .order_by(Task.id)
+    )
+    for query in (archived, live):
+        result = await session.stream(query.execution_options(yield_per=batch_size))
+        async for row in result:
+            yield row
+
+
+def search_words(query: str) -> List[str]:
+    """The lowercase words of a /search query that take part in matching"""
+    return [word[:64] for word in _SEARCH_WORD.findall(query.lower())][:MAX_SEARCH_WORDS]
+
+
+def _search_statement(branch) -> Executable:
+    """Rank-ordered page of matches over the user's tasks and archived tasks
+
+    `branch(table, status)` selects the matching rows of one table with a
+    `rank` column; parameters user_id, limit and offset plus the matcher's.
+    """
+    tasks, archive = Task.__table__, TaskArchive.__table__
+    matches = union_all(
+        branch(tasks, tasks.c.status),
+        # Everything in the archive is completed
+        branch(archive, literal(TaskStatus.COMPLETED, tasks.c.status.type)),
+    ).subquery("matches")
+    return (
+        select(
+            matches.c.id, matches.c.title, matches.c.description, matches.c.status,
+            matches.c.created_at, matches.c.completed_at,
+            func.count().over().label("total_matches"),
+        )
+        .order_by(matches.c.rank.desc(), matches.c.created_at.desc(), matches.c.id.desc())
+        .limit(bindparam("limit"))
+        .offset(bindparam("offset"))
+    )
+
+
+def _search_branch(table, status, condition, rank):
+    return select(
+        table.c.id, table.c.title, table.c.description, status.label("status"),
+        table.c.created_at, table.c.completed_at, rank.label("rank")
+    ).where(table.c.user_id == bindparam("user_id"), condition)
+
+
+@lru_cache(maxsize=None)
+def _postgres_search_statement() -> Executable:
+    """Ranked full-text + trigram search; parameters user_id, tsquery, text, pattern, limit, offset
+
+    On tasks every condition is answered by one of the (user_id, ...) GIN
+    indexes, so only the user's matching entries are read. Archived tasks
+    have no search column; their vectors are computed for the user's
+    archived rows only.
+    """
+    ts_query = func.to_tsquery(SEARCH_CONFIG, bindparam("tsquery"))
+    search_text = bindparam("text")
+
+    def branch(table, status):
+        if table is Task.__table__:
+            search_vector = literal_column("tasks.search_vector")
+        else:
+            # The expression of the stored tasks.search_vector column
+            search_vector = func.setweight(
+                func.to_tsvector(SEARCH_CONFIG, func.coalesce(table.c.title, "")), literal_column("'A'")
+            ).op("||")(func.setweight(
+                func.to_tsvector(SEARCH_CONFIG, func.coalesce(table.c.description, "")), literal_column("'B'")
+            ))
+        condition = or_(
+            search_vector.op("@@")(ts_query),                  # words and word prefixes
+            table.c.title.op("%")(search_text),                # typos
+            table.c.title.ilike(bindparam("pattern"))          # parts of words
+        )
+        rank = func.greatest(
+            func.ts_rank_cd(search_vector, ts_query),
+            func.similarity(table.c.title, search_text)
+        )
+        return _search_branch(table, status, condition, rank)
+
+    return _search_statement(branch)
+
+
+@lru_cache(maxsize=None)
+def _like_search_statement(word_count: int) -> Executable:
+    """LIKE search for other databases: every word in the title or description
+
+    Tasks with more words in the title rank first, then newer tasks.
+    Parameters user_id, word0..wordN (LIKE patterns), limit and offset.
+    """
+    def branch(table, status):
+        in_title = [table.c.title.ilike(bindparam(f"word{i}")) for i in range(word_count)]
+        in_description = [table.c.description.ilike(bindparam(f"word{i}")) for i in range(word_count)]
+        hits = [case((condition, 1), else_=0) for condition in in_title]
+        condition = and_(*(or_(title, description) for title, description in zip(in_title, in_description)))
+        return _search_branch(table, status, condition, sum(hits[1:], hits[0]))
+
+    return _search_statement(branch)
+
+
+async def search_tasks(session: AsyncSession, user_id: int, query: str, offset: int = 0) -> TaskPage:
+    """One page of a user's tasks (pending, completed and archived) matching a query
+
+    Pages are addressed by offset because results are ordered by rank.
+    Rows carry `status` and the total match count is returned with them,
+    so a page is a single query.
+    """
+    words = search_words(query)
+    if not words:
+        return TaskPage(view=VIEW_SEARCH, rows=[], total=0, has_prev=False, has_next=False)
+
+    limit = PAGE_SIZES[VIEW_SEARCH]
+    params = {"user_id": user_id, "limit": limit, "offset": offset}
+
+    if session.bind.dialect.name == "postgresql":
+        statement = _postgres_search_statement()
+        params.update(
+            tsquery=" & ".join(f"{word}:*" for word in words),
+            text=" ".join(words),
+            pattern=f"%{' '.join(words)}%"
+        )
+    else:
+        statement = _like_search_statement(len(words))
+        params.update({f"word{i}": f"%{word}%" for i, word in enumerate(words)})
+
+    rows = list((await session.execute(statement, params)).all())
+    if not rows and offset > 0:
+        # Results shrank below this page (tasks deleted meanwhile) - start over
+        return await search_tasks(session, user_id, query)
+
+    total = rows[0].total_matches if rows else 0
+    return TaskPage(
+        view=VIEW_SEARCH,
+        rows=rows,
+        total=total,
+        has_prev=offset > 0,
+        has_next=offset + len(rows) < total,
+        offset=offset
+    )
+
+
+def task_counts_query(user_id: Optional[int] = None, include_archive: bool = True):
+    """Aggregate task counters per user, shaped like the user_task_stats table
+
+    Used to backfill and rebuild the counters, and as the fallback for users
+    whose counters row does not exist yet. Archived tasks count as completed;
+    `include_archive=False` is for databases that predate tasks_archive.
+    """
+    def user_tasks(*branches):
+        if user_id is not None:
+            branches = [branch.where(branch.selected_columns.user_id == user_id) for branch in branches]
+        return union_all(*branches) if len(branches) > 1 else branches[0]
+
+    live = select(
+        Task.user_id.label("user_id"),
+        Task.id.label("id"),
+        Task.title.label("title"),
+        Task.completed_at.label("completed_at"),
+        case((Task.status == TaskStatus.COMPLETED, 1), else_=0).label("is_completed"),
+    )
+    archived = select(
+        TaskArchive.user_id,
+        TaskArchive.id,
+        TaskArchive.title,
+        TaskArchive.completed_at,
+        literal(1).label("is_completed"),
+    )
+    tasks = (user_tasks(live, archived) if include_archive else user_tasks(live)).subquery("all_tasks")
+
+    # Rank 1 is the user's latest completed task, if they have any
+    ranked = select(
+        tasks,
+        func.row_number().over(
+            partition_by=tasks.c.user_id,
+            order_by=(tasks.c.is_completed.desc(), tasks.c.completed_at.desc(), tasks.c.id.desc())
+        ).label("rank"),
+    ).subquery("ranked_tasks")
+    is_latest = (ranked.c.rank == 1) & (ranked.c.is_completed == 1)
+
+    return select(
+        ranked.c.user_id,
+        func.sum(1 - ranked.c.is_completed).label("pending_count"),
+        func.sum(ranked.c.is_completed).label("completed_count"),
+        func.max(case((is_latest, ranked.c.id))).label("last_completed_task_id"),
+        func.max(case((is_latest, ranked.c.title))).label("last_completed_title"),
+        func.max(case((is_latest, ranked.c.completed_at))).label("last_completed_at"),
+    ).group_by(ranked.c.user_id)
+
+
+# Built once like the page statements
+_USER_STATS_QUERY = (
+    select(
+        User.first_name,
+        User.created_at,
+        UserTaskStats.user_id.label("stats_user_id"),
+        UserTaskStats.pending_count,
+        UserTaskStats.completed_count,
+        UserTaskStats.last_completed_title,
+        UserTaskStats.last_completed_at,
+    )
+    .outerjoin(UserTaskStats, UserTaskStats.user_id == User.user_id)
+    .where(User.user_id == bindparam("user_id"))
+)
+
+
+async def fetch_user_stats(session: AsyncSession, user_id: int) -> Optional[UserStats]:
+    """Load /stats data in one query from the user row and its counters row
+
+    Returns None if the user is not registered. Users without a counters row
+    yet get one computed with a single aggregate query, and it is stored so
+    the next call is a primary key lookup again.
+    """
+    result = await session.execute(_USER_STATS_QUERY, {"user_id": user_id})
+    row = result.first()
+
+    if row is None:
+        return None
+
+    if row.stats_user_id is not None:
+        return UserStats(
+            first_name=row.first_name,
+            member_since=row.created_at,
+            pending_count=row.pending_count,
+            completed_count=row.completed_count,
+            last_completed_title=row.last_completed_title,
+            last_completed_at=row.last_completed_at
+        )
+
+    counts = (await session.execute(task_counts_query(user_id))).first()
+    stats = {
+        "pending_count": counts.pending_count if counts else 0,
+        "completed_count": counts.completed_count if counts else 0,
+        "last_completed_task_id": counts.last_completed_task_id if counts else None,
+        "last_completed_title": counts.last_completed_title if counts else None,
+        "last_completed_at": counts.last_completed_at if counts else None,
+    }
+    # A concurrent task mutation may have created the row meanwhile - keep it
+    insert = get_insert(session)
+    await session.execute(
+        insert(UserTaskStats).values(user_id=user_id, **stats).on_conflict_do_nothing()
+    )
+    await session.commit()
+
+    return UserStats(
+        first_name=row.first_name,
+        member_since=row.created_at,
+        pending_count=stats["pending_count"],
+        completed_count=stats["completed_count"],
+        last_completed_title=stats["last_completed_title"],
+        last_completed_at=stats["last_completed_at"]
+    )
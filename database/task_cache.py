@@ -0,0 +1,236 @@
+"""Read-through cache of per-user task views (list pages and /stats).
+
+A user's tasks only change through that user's own actions, so cached
+pages stay valid until one of the user's transactions commits a task
+change. The mutations in database/mutations.py mark the user on the
+session, and the user's entries are dropped right after the commit - a
+rolled back transaction leaves the cache alone.
+
+The cache is per process. That is exact for a single process and for the
+user-sharded worker pool, where all of a user's writes happen in the
+process that caches their views.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from config import TASK_CACHE_SIZE, TASK_CACHE_TTL, TASK_CACHE_STATS_INTERVAL
+from database.queries import (
+    Cursor, DIRECTION_NEXT, TaskPage, UserStats, fetch_task_page, fetch_user_stats
+)
+from metrics import REGISTRY
+import logging
+
+logger = logging.getLogger(__name__)
+
+_INVALIDATE_KEY = "task_cache_invalidate"
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    "bot_task_cache_lookups_total", "Task cache lookups by result", ["result"]
+)
+CACHE_EVICTIONS = REGISTRY.counter(
+    "bot_task_cache_evictions_total", "Task cache entries evicted to stay within TASK_CACHE_SIZE"
+)
+CACHE_EXPIRATIONS = REGISTRY.counter(
+    "bot_task_cache_expirations_total", "Task cache entries found past TASK_CACHE_TTL"
+)
+CACHE_INVALIDATIONS = REGISTRY.counter(
+    "bot_task_cache_invalidations_total", "Users whose cached task views were dropped by a write"
+)
+
+
+class TaskViewCache:
+    """LRU + TTL cache of task projections keyed by (user, view key)"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._user_keys: Dict[int, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Loads in flight per user, and a per-user epoch bumped by invalidations
+        # while any are; a load that raced an invalidation is not stored
+        self._loads: Dict[int, int] = {}
+        self._epochs: Dict[int, int] = {}
+
+    def _drop(self, user_id: int, key: Hashable):
+        self._entries.pop((user_id, key), None)
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    def get(self, user_id: int, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get((user_id, key))
+        if entry is None:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._drop(user_id, key)
+            self.expirations += 1
+            self.misses += 1
+            CACHE_EXPIRATIONS.inc()
+            CACHE_LOOKUPS.inc(result="miss")
+            return None
+
+        self._entries.move_to_end((user_id, key))
+        self.hits += 1
+        CACHE_LOOKUPS.inc(result="hit")
+        return value
+
+    def set(self, user_id: int, key: Hashable, value: Any):
+        if self.max_entries <= 0:
+            return
+        self._entries[(user_id, key)] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end((user_id, key))
+        self._user_keys.setdefault(user_id, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            (old_user_id, old_key), _ = self._entries.popitem(last=False)
+            self._drop(old_user_id, old_key)
+            self.evictions += 1
+            CACHE_EVICTIONS.inc()
+
+    def invalidate_user(self, user_id: int):
+        """Forget every cached view of a user"""
+        if user_id in self._loads:
+            self._epochs[user_id] = self._epochs.get(user_id, 0) + 1
+        keys = self._user_keys.pop(user_id, None)
+        if not keys:
+            return
+        for key in keys:
+            self._entries.pop((user_id, key), None)
+        self.invalidations += 1
+        CACHE_INVALIDATIONS.inc()
+
+    async def get_or_load(self, user_id: int, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.get(user_id, key)
+        if value is not None:
+            return value
+
+        epoch = self._epochs.get(user_id, 0)
+        self._loads[user_id] = self._loads.get(user_id, 0) + 1
+        try:
+            value = await loader()
+        finally:
+            fresh = self._epochs.get(user_id, 0) == epoch
+            loads = self._loads.pop(user_id) - 1
+            if loads:
+                self._loads[user_id] = loads
+            else:
+                self._epochs.pop(user_id, None)
+        if value is not None and fresh:
+            self.set(user_id, key, value)
+        return value
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "users": len(self._user_keys),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+task_cache = TaskViewCache(TASK_CACHE_SIZE, TASK_CACHE_TTL)
+REGISTRY.gauge(
+    "bot_task_cache_entries", "Task list pages and /stats results in the cache",
+    callback=lambda: len(task_cache._entries)
+)
+_reporter: Optional[asyncio.Task] = None
+
+
+def log_cache_stats():
+    stats = task_cache.stats()
+    logger.info(
+        f"Task cache: {stats['entries']} entries for {stats['users']} users, "
+        f"hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits / {stats['misses']} misses), "
+        f"{stats['evictions']} evictions, {stats['expirations']} expirations, "
+        f"{stats['invalidations']} invalidations"
+    )
+
+
+async def _report_stats():
+    while True:
+        await asyncio.sleep(TASK_CACHE_STATS_INTERVAL)
+        log_cache_stats()
+
+
+async def start_stats_reporter():
+    """Dispatcher startup hook: log cache counters every interval"""
+    global _reporter
+    if TASK_CACHE_STATS_INTERVAL > 0 and _reporter is None:
+        _reporter = asyncio.create_task(_report_stats())
+
+
+async def stop_stats_reporter():
+    """Dispatcher shutdown hook"""
+    global _reporter
+    if _reporter is not None:
+        _reporter.cancel()
+        _reporter = None
+    log_cache_stats()
+
+
+# ---------------------------------------------------------------------------
+# Invalidation on commit
+# ---------------------------------------------------------------------------
+
+def invalidate_on_commit(session: AsyncSession, user_id: int):
+    """Drop the user's cached views once the session's transaction commits"""
+    session.sync_session.info.setdefault(_INVALIDATE_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session):
+    for user_id in session.info.pop(_INVALIDATE_KEY, ()):
+        task_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session):
+    session.info.pop(_INVALIDATE_KEY, None)
+
+
+# ---------------------------------------------------------------------------
+# Cached reads
+# ---------------------------------------------------------------------------
+
+async def get_task_page(
+    session: AsyncSession,
+    user_id: int,
+    view: str,
+    cursor: Optional[Cursor] = None,
+    direction: str = DIRECTION_NEXT
+) -> TaskPage:
+    """fetch_task_page through the cache"""
+    return await task_cache.get_or_load(
+        user_id,
+        ("page", view, cursor, direction),
+        lambda: fetch_task_page(session, user_id, view, cursor, direction)
+    )
+
+
+async def get_user_stats(session: AsyncSession, user_id: int) -> Optional[UserStats]:
+    """fetch_user_stats through the cache"""
+    return await task_cache.get_or_load(
+        user_id,
+        ("stats",),
+        lambda: fetch_user_stats(session, user_id)
+    )
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import KNOWN_USERS_CACHE_SIZE
+from database.dialects import get_insert
+from database.models import User
+from utils.cache import LRUCache
+
+# user_id -> last known username of users that certainly exist in the database
+known_users = LRUCache(KNOWN_USERS_CACHE_SIZE)
+
+
+async def register_user(
+    session: AsyncSession,
+    user_id: int,
+    username: Optional[str],
+    first_name: str
+) -> bool:
+    """Make sure a user row exists, returning True if it was just created
+
+    Users seen recently by this process are answered from memory; everyone
+    else costs a single INSERT ... ON CONFLICT DO NOTHING.
+    """
+    if user_id in known_users:
+        return False
+
+    insert = get_insert(session)
+    result = await session.execute(
+        insert(User)
+        .values(
+            user_id=user_id,
+            username=username,
+            first_name=first_name,
+            created_at=datetime.utcnow(),
+            last_seen=datetime.utcnow()
+        )
+        .on_conflict_do_nothing(index_elements=[User.user_id])
+        .returning(User.user_id)
+    )
+    created = result.first() is not None
+    await session.commit()
+
+    known_users.set(user_id, username)
+    return created
+
+
+async def flush_user_activity(session: AsyncSession, activity: Dict[int, Tuple[Optional[str], datetime]]):
+    """Write collected last_seen/username values in one batched UPDATE, clearing blocked_at
+
+    Runs as a plain executemany matched on user_id, so users without a row
+    (e.g. never sent /start) are skipped instead of failing the whole batch.
+    """
+    if not activity:
+        return
+
+    users = User.__table__
+    await session.execute(
+        update(users)
+        .where(users.c.user_id == bindparam("b_user_id"))
+        # Anyone writing to the bot has not blocked it (anymore)
+        .values(username=bindparam("b_username"), last_seen=bindparam("b_last_seen"), blocked_at=None),
+        [
+            {"b_user_id": user_id, "b_username": username, "b_last_seen": last_seen}
+            for user_id, (username, last_seen) in activity.items()
+        ]
+    )
+    await session.commit()
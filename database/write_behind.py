@@ -0,0 +1,252 @@
+"""Write-behind batching of task creates and completions.
+
+With WRITE_BEHIND_DELAY_MS > 0, creates and completions from all users are
+collected for that long (or until WRITE_BEHIND_MAX_BATCH of them are
+waiting) and written in a single transaction: one multi-row INSERT ...
+RETURNING for the new tasks, one UPDATE ... RETURNING for the completed
+ones and one executemany for the counters. Every caller awaits the outcome
+of its own write, so confirmations are only sent for committed changes.
+
+If the batch transaction fails, its writes are retried one by one in their
+own transactions, so a single bad write only fails its own caller.
+
+Handlers use `submit_create_task` / `submit_complete_task`, which write
+directly when write-behind is off.
+"""
+import asyncio
+import contextvars
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Row, insert, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import WRITE_BEHIND_DELAY_MS, WRITE_BEHIND_MAX_BATCH
+from database.connection import async_session_maker
+from database.models import Task, TaskStatus
+from database.mutations import adjust_task_counters_many, complete_task, create_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Create:
+    __slots__ = ("user_id", "title", "description", "future")
+
+    def __init__(self, user_id: int, title: str, description: Optional[str], future: asyncio.Future):
+        self.user_id = user_id
+        self.title = title
+        self.description = description
+        self.future = future
+
+
+class _Complete:
+    __slots__ = ("user_id", "task_id", "future")
+
+    def __init__(self, user_id: int, task_id: int, future: asyncio.Future):
+        self.user_id = user_id
+        self.task_id = task_id
+        self.future = future
+
+
+def _resolve(future: asyncio.Future, result=None, error: Optional[BaseException] = None):
+    if future.done():
+        return  # The caller gave up waiting
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class WriteBehindBatcher:
+    """Collects task writes for `delay` seconds and commits them together"""
+
+    def __init__(self, delay: float, max_batch: int):
+        self.delay = delay
+        self.max_batch = max_batch
+        self._creates: List[_Create] = []
+        self._completes: List[_Complete] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: set = set()
+        self.batches = 0
+        self.writes = 0
+
+    async def create_task(self, user_id: int, title: str, description: Optional[str] = None) -> Row:
+        """Add a pending task, returning its (id, title, description, created_at) row"""
+        future = asyncio.get_running_loop().create_future()
+        self._creates.append(_Create(user_id, title, description, future))
+        self._schedule()
+        return await future
+
+    async def complete_task(self, user_id: int, task_id: int) -> Optional[Row]:
+        """Complete a pending task like mutations.complete_task"""
+        future = asyncio.get_running_loop().create_future()
+        self._completes.append(_Complete(user_id, task_id, future))
+        self._schedule()
+        return await future
+
+    def _schedule(self):
+        if len(self._creates) + len(self._completes) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.delay, self._start_flush, context=contextvars.Context()
+            )
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._creates and not self._completes:
+            return
+
+        creates, self._creates = self._creates, []
+        completes, self._completes = self._completes, []
+        # Outside the context of the handler that happened to fill the batch,
+        # so per-update query stats do not count the whole batch
+        flush = contextvars.Context().run(asyncio.create_task, self._flush(creates, completes))
+        self._flushes.add(flush)
+        flush.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, creates: List[_Create], completes: List[_Complete]):
+        try:
+            await self._write(creates, completes)
+        finally:
+            # Cancelled (e.g. at shutdown) before every write was answered:
+            # fail the rest, or their callers would wait forever
+            for item in (*creates, *completes):
+                _resolve(item.future, error=RuntimeError("Write-behind batch was cancelled"))
+
+    async def _write(self, creates: List[_Create], completes: List[_Complete]):
+        try:
+            async with async_session_maker() as session:
+                created = await self._insert(session, creates)
+                completed = await self._complete(session, completes)
+                await session.commit()
+        except Exception as e:
+            logger.warning(f"Write-behind batch of {len(creates) + len(completes)} failed ({e}) - retrying one by one")
+            await self._flush_one_by_one(creates, completes)
+            return
+
+        self.batches += 1
+        self.writes += len(creates) + len(completes)
+        for item, row in zip(creates, created):
+            _resolve(item.future, row)
+        for item, row in zip(completes, completed):
+            _resolve(item.future, row)
+
+    async def _insert(self, session: AsyncSession, creates: List[_Create]) -> List[Row]:
+        if not creates:
+            return []
+
+        now = datetime.utcnow()
+        tasks = Task.__table__
+        # SQLite can only keep RETURNING in parameter order by inserting row
+        # by row, but its single writer hands out ascending ids in insert order
+        ordered = session.bind.dialect.name != "sqlite"
+        rows = (await session.execute(
+            insert(tasks).returning(
+                tasks.c.id, tasks.c.title, tasks.c.description, tasks.c.created_at,
+                sort_by_parameter_order=ordered
+            ),
+            [
+                {
+                    "user_id": item.user_id,
+                    "title": item.title,
+                    "description": item.description,
+                    "status": TaskStatus.PENDING,
+                    "created_at": now,
+                }
+                for item in creates
+            ]
+        )).all()
+        if not ordered:
+            rows.sort(key=lambda row: row.id)
+
+        deltas: Dict[int, Tuple[int, int, Optional[Row]]] = {}
+        for item in creates:
+            pending, completed, last = deltas.get(item.user_id, (0, 0, None))
+            deltas[item.user_id] = (pending + 1, completed, last)
+        await adjust_task_counters_many(session, deltas)
+        return rows
+
+    async def _complete(self, session: AsyncSession, completes: List[_Complete]) -> List[Optional[Row]]:
+        """Complete the tasks in one UPDATE, returning a row (or None) per request
+
+        A task requested twice in the batch is only completed for the first.
+        """
+        if not completes:
+            return []
+
+        rows = (await session.execute(
+            update(Task)
+            .where(
+                tuple_(Task.user_id, Task.id).in_({(item.user_id, item.task_id) for item in completes}),
+                Task.status == TaskStatus.PENDING
+            )
+            .values(status=TaskStatus.COMPLETED, completed_at=datetime.utcnow(), remind_at=None)
+            .returning(Task.user_id, Task.id, Task.title, Task.description, Task.completed_at)
+            .execution_options(synchronize_session=False)
+        )).all()
+        by_key = {(row.user_id, row.id): row for row in rows}
+
+        deltas: Dict[int, Tuple[int, int, Optional[Row]]] = {}
+        for row in rows:
+            pending, completed, _ = deltas.get(row.user_id, (0, 0, None))
+            deltas[row.user_id] = (pending - 1, completed + 1, row)
+        if deltas:
+            await adjust_task_counters_many(session, deltas)
+
+        return [by_key.pop((item.user_id, item.task_id), None) for item in completes]
+
+    async def _flush_one_by_one(self, creates: List[_Create], completes: List[_Complete]):
+        for item in creates:
+            try:
+                async with async_session_maker() as session:
+                    task = await create_task(session, item.user_id, item.title, item.description)
+                    await session.commit()
+                _resolve(item.future, task)
+            except Exception as e:
+                _resolve(item.future, error=e)
+
+        for item in completes:
+            try:
+                async with async_session_maker() as session:
+                    row = await complete_task(session, item.user_id, item.task_id)
+                    await session.commit()
+                _resolve(item.future, row)
+            except Exception as e:
+                _resolve(item.future, error=e)
+
+    async def close(self):
+        """Dispatcher shutdown hook: write what is still waiting"""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+
+write_behind = (
+    WriteBehindBatcher(WRITE_BEHIND_DELAY_MS / 1000, WRITE_BEHIND_MAX_BATCH) if WRITE_BEHIND_DELAY_MS > 0 else None
+)
+
+
+async def submit_create_task(
+    session: AsyncSession,
+    user_id: int,
+    title: str,
+    description: Optional[str] = None
+):
+    """Create a task and commit it - batched with other writes when write-behind is on"""
+    if write_behind is not None:
+        return await write_behind.create_task(user_id, title, description)
+    task = await create_task(session, user_id, title, description)
+    await session.commit()
+    return task
+
+
+async def submit_complete_task(session: AsyncSession, user_id: int, task_id: int) -> Optional[Row]:
+    """Complete a task and commit it, None if there is no such pending task"""
+    if write_behind is not None:
+        return await write_behind.complete_task(user_id, task_id)
+    task = await complete_task(session, user_id, task_id)
+    if task is not None:
+        await session.commit()
+    return task
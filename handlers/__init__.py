@@ -1,5 +1,7 @@
 from handlers.commands import router as commands_router
 from handlers.messages import router as messages_router
 from handlers.callbacks import router as callbacks_router
+from handlers.transfer import router as transfer_router
+from handlers.admin import router as admin_router
 
-__all__ = ['commands_router', 'messages_router', 'callbacks_router']
\ No newline at end of file
+__all__ = ['commands_router', 'messages_router', 'callbacks_router', 'transfer_router', 'admin_router']
\ No newline at end of file
@@ -0,0 +1,73 @@
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import CallbackQuery, Message
+from aiogram.fsm.context import FSMContext
+from handlers.callbacks import on_action
+from jobs import cancel_broadcast, create_broadcast, start_broadcast
+from keyboard import Action, CallbackPayload
+from rendering import render_broadcast_progress
+from config import ADMIN_IDS
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+# Everything here is for admins only; other users fall through to the other routers
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+
+
+@router.message(Command("broadcast"))
+async def broadcast_command(message: Message, state: FSMContext, command: CommandObject, bot: Bot):
+    """Handle /broadcast command - send a message to every user"""
+    await state.clear()  # Clear any active state
+
+    source = message.reply_to_message
+    text = (command.args or "").strip()
+    if source is None and not text:
+        await message.answer(
+            "📣 Usage:\n\n"
+            "<code>/broadcast your text</code> - send a plain text to every user\n"
+            "or reply <code>/broadcast</code> to any message to send a copy of it."
+        )
+        return
+
+    try:
+        progress = await message.answer("📣 Starting broadcast...")
+        broadcast = await create_broadcast(
+            message.from_user.id,
+            progress.message_id,
+            text=None if source is not None else text,
+            source_chat_id=source.chat.id if source is not None else None,
+            source_message_id=source.message_id if source is not None else None
+        )
+        await progress.edit_text(render_broadcast_progress(broadcast))
+        start_broadcast(bot, broadcast)
+        logger.info(f"Admin {message.from_user.id} started broadcast {broadcast.id} to {broadcast.total} users")
+
+    except Exception as e:
+        logger.error(f"Error starting broadcast: {e}")
+        await message.answer("❌ An error occurred while starting the broadcast. Please try again.")
+
+
+# Buttons are routed by the callbacks router, so admins are checked here
+@on_action(Action.CANCEL_BROADCAST)
+async def cancel_broadcast_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
+    """Handle the Cancel button of a running broadcast"""
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer("❌ Only admins can do that.", show_alert=True)
+        return
+    broadcast_id = payload.id
+
+    try:
+        broadcast = await cancel_broadcast(broadcast_id)
+        if broadcast is None:
+            await callback.answer("This broadcast is no longer running.", show_alert=True)
+            return
+
+        await callback.message.edit_text(render_broadcast_progress(broadcast))
+        await callback.answer("⏹ Broadcast cancelled")
+        logger.info(f"Admin {callback.from_user.id} cancelled broadcast {broadcast_id}")
+
+    except Exception as e:
+        logger.error(f"Error cancelling broadcast: {e}")
+        await callback.answer("❌ Error cancelling the broadcast. Please try again.", show_alert=True)
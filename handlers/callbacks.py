@@ -1,19 +1,105 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
-from database.models import Task, TaskStatus
 from database.connection import async_session_maker
-from datetime import datetime
+from database.models import TaskStatus
+from database.mutations import delete_task, complete_tasks, delete_tasks
+from database.write_behind import submit_create_task, submit_complete_task
+from database.queries import (
+    Cursor, search_tasks, VIEW_PENDING, VIEW_COMPLETED, VIEW_SEARCH,
+    DIRECTION_NEXT, DIRECTION_PREV, DIRECTION_FROM
+)
+from database.task_cache import get_task_page
+from handlers.task_pages import render_task_page, render_search_page
+from keyboard import Action, CallbackPayload, decode_callback, get_confirm_keyboard
+from rendering import render_task_created, render_task_completed, render_task_deleted
+from states import TaskStates
+from utils.due_dates import DUE_DATE_HINT
+from typing import Awaitable, Callable, Dict, Optional, Set
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+ActionHandler = Callable[[CallbackQuery, FSMContext, CallbackPayload], Awaitable]
 
-@router.callback_query(F.data == "skip_description")
-async def skip_description_callback(callback: CallbackQuery, state: FSMContext):
+# Handler of each button action, see on_action
+_action_handlers: Dict[Action, ActionHandler] = {}
+
+
+def on_action(*actions: Action):
+    """Register the handler of one or more button actions"""
+    def register(handler: ActionHandler) -> ActionHandler:
+        for action in actions:
+            _action_handlers[action] = handler
+        return handler
+    return register
+
+
+@router.callback_query()
+async def dispatch_callback(callback: CallbackQuery, state: FSMContext):
+    """Handle every button press - decode its payload and call the handler of its action
+
+    Malformed payloads and buttons of messages sent before the callback
+    format changed are answered here, before any handler touches the database.
+    """
+    payload = decode_callback(callback.data)
+    handler = _action_handlers.get(payload.action) if payload is not None else None
+    if handler is None:
+        await callback.answer("⌛ This button is out of date - please run the command again.", show_alert=True)
+        return
+    await handler(callback, state, payload)
+
+
+async def get_selection(state: FSMContext) -> Optional[Set[int]]:
+    """Task ids selected in multi-select mode, or None outside of it"""
+    selected = (await state.get_data()).get("selected")
+    return set(selected) if selected is not None else None
+
+
+async def refresh_task_page(
+    callback: CallbackQuery,
+    session,
+    view: str,
+    cursor: Optional[Cursor],
+    selected: Optional[Set[int]] = None
+):
+    """Re-render a paged task list in place, starting from its first task
+
+    Without a cursor the first page is rendered.
+    """
+    page = await get_task_page(session, callback.from_user.id, view, cursor, DIRECTION_FROM)
+    text, keyboard = render_task_page(page, selected)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+
+
+async def refresh_search_page(callback: CallbackQuery, session, state: FSMContext, offset: int) -> bool:
+    """Re-render a /search results page in place
+
+    Returns False when the query is no longer in the FSM data, e.g. after
+    another command cleared it.
+    """
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        return False
+    
+    page = await search_tasks(session, callback.from_user.id, query, offset)
+    text, keyboard = render_search_page(page, query)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    return True
+
+
+async def refresh_list(callback: CallbackQuery, session, state: FSMContext, anchor):
+    """Re-render the list a task button was pressed on - a /list page (cursor) or a /search page (offset)"""
+    if isinstance(anchor, int):
+        await refresh_search_page(callback, session, state, anchor)
+    else:
+        await refresh_task_page(callback, session, VIEW_PENDING, anchor)
+
+
+@on_action(Action.SKIP_DESCRIPTION)
+async def skip_description_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
     """Handle skip description button"""
     # Get title from FSM context
     data = await state.get_data()
@@ -22,20 +108,9 @@ async def skip_description_callback(callback: CallbackQuery, state: FSMContext):
     # Save task to database without description
     async with async_session_maker() as session:
         try:
-            new_task = Task(
-                user_id=callback.from_user.id,
-                title=title,
-                description=None,
-                status=TaskStatus.PENDING
-            )
-            session.add(new_task)
-            await session.commit()
+            await submit_create_task(session, user_id=callback.from_user.id, title=title)
             
-            await callback.message.edit_text(
-                f"✅ Task created successfully!\n\n"
-                f"📝 <b>{title}</b>\n\n"
-                f"Use /list to view all your tasks."
-            )
+            await callback.message.edit_text(render_task_created(title))
             logger.info(f"User {callback.from_user.id} created task without description: {title[:50]}")
             
         except Exception as e:
@@ -51,43 +126,31 @@ async def skip_description_callback(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("complete_"))
-async def complete_task_callback(callback: CallbackQuery):
+@on_action(Action.COMPLETE)
+async def complete_task_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
     """Handle complete task button"""
-    # Extract task_id from callback data
-    task_id = int(callback.data.split("_")[1])
+    # The anchor is set when the button is on a paged list
+    task_id, anchor = payload.id, payload.anchor
     user_id = callback.from_user.id
     
     async with async_session_maker() as session:
         try:
-            # Get the task
-            result = await session.execute(
-                select(Task).where(Task.id == task_id, Task.user_id == user_id)
-            )
-            task = result.scalar_one_or_none()
+            # Mark as completed
+            task = await submit_complete_task(session, user_id, task_id)
             
             if not task:
-                await callback.answer("❌ Task not found!", show_alert=True)
+                await callback.answer("❌ Task not found or already completed!", show_alert=True)
                 return
             
-            # Mark as completed
-            task.status = TaskStatus.COMPLETED
-            task.completed_at = datetime.utcnow()
-            await session.commit()
+            if anchor is not None:
+                # Pressed on a paged /list or /search message - keep the list in place
+                await refresh_list(callback, session, state, anchor)
+                await callback.answer("✅ Task marked as completed!")
+                logger.info(f"User {user_id} completed task {task_id}: {task.title[:50]}")
+                return
             
             # Update message to show it's completed
-            completed_text = f"✅ <b>COMPLETED</b>\n\n"
-            completed_text += f"📝 <s>{task.title}</s>\n"
-            
-            if task.description:
-                desc = task.description[:150]
-                if len(task.description) > 150:
-                    desc += "..."
-                completed_text += f"📋 <s>{desc}</s>\n"
-            
-            completed_text += f"✅ Completed: {task.completed_at.strftime('%Y-%m-%d %H:%M')}"
-            
-            await callback.message.edit_text(completed_text)
+            await callback.message.edit_text(render_task_completed(task))
             await callback.answer("✅ Task marked as completed!")
             
             logger.info(f"User {user_id} completed task {task_id}: {task.title[:50]}")
@@ -97,41 +160,188 @@ async def complete_task_callback(callback: CallbackQuery):
             await callback.answer("❌ Error completing task. Please try again.", show_alert=True)
 
 
-@router.callback_query(F.data.startswith("delete_"))
-async def delete_task_callback(callback: CallbackQuery):
+@on_action(Action.DELETE)
+async def delete_task_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
     """Handle delete task button"""
-    # Extract task_id from callback data
-    task_id = int(callback.data.split("_")[1])
+    # The anchor is set when the button is on a paged list
+    task_id, anchor = payload.id, payload.anchor
     user_id = callback.from_user.id
     
     async with async_session_maker() as session:
         try:
-            # Get the task
-            result = await session.execute(
-                select(Task).where(Task.id == task_id, Task.user_id == user_id)
-            )
-            task = result.scalar_one_or_none()
+            # Delete the task
+            task = await delete_task(session, user_id, task_id)
             
             if not task:
                 await callback.answer("❌ Task not found!", show_alert=True)
                 return
             
             task_title = task.title
-            
-            # Delete the task
-            await session.delete(task)
             await session.commit()
             
+            if anchor is not None:
+                # Pressed on a paged /list or /search message - keep the list in place
+                await refresh_list(callback, session, state, anchor)
+                await callback.answer("🗑 Task deleted!")
+                logger.info(f"User {user_id} deleted task {task_id}: {task_title[:50]}")
+                return
+            
             # Update message to show it's deleted
-            await callback.message.edit_text(
-                f"🗑 <b>DELETED</b>\n\n"
-                f"📝 <s>{task_title}</s>\n\n"
-                f"This task has been permanently removed."
-            )
+            await callback.message.edit_text(render_task_deleted(task_title))
             await callback.answer("🗑 Task deleted!")
             
             logger.info(f"User {user_id} deleted task {task_id}: {task_title[:50]}")
             
         except Exception as e:
             logger.error(f"Error deleting task: {e}")
-            await callback.answer("❌ Error deleting task. Please try again.", show_alert=True)
\ No newline at end of file
+            await callback.answer("❌ Error deleting task. Please try again.", show_alert=True)
+
+
+@on_action(Action.DUE)
+async def due_date_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
+    """Handle due date button - ask when the task is due"""
+    await state.set_state(TaskStates.waiting_for_due_date)
+    await state.update_data(due_task_id=payload.id)
+    await callback.message.answer(
+        "⏰ When is this task due?\n\n"
+        f"{DUE_DATE_HINT}\n\n"
+        "Send <code>none</code> to remove the due date, or /cancel."
+    )
+    await callback.answer()
+
+
+@on_action(Action.PAGE_NEXT, Action.PAGE_PREV)
+async def task_page_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
+    """Handle Prev/Next buttons of the paged /list, /completed and /search views"""
+    view, cursor = payload.view, payload.anchor
+    direction = DIRECTION_NEXT if payload.action == Action.PAGE_NEXT else DIRECTION_PREV
+    
+    # Search pages are ranked, so their cursor is the page offset
+    if (view == VIEW_SEARCH) != isinstance(cursor, int):
+        await callback.answer("❌ Unknown list!", show_alert=True)
+        return
+    
+    async with async_session_maker() as session:
+        try:
+            if view == VIEW_SEARCH:
+                if await refresh_search_page(callback, session, state, cursor):
+                    await callback.answer()
+                else:
+                    await callback.answer("🔍 This search has expired - run /search again.", show_alert=True)
+                return
+            
+            page = await get_task_page(session, callback.from_user.id, view, cursor, direction)
+            text, keyboard = render_task_page(page, await get_selection(state))
+            
+            await callback.message.edit_text(text, reply_markup=keyboard)
+            await callback.answer()
+            
+        except Exception as e:
+            logger.error(f"Error paging tasks: {e}")
+            await callback.answer("❌ Error loading tasks. Please try again.", show_alert=True)
+
+
+@on_action(Action.COMPLETE_ALL)
+async def complete_all_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
+    """Handle Complete all button - ask for confirmation"""
+    await callback.message.edit_text(
+        "✅ Mark <b>all</b> pending tasks as completed?",
+        reply_markup=get_confirm_keyboard(Action.COMPLETE_ALL_CONFIRM, VIEW_PENDING)
+    )
+    await callback.answer()
+
+
+@on_action(Action.CLEAR_COMPLETED)
+async def clear_completed_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
+    """Handle Clear completed button - ask for confirmation"""
+    await callback.message.edit_text(
+        "🧹 Permanently delete <b>all</b> completed tasks?",
+        reply_markup=get_confirm_keyboard(Action.CLEAR_COMPLETED_CONFIRM, VIEW_COMPLETED)
+    )
+    await callback.answer()
+
+
+@on_action(
+    Action.CONFIRM_NO, Action.COMPLETE_ALL_CONFIRM, Action.CLEAR_COMPLETED_CONFIRM,
+    Action.SELECT, Action.CANCEL_SELECTION, Action.TOGGLE,
+    Action.COMPLETE_SELECTED, Action.DELETE_SELECTED
+)
+async def bulk_action_callback(callback: CallbackQuery, state: FSMContext, payload: CallbackPayload):
+    """Handle multi-select mode and the bulk task actions
+
+    Actions:
+        SELECT / CANCEL_SELECTION                      - enter / leave select mode
+        TOGGLE                                         - (un)select one task
+        COMPLETE_SELECTED / DELETE_SELECTED            - apply to the selection
+        COMPLETE_ALL_CONFIRM / CLEAR_COMPLETED_CONFIRM - Yes to a question
+        CONFIRM_NO                                     - No to a question
+    """
+    action = payload.action
+    anchor = payload.anchor
+    user_id = callback.from_user.id
+    
+    async with async_session_maker() as session:
+        try:
+            if action == Action.CONFIRM_NO:
+                await refresh_task_page(callback, session, payload.view, None, await get_selection(state))
+                await callback.answer()
+                return
+            
+            if action == Action.COMPLETE_ALL_CONFIRM:
+                rows = await complete_tasks(session, user_id)
+                await session.commit()
+                await state.update_data(selected=None)
+                await refresh_task_page(callback, session, VIEW_PENDING, None)
+                await callback.answer(f"✅ Completed {len(rows)} tasks!")
+                logger.info(f"User {user_id} completed all {len(rows)} pending tasks")
+                return
+            
+            if action == Action.CLEAR_COMPLETED_CONFIRM:
+                rows = await delete_tasks(session, user_id, status=TaskStatus.COMPLETED)
+                await session.commit()
+                await refresh_task_page(callback, session, VIEW_COMPLETED, None)
+                await callback.answer(f"🧹 Deleted {len(rows)} completed tasks!")
+                logger.info(f"User {user_id} cleared {len(rows)} completed tasks")
+                return
+            
+            selected = await get_selection(state) or set()
+            
+            if action == Action.SELECT:
+                await state.update_data(selected=[])
+                await refresh_task_page(callback, session, VIEW_PENDING, anchor, set())
+                await callback.answer("Tap tasks to select them")
+                return
+            
+            if action == Action.CANCEL_SELECTION:
+                await state.update_data(selected=None)
+                await refresh_task_page(callback, session, VIEW_PENDING, anchor)
+                await callback.answer()
+                return
+            
+            if action == Action.TOGGLE:
+                selected ^= {payload.id}
+                await state.update_data(selected=sorted(selected))
+                await refresh_task_page(callback, session, VIEW_PENDING, anchor, selected)
+                await callback.answer()
+                return
+            
+            if not selected:
+                await callback.answer("Select some tasks first", show_alert=True)
+                return
+            
+            if action == Action.COMPLETE_SELECTED:
+                rows = await complete_tasks(session, user_id, sorted(selected))
+                message = f"✅ Completed {len(rows)} tasks!"
+            else:
+                rows = await delete_tasks(session, user_id, sorted(selected))
+                message = f"🗑 Deleted {len(rows)} tasks!"
+            
+            await session.commit()
+            await state.update_data(selected=None)
+            await refresh_task_page(callback, session, VIEW_PENDING, anchor)
+            await callback.answer(message)
+            logger.info(f"User {user_id} bulk {action.name.lower()}: {len(rows)} tasks")
+            
+        except Exception as e:
+            logger.error(f"Error in bulk action {action.name}: {e}")
+            await callback.answer("❌ Error updating tasks. Please try again.", show_alert=True)
@@ -1,11 +1,17 @@
 from aiogram import Router
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
-from database.models import Task, TaskStatus
 from database.connection import async_session_maker
+from database.mutations import set_task_due
+from database.write_behind import submit_create_task
+from jobs import schedule_reminder
 from states import TaskStates
 from keyboard import get_skip_description_keyboard
+from rendering import LOCAL_TIMEZONE, render_task_created, render_due_set
 from utils import validate_task_title, validate_task_description
+from utils.due_dates import parse_due_date, reminder_time
+from config import REMINDER_LEAD_MINUTES
+from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,21 +64,14 @@ async def process_task_description(message: Message, state: FSMContext):
     # Save task to database
     async with async_session_maker() as session:
         try:
-            new_task = Task(
+            await submit_create_task(
+                session,
                 user_id=message.from_user.id,
                 title=title,
-                description=description.strip() if description else None,
-                status=TaskStatus.PENDING
+                description=description.strip() if description else None
             )
-            session.add(new_task)
-            await session.commit()
             
-            await message.answer(
-                f"✅ Task created successfully!\n\n"
-                f"📝 <b>{title}</b>\n"
-                f"📋 {description[:100]}{'...' if len(description) > 100 else ''}\n\n"
-                f"Use /list to view all your tasks."
-            )
+            await message.answer(render_task_created(title, description))
             logger.info(f"User {message.from_user.id} created task: {title[:50]}")
             
         except Exception as e:
@@ -82,4 +81,49 @@ async def process_task_description(message: Message, state: FSMContext):
             )
     
     # Clear FSM state
-    await state.clear()
\ No newline at end of file
+    await state.clear()
+
+
+@router.message(TaskStates.waiting_for_due_date)
+async def process_due_date(message: Message, state: FSMContext):
+    """Handle due date input"""
+    text = (message.text or "").strip()
+    now = datetime.utcnow()
+    
+    if text.lower() in ("none", "no", "-"):
+        due_at = remind_at = None
+    else:
+        try:
+            due_at = parse_due_date(text, now, LOCAL_TIMEZONE)
+        except ValueError as e:
+            await message.answer(str(e))
+            return
+        remind_at = reminder_time(due_at, now, timedelta(minutes=REMINDER_LEAD_MINUTES))
+    
+    data = await state.get_data()
+    task_id = data.get('due_task_id')
+    user_id = message.from_user.id
+    
+    async with async_session_maker() as session:
+        try:
+            task = await set_task_due(session, user_id, task_id, due_at, remind_at)
+            
+            if not task:
+                await message.answer("❌ Task not found or already completed!")
+            else:
+                await session.commit()
+                schedule_reminder(task.id, user_id, task.remind_at)
+                
+                await message.answer(render_due_set(task))
+                logger.info(f"User {user_id} set due date of task {task_id} to {due_at}")
+            
+        except Exception as e:
+            logger.error(f"Error setting due date: {e}")
+            await message.answer(
+                "❌ An error occurred while setting the due date. Please try again."
+            )
+    
+    # Leave the state but keep other data, e.g. the /search query
+    data.pop('due_task_id', None)
+    await state.set_data(data)
+    await state.set_state(None)
@@ -0,0 +1,70 @@
+from typing import Optional, Set, Tuple
+from aiogram.types import InlineKeyboardMarkup
+from database.models import TaskStatus
+from database.queries import (
+    PAGE_SIZES, TaskPage, VIEW_PENDING, VIEW_COMPLETED, VIEW_SEARCH, row_cursor
+)
+from keyboard import get_task_page_keyboard
+from rendering import clip, render_completed_tasks, render_pending_tasks, render_search_results
+
+EMPTY_TEXTS = {
+    VIEW_PENDING: (
+        "📝 You have no pending tasks!\n\n"
+        "Use /add to create your first task."
+    ),
+    VIEW_COMPLETED: (
+        "✅ You haven't completed any tasks yet!\n\n"
+        "Use /list to view your pending tasks."
+    ),
+}
+
+
+def render_task_page(
+    page: TaskPage,
+    selected: Optional[Set[int]] = None
+) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Render a page of tasks as a single message text and its keyboard
+
+    `selected` puts the pending view in multi-select mode.
+    """
+    if not page.rows:
+        return EMPTY_TEXTS[page.view], None
+
+    if page.view == VIEW_COMPLETED:
+        text = render_completed_tasks(page.rows, page.total)
+    else:
+        text = render_pending_tasks(page.rows, page.total)
+        if selected is not None:
+            text += f"☑ <b>Select tasks</b> - {len(selected)} selected\n"
+
+    first = row_cursor(page.view, page.rows[0])
+    last = row_cursor(page.view, page.rows[-1])
+
+    keyboard = get_task_page_keyboard(
+        view=page.view,
+        task_ids=[task.id for task in page.rows],
+        anchor=first if page.view == VIEW_PENDING else None,
+        prev_cursor=first if page.has_prev else None,
+        next_cursor=last if page.has_next else None,
+        selected=selected if page.view == VIEW_PENDING else None
+    )
+    return text.rstrip(), keyboard
+
+
+def render_search_page(page: TaskPage, query: str) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Render a page of /search results with task actions and Prev/Next by offset"""
+    if not page.rows:
+        return f"🔍 No tasks match “{clip(query, 50)}”.\n\nTry fewer or shorter words.", None
+
+    text = render_search_results(page.rows, page.total, query)
+    size = PAGE_SIZES[VIEW_SEARCH]
+    keyboard = get_task_page_keyboard(
+        view=VIEW_SEARCH,
+        task_ids=[task.id for task in page.rows],
+        anchor=page.offset,
+        prev_cursor=max(page.offset - size, 0) if page.has_prev else None,
+        next_cursor=page.offset + size if page.has_next else None,
+        completed_ids={task.id for task in page.rows if task.status == TaskStatus.COMPLETED},
+        bulk_actions=False
+    )
+    return text.rstrip(), keyboard
@@ -0,0 +1,156 @@
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, FSInputFile
+from aiogram.fsm.context import FSMContext
+from database.connection import async_session_maker
+from database.mutations import import_tasks
+from database.queries import stream_user_tasks
+from database.users import register_user
+from rendering import render_import_result
+from states import TaskStates
+from utils.task_files import (
+    FORMAT_CSV, FORMAT_JSON, RecordError, TaskFileError, TaskFileWriter, detect_format, read_tasks
+)
+from config import IMPORT_MAX_FILE_SIZE, IMPORT_MAX_TASKS, IMPORT_BATCH_SIZE, EXPORT_BATCH_SIZE
+from datetime import datetime
+import io
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Skipped rows listed in the /import summary
+MAX_REPORTED_ERRORS = 5
+
+
+@router.message(Command("import"))
+async def import_command(message: Message, state: FSMContext):
+    """Handle /import command - ask for the file to import"""
+    await state.set_state(TaskStates.waiting_for_import_file)
+    await message.answer(
+        "📥 Send me a file with your tasks:\n\n"
+        "• <b>CSV</b> with a header row\n"
+        "• <b>JSON</b> - an array of objects, or one object per line (.jsonl)\n\n"
+        "Only <code>title</code> is required; <code>description</code>, <code>status</code> "
+        "(pending/completed), <code>created_at</code> and <code>completed_at</code> are optional. "
+        "Files from /export can be imported as they are.\n\n"
+        "Use /cancel to abort."
+    )
+    logger.info(f"User {message.from_user.id} started an import")
+
+
+@router.message(TaskStates.waiting_for_import_file, F.document)
+async def import_file(message: Message, state: FSMContext, bot: Bot):
+    """Handle the uploaded import file"""
+    document = message.document
+    user_id = message.from_user.id
+
+    file_format = detect_format(document.file_name)
+    if file_format is None:
+        await message.answer("❌ Please send a .csv, .json or .jsonl file, or /cancel.")
+        return
+
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        await message.answer(
+            f"❌ The file is too large. Maximum is {IMPORT_MAX_FILE_SIZE // (1024 * 1024)} MB."
+        )
+        return
+
+    await state.clear()
+
+    imported = 0
+    skipped = 0
+    errors = []
+    note = None
+
+    async with async_session_maker() as session:
+        try:
+            await register_user(session, user_id, message.from_user.username, message.from_user.first_name or "User")
+
+            with tempfile.TemporaryFile() as file:
+                await bot.download(document, destination=file)
+                file.seek(0)
+                stream = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+
+                batch = []
+                try:
+                    for record in read_tasks(stream, file_format):
+                        if isinstance(record, RecordError):
+                            skipped += 1
+                            if len(errors) < MAX_REPORTED_ERRORS:
+                                errors.append(record)
+                            continue
+
+                        if imported + len(batch) >= IMPORT_MAX_TASKS:
+                            note = f"⚠️ Stopped after {IMPORT_MAX_TASKS} tasks - split the file to import more."
+                            break
+
+                        batch.append(record)
+                        if len(batch) >= IMPORT_BATCH_SIZE:
+                            # One transaction per batch keeps the database lock short
+                            imported += await import_tasks(session, user_id, batch)
+                            await session.commit()
+                            batch = []
+
+                except (TaskFileError, UnicodeDecodeError) as e:
+                    reason = str(e) if isinstance(e, TaskFileError) else "The file is not UTF-8 text."
+                    note = f"⚠️ Stopped reading the file: {reason}"
+
+                if batch:
+                    imported += await import_tasks(session, user_id, batch)
+                    await session.commit()
+
+            await message.answer(render_import_result(imported, skipped, errors, note))
+            logger.info(f"User {user_id} imported {imported} tasks ({skipped} skipped) from {file_format}")
+
+        except Exception as e:
+            logger.error(f"Error importing tasks: {e}")
+            await message.answer(
+                f"❌ An error occurred while importing. {imported} tasks were imported before it."
+            )
+
+
+@router.message(TaskStates.waiting_for_import_file)
+async def import_expects_file(message: Message):
+    """Handle anything but a document while waiting for the import file"""
+    await message.answer("📎 Please send the file as a document, or /cancel.")
+
+
+@router.message(Command("export"))
+async def export_command(message: Message, state: FSMContext, command: CommandObject):
+    """Handle /export command - send all tasks as a CSV or JSON file"""
+    await state.clear()  # Clear any active state
+
+    user_id = message.from_user.id
+    file_format = FORMAT_JSON if (command.args or "").strip().lower() == FORMAT_JSON else FORMAT_CSV
+
+    # Rows are written as they arrive from the cursor and the file is sent from disk
+    file = tempfile.NamedTemporaryFile("w", suffix=f".{file_format}", encoding="utf-8", newline="", delete=False)
+    try:
+        with file:
+            writer = TaskFileWriter(file, file_format)
+            async with async_session_maker() as session:
+                async for row in stream_user_tasks(session, user_id, EXPORT_BATCH_SIZE):
+                    writer.write(row)
+            writer.close()
+
+        if writer.count == 0:
+            await message.answer("📭 You have no tasks to export.\n\nUse /add to create one.")
+            return
+
+        file_name = f"tasks-{datetime.utcnow():%Y-%m-%d}.{file_format}"
+        await message.answer_document(
+            FSInputFile(file.name, filename=file_name),
+            caption=f"📦 {writer.count} tasks. Send this file to /import to restore them."
+        )
+        logger.info(f"User {user_id} exported {writer.count} tasks as {file_format}")
+
+    except Exception as e:
+        logger.error(f"Error exporting tasks: {e}")
+        await message.answer("❌ An error occurred while exporting your tasks. Please try again.")
+
+    finally:
+        os.unlink(file.name)
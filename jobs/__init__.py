@@ -0,0 +1,19 @@
+from jobs.archiver import archive_completed_tasks, run_archiver
+from jobs.broadcasts import (
+    create_broadcast, cancel_broadcast, start_broadcast, run_broadcast_resumer, stop_broadcasts
+)
+from jobs.reminders import ReminderScheduler, start_reminders, stop_reminders, schedule_reminder
+
+__all__ = [
+    'archive_completed_tasks',
+    'run_archiver',
+    'ReminderScheduler',
+    'start_reminders',
+    'stop_reminders',
+    'schedule_reminder',
+    'create_broadcast',
+    'cancel_broadcast',
+    'start_broadcast',
+    'run_broadcast_resumer',
+    'stop_broadcasts'
+]
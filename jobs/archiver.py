@@ -0,0 +1,76 @@
+"""Background job moving old completed tasks into tasks_archive.
+
+Keeps the tasks table (and its indexes) down to pending tasks plus recently
+completed ones. Each batch is copied and deleted in one transaction, so a
+task is always in exactly one of the two tables. /completed and /stats read
+both, so users do not notice when their history moves.
+"""
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import delete, select
+from database.connection import async_session_maker
+from database.models import Task, TaskArchive, TaskStatus
+import logging
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVE_COLUMNS = ("id", "user_id", "title", "description", "created_at", "completed_at")
+
+
+async def _archive_batch(cutoff: datetime, after_id: int, batch_size: int) -> list:
+    """Move one batch of tasks completed before `cutoff`, returning their ids"""
+    async with async_session_maker() as session:
+        ids = list(await session.scalars(
+            select(Task.id)
+            .where(
+                Task.id > after_id,
+                Task.status == TaskStatus.COMPLETED,
+                Task.completed_at < cutoff
+            )
+            .order_by(Task.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ))
+        if not ids:
+            return ids
+
+        await session.execute(
+            TaskArchive.__table__.insert().from_select(
+                list(_ARCHIVE_COLUMNS),
+                select(*(Task.__table__.c[name] for name in _ARCHIVE_COLUMNS)).where(Task.id.in_(ids))
+            )
+        )
+        await session.execute(
+            delete(Task).where(Task.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return ids
+
+
+async def archive_completed_tasks(older_than: timedelta, batch_size: int = 1000) -> int:
+    """Move tasks completed more than `older_than` ago, returning how many moved"""
+    cutoff = datetime.utcnow() - older_than
+    moved = 0
+    after_id = 0
+
+    while True:
+        ids = await _archive_batch(cutoff, after_id, batch_size)
+        moved += len(ids)
+        if len(ids) < batch_size:
+            return moved
+        after_id = ids[-1]
+        # Let user traffic in between batches
+        await asyncio.sleep(0)
+
+
+async def run_archiver(after_days: int, batch_size: int, interval: float):
+    """Archive old completed tasks every `interval` seconds until cancelled"""
+    older_than = timedelta(days=after_days)
+    while True:
+        try:
+            moved = await archive_completed_tasks(older_than, batch_size)
+            if moved:
+                logger.info(f"Archived {moved} tasks completed more than {after_days} days ago")
+        except Exception as e:
+            logger.error(f"Error archiving completed tasks: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,254 @@
+"""Admin broadcasts: one message delivered to every user.
+
+Users are read in user_id order a batch at a time (keyset pagination), so
+memory use does not depend on the size of the user base. Sends are paced
+by a token bucket at BROADCAST_RATE; the bot's outbound limiter still caps
+everything at the global rate and retries after flood waits.
+
+After every batch the progress (last user id and counters) is saved with a
+fresh heartbeat. A broadcast whose process died stops getting heartbeats
+and is resumed from its last saved batch by `run_broadcast_resumer` - users
+of the interrupted batch may get the message twice, nobody misses it.
+Users who blocked the bot are marked in users.blocked_at and skipped by
+later broadcasts.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from sqlalchemy import func, select, update
+from config import (
+    BROADCAST_RATE, BROADCAST_BATCH_SIZE, BROADCAST_PROGRESS_INTERVAL, BROADCAST_STALE_AFTER
+)
+from database.connection import async_session_maker
+from database.models import Broadcast, BroadcastStatus, User
+from keyboard import get_broadcast_keyboard
+from rendering import render_broadcast_progress
+from utils.rate_limit import TokenBucket
+import logging
+
+logger = logging.getLogger(__name__)
+
+DELIVERED = "delivered"
+FAILED = "failed"
+BLOCKED = "blocked"
+
+# Broadcasts sent by this process
+_running: Dict[int, asyncio.Task] = {}
+
+
+async def create_broadcast(
+    created_by: int,
+    progress_message_id: int,
+    text: Optional[str] = None,
+    source_chat_id: Optional[int] = None,
+    source_message_id: Optional[int] = None
+) -> Broadcast:
+    """Store a new running broadcast of a text or of a message to copy"""
+    async with async_session_maker() as session:
+        total = await session.scalar(select(func.count()).select_from(User).where(User.blocked_at.is_(None)))
+        broadcast = Broadcast(
+            created_by=created_by,
+            text=text,
+            source_chat_id=source_chat_id,
+            source_message_id=source_message_id,
+            progress_message_id=progress_message_id,
+            status=BroadcastStatus.RUNNING,
+            total=total or 0,
+            last_user_id=0,
+            delivered=0,
+            failed=0,
+            blocked=0,
+            heartbeat_at=datetime.utcnow()
+        )
+        session.add(broadcast)
+        await session.commit()
+        return broadcast
+
+
+async def cancel_broadcast(broadcast_id: int) -> Optional[Broadcast]:
+    """Stop a running broadcast, returning it, or None if it is not running"""
+    async with async_session_maker() as session:
+        broadcast = (await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.status == BroadcastStatus.RUNNING)
+            .values(status=BroadcastStatus.CANCELLED, finished_at=datetime.utcnow())
+            .returning(Broadcast)
+        )).scalar_one_or_none()
+        await session.commit()
+        return broadcast
+
+
+async def _deliver(bot: Bot, broadcast: Broadcast, user_id: int, bucket: TokenBucket) -> str:
+    await bucket.acquire()
+    try:
+        if broadcast.text is not None:
+            await bot.send_message(user_id, broadcast.text, parse_mode=None)
+        else:
+            await bot.copy_message(user_id, broadcast.source_chat_id, broadcast.source_message_id)
+        return DELIVERED
+    except TelegramForbiddenError:
+        return BLOCKED
+    except TelegramBadRequest as e:
+        logger.info(f"Broadcast {broadcast.id} not delivered to {user_id}: {e}")
+        return FAILED
+    except Exception as e:
+        logger.error(f"Broadcast {broadcast.id} failed for {user_id}: {e}")
+        return FAILED
+
+
+async def _report(bot: Bot, broadcast: Broadcast):
+    """Edit the progress message in the admin's chat"""
+    running = broadcast.status == BroadcastStatus.RUNNING
+    try:
+        await bot.edit_message_text(
+            render_broadcast_progress(broadcast),
+            chat_id=broadcast.created_by,
+            message_id=broadcast.progress_message_id,
+            reply_markup=get_broadcast_keyboard(broadcast.id) if running else None
+        )
+    except TelegramBadRequest:
+        pass  # Not modified, or the admin deleted it
+
+
+async def _save_progress(broadcast: Broadcast, blocked_ids: List[int], finished: bool) -> bool:
+    """Save the counters after a batch, False if the broadcast is no longer ours
+
+    It is not ours once it was cancelled, or resumed elsewhere because this
+    process stalled for longer than BROADCAST_STALE_AFTER.
+    """
+    now = datetime.utcnow()
+    values = {
+        "last_user_id": broadcast.last_user_id,
+        "delivered": broadcast.delivered,
+        "failed": broadcast.failed,
+        "blocked": broadcast.blocked,
+        "heartbeat_at": now,
+    }
+    if finished:
+        values.update(status=BroadcastStatus.FINISHED, finished_at=now)
+
+    async with async_session_maker() as session:
+        if blocked_ids:
+            await session.execute(
+                update(User).where(User.user_id.in_(blocked_ids)).values(blocked_at=now)
+            )
+        result = await session.execute(
+            update(Broadcast)
+            .where(
+                Broadcast.id == broadcast.id,
+                Broadcast.status == BroadcastStatus.RUNNING,
+                Broadcast.heartbeat_at == broadcast.heartbeat_at
+            )
+            .values(**values)
+        )
+        await session.commit()
+
+    if result.rowcount == 0:
+        return False
+    broadcast.heartbeat_at = now
+    if finished:
+        broadcast.status = BroadcastStatus.FINISHED
+    return True
+
+
+async def run_broadcast(bot: Bot, broadcast: Broadcast):
+    """Send a broadcast from its saved progress to the last user"""
+    bucket = TokenBucket(BROADCAST_RATE)
+    reported = time.monotonic()
+    logger.info(f"Broadcast {broadcast.id} sending after user {broadcast.last_user_id}")
+
+    while True:
+        async with async_session_maker() as session:
+            user_ids = list(await session.scalars(
+                select(User.user_id)
+                .where(User.user_id > broadcast.last_user_id, User.blocked_at.is_(None))
+                .order_by(User.user_id)
+                .limit(BROADCAST_BATCH_SIZE)
+            ))
+
+        blocked_ids = []
+        if user_ids:
+            results = await asyncio.gather(*(_deliver(bot, broadcast, user_id, bucket) for user_id in user_ids))
+            for user_id, result in zip(user_ids, results):
+                if result == BLOCKED:
+                    blocked_ids.append(user_id)
+            broadcast.delivered += results.count(DELIVERED)
+            broadcast.failed += results.count(FAILED)
+            broadcast.blocked += len(blocked_ids)
+            broadcast.last_user_id = user_ids[-1]
+
+        finished = len(user_ids) < BROADCAST_BATCH_SIZE
+        if not await _save_progress(broadcast, blocked_ids, finished):
+            logger.info(f"Broadcast {broadcast.id} was cancelled or taken over - stopping")
+            return
+
+        if finished:
+            await _report(bot, broadcast)
+            logger.info(
+                f"Broadcast {broadcast.id} finished: {broadcast.delivered} delivered, "
+                f"{broadcast.failed} failed, {broadcast.blocked} blocked"
+            )
+            return
+
+        if time.monotonic() - reported >= BROADCAST_PROGRESS_INTERVAL:
+            reported = time.monotonic()
+            await _report(bot, broadcast)
+
+
+def start_broadcast(bot: Bot, broadcast: Broadcast):
+    """Run a broadcast in the background of this process"""
+    if broadcast.id in _running:
+        return
+
+    async def _run():
+        try:
+            await run_broadcast(bot, broadcast)
+        except Exception as e:
+            # The heartbeat goes stale and the resumer takes it up again
+            logger.error(f"Error sending broadcast {broadcast.id}: {e}")
+        finally:
+            _running.pop(broadcast.id, None)
+
+    _running[broadcast.id] = asyncio.create_task(_run())
+
+
+async def resume_stale_broadcasts(bot: Bot) -> int:
+    """Take over running broadcasts whose process stopped, returning how many"""
+    now = datetime.utcnow()
+    async with async_session_maker() as session:
+        broadcasts = list((await session.execute(
+            update(Broadcast)
+            .where(
+                Broadcast.status == BroadcastStatus.RUNNING,
+                Broadcast.heartbeat_at < now - timedelta(seconds=BROADCAST_STALE_AFTER)
+            )
+            .values(heartbeat_at=now)
+            .returning(Broadcast)
+        )).scalars())
+        await session.commit()
+
+    for broadcast in broadcasts:
+        logger.info(f"Resuming broadcast {broadcast.id} after user {broadcast.last_user_id}")
+        start_broadcast(bot, broadcast)
+    return len(broadcasts)
+
+
+async def run_broadcast_resumer(bot: Bot, interval: float):
+    """Resume broadcasts left behind by stopped processes every `interval` seconds"""
+    while True:
+        try:
+            await resume_stale_broadcasts(bot)
+        except Exception as e:
+            logger.error(f"Error resuming broadcasts: {e}")
+        await asyncio.sleep(interval)
+
+
+async def stop_broadcasts():
+    """Cancel the broadcasts sent by this process; they resume once stale"""
+    tasks = list(_running.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,246 @@
+"""Reminder scheduler sending due date reminders at their exact time.
+
+The table is read once per window: every outstanding reminder due before
+the end of the window is loaded into an in-memory heap, and the scheduler
+sleeps until the earliest one (or until a reminder set meanwhile becomes
+the earliest). At the end of the window the next one is loaded, which is
+also all a restart has to do - reminders missed while the bot was down are
+overdue and go out right away.
+
+A reminder is claimed by clearing tasks.remind_at with an UPDATE that only
+matches while it is still due, so heap entries never need to be removed:
+entries of tasks that were completed, deleted or rescheduled simply claim
+nothing, and two processes never send the same reminder. Claimed
+reminders are handed to sender tasks through a bounded queue, so slow
+sends hold back reminders, not update handling.
+
+Each process schedules the reminders of its own users (`user_id % shards`),
+the same split the worker pool uses for updates - reminders set by a
+handler are then always in the heap of the process that handled it.
+"""
+import asyncio
+import heapq
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramBadRequest
+from sqlalchemy import select, tuple_, update
+from database.connection import async_session_maker
+from database.models import Task, TaskStatus
+from keyboard import get_task_actions_keyboard
+from rendering import render_reminder
+import logging
+
+logger = logging.getLogger(__name__)
+
+_scheduler: Optional["ReminderScheduler"] = None
+
+
+def _timestamp(value: datetime) -> float:
+    """Epoch seconds of a naive UTC datetime"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class ReminderScheduler:
+    """Loads reminders window by window into a heap and fires them on time"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        window: float,
+        max_loaded: int,
+        batch_size: int,
+        senders: int,
+        shard: int = 0,
+        shards: int = 1
+    ):
+        self.bot = bot
+        self.window = window
+        self.max_loaded = max_loaded
+        self.batch_size = batch_size
+        self.senders = senders
+        self.shard = shard
+        self.shards = shards
+        # (remind_at epoch seconds, task id)
+        self._heap: List[Tuple[float, int]] = []
+        self._window_end = 0.0
+        self._wakeup = asyncio.Event()
+        self._outbox: asyncio.Queue = asyncio.Queue(maxsize=batch_size)
+        self._tasks: List[asyncio.Task] = []
+        self.sent = 0
+
+    def owns(self, user_id: int) -> bool:
+        return user_id % self.shards == self.shard
+
+    def schedule(self, task_id: int, user_id: int, remind_at: datetime):
+        """Add a reminder set after the current window was loaded"""
+        if not self.owns(user_id):
+            return
+        at = _timestamp(remind_at)
+        if at >= self._window_end:
+            return  # Loaded together with its window
+        heapq.heappush(self._heap, (at, task_id))
+        if self._heap[0][1] == task_id:
+            self._wakeup.set()
+
+    def _filters(self):
+        filters = [Task.remind_at.is_not(None), Task.status == TaskStatus.PENDING]
+        if self.shards > 1:
+            filters.append(Task.user_id % self.shards == self.shard)
+        return filters
+
+    async def _load_window(self, now: float):
+        """Load reminders due before the end of the next window
+
+        With more than max_loaded of them the window ends early, at the last
+        reminder that fit.
+        """
+        window_end = datetime.utcfromtimestamp(now + self.window)
+        filters = self._filters()
+        after = None
+        loaded = 0
+        # Reminders set while loading go into the heap as well; one that is
+        # also loaded fires once, the second entry claims nothing
+        self._window_end = now + self.window
+
+        try:
+            async with async_session_maker() as session:
+                while loaded < self.max_loaded:
+                    limit = min(self.batch_size, self.max_loaded - loaded)
+                    query = (
+                        select(Task.remind_at, Task.id)
+                        .where(*filters, Task.remind_at < window_end)
+                        .order_by(Task.remind_at, Task.id)
+                        .limit(limit)
+                    )
+                    if after is not None:
+                        query = query.where(tuple_(Task.remind_at, Task.id) > after)
+                    rows = (await session.execute(query)).all()
+                    for remind_at, task_id in rows:
+                        heapq.heappush(self._heap, (_timestamp(remind_at), task_id))
+                    loaded += len(rows)
+                    if len(rows) < limit:
+                        break
+                    after = tuple(rows[-1])
+                else:
+                    # Later reminders at the same timestamp are claimed with the next window
+                    window_end = after[0] if after else datetime.utcfromtimestamp(now)
+                    logger.warning(f"Over {self.max_loaded} reminders due, window cut short at {window_end}")
+        except Exception:
+            self._window_end = 0.0  # Load again on the next round
+            raise
+
+        self._window_end = max(_timestamp(window_end), now)
+        if loaded:
+            logger.info(f"Loaded {loaded} reminders due before {window_end:%Y-%m-%d %H:%M:%S}")
+
+    async def _claim(self, task_ids: List[int], now: datetime) -> list:
+        """Take reminders that are still due, so no one else sends them"""
+        async with async_session_maker() as session:
+            rows = (await session.execute(
+                update(Task)
+                .where(*self._filters(), Task.id.in_(task_ids), Task.remind_at <= now)
+                .values(remind_at=None)
+                .returning(Task.id, Task.user_id, Task.title, Task.due_at)
+                .execution_options(synchronize_session=False)
+            )).all()
+            await session.commit()
+        return rows
+
+    async def _fire_due(self):
+        """Claim every reminder that is due and queue it for sending"""
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap))
+
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            try:
+                rows = await self._claim([task_id for _, task_id in batch], datetime.utcfromtimestamp(now))
+            except Exception:
+                # Put the unclaimed ones back for the next round
+                for entry in due[start:]:
+                    heapq.heappush(self._heap, entry)
+                raise
+            for row in rows:
+                await self._outbox.put(row)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._fire_due()
+                now = time.time()
+                if now >= self._window_end:
+                    await self._load_window(now)
+                    continue
+            except Exception as e:
+                logger.error(f"Error scheduling reminders: {e}")
+                await asyncio.sleep(5)
+                continue
+
+            next_at = min(self._heap[0][0], self._window_end) if self._heap else self._window_end
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(next_at - time.time(), 0))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self):
+        while True:
+            row = await self._outbox.get()
+            try:
+                await self.bot.send_message(
+                    row.user_id,
+                    render_reminder(row),
+                    reply_markup=get_task_actions_keyboard(row.id)
+                )
+                self.sent += 1
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                logger.info(f"Reminder for task {row.id} not delivered to {row.user_id}: {e}")
+            except Exception as e:
+                logger.error(f"Error sending reminder for task {row.id}: {e}")
+
+    def start(self):
+        self._tasks.append(asyncio.create_task(self._run()))
+        for _ in range(self.senders):
+            self._tasks.append(asyncio.create_task(self._send()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+
+def start_reminders(bot: Bot, window: float, max_loaded: int, batch_size: int, senders: int,
+                    shard: int = 0, shards: int = 1) -> ReminderScheduler:
+    """Start the scheduler of this process"""
+    global _scheduler
+    _scheduler = ReminderScheduler(bot, window, max_loaded, batch_size, senders, shard, shards)
+    _scheduler.start()
+    return _scheduler
+
+
+async def stop_reminders():
+    """Stop the scheduler of this process, dropping reminders not sent yet
+
+    Claimed reminders still in the queue are lost; everything unclaimed is
+    loaded again on the next start.
+    """
+    global _scheduler
+    if _scheduler is not None:
+        await _scheduler.stop()
+        _scheduler = None
+
+
+def schedule_reminder(task_id: int, user_id: int, remind_at: Optional[datetime]):
+    """Tell the scheduler about a committed reminder time
+
+    Call after the commit. Without a scheduler in this process the reminder
+    is still picked up with its window, just not before the current one ends.
+    """
+    if _scheduler is not None and remind_at is not None:
+        _scheduler.schedule(task_id, user_id, remind_at)
+
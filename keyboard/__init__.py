@@ -1,3 +1,25 @@
-from keyboard.task_keyboards import get_skip_description_keyboard, get_task_actions_keyboard
+from keyboard.callback_codec import (
+    Action,
+    CallbackPayload,
+    encode_callback,
+    decode_callback
+)
+from keyboard.task_keyboards import (
+    get_skip_description_keyboard,
+    get_task_actions_keyboard,
+    get_task_page_keyboard,
+    get_confirm_keyboard,
+    get_broadcast_keyboard
+)
 
-__all__ = ['get_skip_description_keyboard', 'get_task_actions_keyboard']
\ No newline at end of file
+__all__ = [
+    'Action',
+    'CallbackPayload',
+    'encode_callback',
+    'decode_callback',
+    'get_skip_description_keyboard',
+    'get_task_actions_keyboard',
+    'get_task_page_keyboard',
+    'get_confirm_keyboard',
+    'get_broadcast_keyboard'
+]
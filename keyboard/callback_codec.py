@@ -0,0 +1,203 @@
+"""Compact, versioned callback data for inline buttons.
+
+Telegram allows at most 64 bytes of callback data per button. A payload is
+packed as bytes and sent as unpadded URL-safe base64:
+
+    version | action | fields | varint values of the present fields
+
+`fields` is a bit set of the optional values that follow, in this order:
+an id (task or broadcast), the list view, and the position of the list the
+button is on - either a keyset cursor (microseconds since the epoch,
+zigzag-encoded, plus the task id) or a /search result offset. Integers are
+unsigned LEB128 varints, so a task button on a list page takes about 25
+characters and the largest possible payload still fits the limit.
+
+`decode_callback` returns None for anything that is not a well-formed
+payload of the current version, e.g. buttons of messages sent before the
+format changed; handlers never see such data.
+"""
+import base64
+import binascii
+from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from database.queries import Cursor, VIEW_PENDING, VIEW_COMPLETED, VIEW_SEARCH
+
+# Bump when the layout changes; buttons of the old version are then rejected
+CODEC_VERSION = 1
+
+# Telegram's limit on callback_data
+MAX_CALLBACK_DATA = 64
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Where a list message starts: a keyset cursor, or a /search result offset
+Anchor = Union[Cursor, int]
+
+
+class Action(IntEnum):
+    """What a button does - one byte of the payload, never renumber"""
+    SKIP_DESCRIPTION = 1
+    COMPLETE = 2
+    DELETE = 3
+    DUE = 4
+    PAGE_NEXT = 5
+    PAGE_PREV = 6
+    SELECT = 7
+    CANCEL_SELECTION = 8
+    TOGGLE = 9
+    COMPLETE_SELECTED = 10
+    DELETE_SELECTED = 11
+    COMPLETE_ALL = 12
+    COMPLETE_ALL_CONFIRM = 13
+    CLEAR_COMPLETED = 14
+    CLEAR_COMPLETED_CONFIRM = 15
+    CONFIRM_NO = 16
+    CANCEL_BROADCAST = 17
+
+
+class CallbackPayload(NamedTuple):
+    """Decoded callback data of a button"""
+    action: Action
+    id: Optional[int] = None
+    view: Optional[str] = None
+    anchor: Optional[Anchor] = None
+
+
+# Bits of the fields byte
+_HAS_ID = 1
+_HAS_VIEW = 2
+_HAS_CURSOR = 4
+_HAS_OFFSET = 8
+_HAS_ANCHOR = _HAS_CURSOR | _HAS_OFFSET
+
+# The fields each action must carry and may carry; of the anchor bits one is enough
+_LAYOUTS: Dict[Action, Tuple[int, int]] = {
+    Action.SKIP_DESCRIPTION: (0, 0),
+    Action.COMPLETE: (_HAS_ID, _HAS_ID | _HAS_ANCHOR),
+    Action.DELETE: (_HAS_ID, _HAS_ID | _HAS_ANCHOR),
+    Action.DUE: (_HAS_ID, _HAS_ID),
+    Action.PAGE_NEXT: (_HAS_VIEW | _HAS_ANCHOR, _HAS_VIEW | _HAS_ANCHOR),
+    Action.PAGE_PREV: (_HAS_VIEW | _HAS_ANCHOR, _HAS_VIEW | _HAS_ANCHOR),
+    Action.SELECT: (_HAS_CURSOR, _HAS_CURSOR),
+    Action.CANCEL_SELECTION: (_HAS_CURSOR, _HAS_CURSOR),
+    Action.TOGGLE: (_HAS_ID | _HAS_CURSOR, _HAS_ID | _HAS_CURSOR),
+    Action.COMPLETE_SELECTED: (_HAS_CURSOR, _HAS_CURSOR),
+    Action.DELETE_SELECTED: (_HAS_CURSOR, _HAS_CURSOR),
+    Action.COMPLETE_ALL: (0, 0),
+    Action.COMPLETE_ALL_CONFIRM: (0, 0),
+    Action.CLEAR_COMPLETED: (0, 0),
+    Action.CLEAR_COMPLETED_CONFIRM: (0, 0),
+    Action.CONFIRM_NO: (_HAS_VIEW, _HAS_VIEW),
+    Action.CANCEL_BROADCAST: (_HAS_ID, _HAS_ID),
+}
+
+_VIEWS = (VIEW_PENDING, VIEW_COMPLETED, VIEW_SEARCH)
+_VIEW_CODES = {view: code for code, view in enumerate(_VIEWS)}
+
+
+def _write_varint(out: bytearray, value: int):
+    if value < 0:
+        raise ValueError(f"Negative value {value} in callback data")
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """The varint at `pos` and the position after it; IndexError past the end"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+        if shift > 63:
+            raise ValueError("Varint too long")
+
+
+def encode_callback(
+    action: Action,
+    id: Optional[int] = None,
+    view: Optional[str] = None,
+    anchor: Optional[Anchor] = None
+) -> str:
+    """Pack a button's action and arguments into callback data"""
+    fields = 0
+    values: List[int] = []
+    if id is not None:
+        fields |= _HAS_ID
+        values.append(id)
+    if view is not None:
+        fields |= _HAS_VIEW
+        values.append(_VIEW_CODES[view])
+    if isinstance(anchor, tuple):
+        fields |= _HAS_CURSOR
+        timestamp, task_id = anchor
+        micros = (timestamp - _EPOCH) // timedelta(microseconds=1)
+        values.append(micros << 1 if micros >= 0 else (-micros << 1) - 1)
+        values.append(task_id)
+    elif anchor is not None:
+        fields |= _HAS_OFFSET
+        values.append(anchor)
+
+    data = bytearray((CODEC_VERSION, action, fields))
+    for value in values:
+        _write_varint(data, value)
+
+    encoded = base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+    if len(encoded) > MAX_CALLBACK_DATA:
+        raise ValueError(f"Callback data for {action.name} is {len(encoded)} bytes")
+    return encoded
+
+
+def decode_callback(data: Optional[str]) -> Optional[CallbackPayload]:
+    """Unpack callback data made by encode_callback, None if it is malformed or stale"""
+    if not data or len(data) > MAX_CALLBACK_DATA or "=" in data:
+        return None
+    try:
+        raw = base64.b64decode(data + "=" * (-len(data) % 4), altchars=b"-_", validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    if len(raw) < 3 or raw[0] != CODEC_VERSION:
+        return None
+
+    try:
+        action = Action(raw[1])
+    except ValueError:
+        return None
+    fields = raw[2]
+    required, allowed = _LAYOUTS[action]
+    if (
+        fields & ~allowed
+        or required & ~_HAS_ANCHOR & ~fields
+        or required & _HAS_ANCHOR and not fields & _HAS_ANCHOR
+        or fields & _HAS_ANCHOR == _HAS_ANCHOR
+    ):
+        return None
+
+    id = view = anchor = None
+    pos = 3
+    try:
+        if fields & _HAS_ID:
+            id, pos = _read_varint(raw, pos)
+        if fields & _HAS_VIEW:
+            code, pos = _read_varint(raw, pos)
+            view = _VIEWS[code]
+        if fields & _HAS_CURSOR:
+            zigzag, pos = _read_varint(raw, pos)
+            task_id, pos = _read_varint(raw, pos)
+            micros = zigzag >> 1 if not zigzag & 1 else -((zigzag + 1) >> 1)
+            anchor = (_EPOCH + timedelta(microseconds=micros), task_id)
+        elif fields & _HAS_OFFSET:
+            anchor, pos = _read_varint(raw, pos)
+    except (IndexError, ValueError, OverflowError):
+        return None
+    if pos != len(raw):
+        return None
+
+    return CallbackPayload(action, id, view, anchor)
@@ -1,26 +1,153 @@
+from functools import lru_cache
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from typing import Collection, Optional, Sequence, Set
+from keyboard.callback_codec import Action, Anchor, encode_callback
+
+# Markup objects are only serialized when sent, never modified, so keyboards
+# and buttons that do not depend on the user are built once and shared
+
+_SKIP_DESCRIPTION_KEYBOARD = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [
+            InlineKeyboardButton(text="⏭ Skip Description", callback_data=encode_callback(Action.SKIP_DESCRIPTION))
+        ]
+    ]
+)
+_COMPLETE_ALL_BUTTON = InlineKeyboardButton(
+    text="✅ Complete all", callback_data=encode_callback(Action.COMPLETE_ALL)
+)
+_CLEAR_COMPLETED_ROW = [
+    InlineKeyboardButton(text="🧹 Clear completed", callback_data=encode_callback(Action.CLEAR_COMPLETED))
+]
 
 
 def get_skip_description_keyboard() -> InlineKeyboardMarkup:
     """Keyboard with Skip button for description"""
+    return _SKIP_DESCRIPTION_KEYBOARD
+
+
+@lru_cache(maxsize=1024)
+def get_task_actions_keyboard(task_id: int) -> InlineKeyboardMarkup:
+    """Keyboard with Complete, Due date and Delete buttons for a task"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="⏭ Skip Description", callback_data="skip_description")
+                InlineKeyboardButton(text="✅ Complete", callback_data=encode_callback(Action.COMPLETE, task_id)),
+                InlineKeyboardButton(text="⏰ Due", callback_data=encode_callback(Action.DUE, task_id)),
+                InlineKeyboardButton(text="🗑 Delete", callback_data=encode_callback(Action.DELETE, task_id))
             ]
         ]
     )
     return keyboard
 
 
-def get_task_actions_keyboard(task_id: int) -> InlineKeyboardMarkup:
-    """Keyboard with Complete and Delete buttons for a task"""
+def get_task_page_keyboard(
+    view: str,
+    task_ids: Sequence[int],
+    anchor: Optional[Anchor],
+    prev_cursor: Optional[Anchor],
+    next_cursor: Optional[Anchor],
+    selected: Optional[Set[int]] = None,
+    completed_ids: Collection[int] = (),
+    bulk_actions: bool = True
+) -> Optional[InlineKeyboardMarkup]:
+    """Keyboard for a paged task list: task actions plus Prev/Next navigation
+
+    `anchor` (first task's cursor, or the /search offset) lets task actions
+    re-render the page in place; `selected` switches to multi-select mode.
+    """
+    rows = []
+
+    if anchor is not None and selected is None:
+        for number, task_id in enumerate(task_ids, 1):
+            delete_button = InlineKeyboardButton(
+                text=f"🗑 {number}", callback_data=encode_callback(Action.DELETE, task_id, anchor=anchor)
+            )
+            if task_id in completed_ids:
+                # Completed tasks in mixed lists such as /search only get Delete
+                rows.append([delete_button])
+                continue
+            rows.append([
+                InlineKeyboardButton(
+                    text=f"✅ {number}", callback_data=encode_callback(Action.COMPLETE, task_id, anchor=anchor)
+                ),
+                InlineKeyboardButton(text=f"⏰ {number}", callback_data=encode_callback(Action.DUE, task_id)),
+                delete_button
+            ])
+        if bulk_actions:
+            rows.append([
+                InlineKeyboardButton(text="☑ Select", callback_data=encode_callback(Action.SELECT, anchor=anchor)),
+                _COMPLETE_ALL_BUTTON
+            ])
+    elif anchor is not None:
+        toggles = [
+            InlineKeyboardButton(
+                text=f"{'☑' if task_id in selected else '☐'} {number}",
+                callback_data=encode_callback(Action.TOGGLE, task_id, anchor=anchor)
+            )
+            for number, task_id in enumerate(task_ids, 1)
+        ]
+        rows.append(toggles)
+        rows.append([
+            InlineKeyboardButton(
+                text=f"✅ Complete ({len(selected)})",
+                callback_data=encode_callback(Action.COMPLETE_SELECTED, anchor=anchor)
+            ),
+            InlineKeyboardButton(
+                text=f"🗑 Delete ({len(selected)})",
+                callback_data=encode_callback(Action.DELETE_SELECTED, anchor=anchor)
+            )
+        ])
+        rows.append([
+            InlineKeyboardButton(
+                text="✖ Cancel selection", callback_data=encode_callback(Action.CANCEL_SELECTION, anchor=anchor)
+            )
+        ])
+    else:
+        rows.append(_CLEAR_COMPLETED_ROW)
+
+    navigation = []
+    if prev_cursor is not None:
+        navigation.append(
+            InlineKeyboardButton(
+                text="◀ Prev", callback_data=encode_callback(Action.PAGE_PREV, view=view, anchor=prev_cursor)
+            )
+        )
+    if next_cursor is not None:
+        navigation.append(
+            InlineKeyboardButton(
+                text="Next ▶", callback_data=encode_callback(Action.PAGE_NEXT, view=view, anchor=next_cursor)
+            )
+        )
+    if navigation:
+        rows.append(navigation)
+
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@lru_cache(maxsize=None)
+def get_confirm_keyboard(confirm: Action, view: str) -> InlineKeyboardMarkup:
+    """Yes/No keyboard confirming a bulk action; No goes back to the first page of `view`"""
     keyboard = InlineKeyboardMarkup(
         inline_keyboard=[
             [
-                InlineKeyboardButton(text="✅ Complete", callback_data=f"complete_{task_id}"),
-                InlineKeyboardButton(text="🗑 Delete", callback_data=f"delete_{task_id}")
+                InlineKeyboardButton(text="✔ Yes", callback_data=encode_callback(confirm)),
+                InlineKeyboardButton(text="✖ No", callback_data=encode_callback(Action.CONFIRM_NO, view=view))
+            ]
+        ]
+    )
+    return keyboard
+
+
+def get_broadcast_keyboard(broadcast_id: int) -> InlineKeyboardMarkup:
+    """Cancel button under the progress message of a running broadcast"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="⏹ Cancel broadcast",
+                    callback_data=encode_callback(Action.CANCEL_BROADCAST, broadcast_id)
+                )
             ]
         ]
     )
-    return keyboard
\ No newline at end of file
@@ -0,0 +1,3 @@
+from metrics.registry import REGISTRY, Registry, Counter, Gauge, Histogram, DEFAULT_BUCKETS
+
+__all__ = ['REGISTRY', 'Registry', 'Counter', 'Gauge', 'Histogram', 'DEFAULT_BUCKETS']
@@ -1,3 +1,8 @@
 from middleware.logging_middleware import LoggingMiddleware, UserTrackingMiddleware
+from middleware.rate_limiter import OutboundRateLimiter
+from middleware.scheduling import UpdateScheduler
+from middleware.throttling import ThrottlingMiddleware
 
-__all__ = ['LoggingMiddleware', 'UserTrackingMiddleware']
\ No newline at end of file
+__all__ = [
+    'LoggingMiddleware', 'UserTrackingMiddleware', 'OutboundRateLimiter', 'UpdateScheduler', 'ThrottlingMiddleware'
+]
@@ -1,24 +1,69 @@
 from aiogram import BaseMiddleware
-from aiogram.types import TelegramObject, Update
-from typing import Callable, Dict, Any, Awaitable
+from aiogram.types import CallbackQuery, TelegramObject, Update
+from typing import Callable, Dict, Any, Awaitable, Optional, Tuple
+from datetime import datetime
+from database.connection import async_session_maker
+from database.instrumentation import QueryStats, track_queries
+from database.users import flush_user_activity
+from keyboard import decode_callback
+from metrics import REGISTRY
+import asyncio
 import logging
+import random
 import time
 
 logger = logging.getLogger(__name__)
 
 
+def _handler_name(event: TelegramObject, data: Dict[str, Any]) -> str:
+    """Metrics label of the handler an update goes to
+
+    Every button press goes through one dispatching handler, so callbacks
+    are labelled by the action of their button instead.
+    """
+    if isinstance(event, CallbackQuery):
+        payload = decode_callback(event.data)
+        return f"callback_{payload.action.name.lower()}" if payload is not None else "callback_stale"
+    handler_object = data.get("handler")
+    return handler_object.callback.__name__ if handler_object is not None else "unknown"
+
+
+HANDLER_LATENCY = REGISTRY.histogram(
+    "bot_handler_duration_seconds", "Time spent in update handlers", ["handler"]
+)
+HANDLER_ERRORS = REGISTRY.counter(
+    "bot_handler_errors_total", "Exceptions raised out of update handlers", ["handler", "error"]
+)
+DB_QUERIES = REGISTRY.histogram(
+    "bot_db_queries_per_update", "SQL statements executed per update", ["handler"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 20, 50)
+)
+DB_TIME = REGISTRY.histogram(
+    "bot_db_duration_seconds", "Time spent executing SQL per update", ["handler"]
+)
+DB_POOL_WAIT = REGISTRY.histogram(
+    "bot_db_pool_wait_seconds", "Time spent waiting for a pooled connection per update", ["handler"]
+)
+DB_N_PLUS_ONE = REGISTRY.counter(
+    "bot_db_n_plus_one_total", "Updates that repeated an identical statement", ["handler"]
+)
+
+
 class LoggingMiddleware(BaseMiddleware):
-    """Middleware to log all incoming updates and track response time"""
+    """Middleware to log incoming updates and record handler latency
+
+    Update log lines can be sampled with `sample_rate` (0.1 logs every
+    tenth update on average); latency histograms, error counters and the
+    update's SQL work (queries, DB time, pool wait) are always recorded per
+    handler and served on /metrics. A statement repeated
+    `n_plus_one_threshold` times in one update is logged as a likely N+1.
+    """
     
-    async def __call__(
-        self,
-        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
-        event: TelegramObject,
-        data: Dict[str, Any]
-    ) -> Any:
-        # Get update info
-        update: Update = data.get("event_update")
-        
+    def __init__(self, sample_rate: float = 1.0, n_plus_one_threshold: int = 3):
+        self.sample_rate = sample_rate
+        self.n_plus_one_threshold = n_plus_one_threshold
+    
+    def _log_update(self, update: Optional[Update]):
         if update and update.message:
             user = update.message.from_user
             message_text = update.message.text or "[non-text message]"
@@ -31,26 +76,69 @@ class LoggingMiddleware(BaseMiddleware):
             logger.info(
                 f"Callback from user {user.id} (@{user.username}): {callback_data}"
             )
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        name = _handler_name(event, data)
         
-        # Track response time
-        start_time = time.time()
+        if self.sample_rate >= 1.0 or random.random() < self.sample_rate:
+            self._log_update(data.get("event_update"))
         
-        try:
-            result = await handler(event, data)
-            
-            # Log response time
-            duration = (time.time() - start_time) * 1000  # Convert to ms
-            logger.debug(f"Handler executed in {duration:.2f}ms")
-            
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error in handler: {e}", exc_info=True)
-            raise
+        # Track response time and the SQL it takes
+        started = time.perf_counter()
+        
+        with track_queries() as queries:
+            try:
+                return await handler(event, data)
+                
+            except Exception as e:
+                HANDLER_ERRORS.inc(handler=name, error=type(e).__name__)
+                logger.error(f"Error in handler {name}: {e}", exc_info=True)
+                raise
+                
+            finally:
+                duration = time.perf_counter() - started
+                HANDLER_LATENCY.observe(duration, handler=name)
+                self._record_queries(name, queries)
+                logger.debug(
+                    f"Handler {name} executed in {duration * 1000:.2f}ms: {queries.queries} queries, "
+                    f"{queries.db_seconds * 1000:.2f}ms in DB, {queries.pool_wait_seconds * 1000:.2f}ms pool wait"
+                )
+    
+    def _record_queries(self, name: str, queries: QueryStats):
+        DB_QUERIES.observe(queries.queries, handler=name)
+        DB_TIME.observe(queries.db_seconds, handler=name)
+        DB_POOL_WAIT.observe(queries.pool_wait_seconds, handler=name)
+        
+        if self.n_plus_one_threshold <= 0:
+            return
+        repeated = queries.repeated(self.n_plus_one_threshold)
+        if repeated:
+            DB_N_PLUS_ONE.inc(handler=name)
+            for statement, count in repeated.items():
+                sql = " ".join(statement.split())[:300]
+                logger.warning(f"Possible N+1 in {name}: statement ran {count} times in one update: {sql}")
 
 
 class UserTrackingMiddleware(BaseMiddleware):
-    """Middleware to track user activity"""
+    """Middleware to track user activity (last_seen and username changes)
+
+    Activity is collected in memory - one entry per user, newest wins - and
+    written every `flush_interval` seconds as a single batched UPDATE, so
+    tracking costs no database round trip per update. A batch that fails is
+    retried with the next flush at most `max_retries` times, then dropped.
+    """
+    
+    def __init__(self, flush_interval: float = 5.0, max_retries: int = 3):
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._pending: Dict[int, Tuple[Optional[str], datetime]] = {}
+        self._failed_flushes = 0
+        self._flush_task: Optional[asyncio.Task] = None
     
     async def __call__(
         self,
@@ -58,9 +146,46 @@ class UserTrackingMiddleware(BaseMiddleware):
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        update: Update = data.get("event_update")
+        user = data.get("event_from_user")
         
-        # You could update last_seen timestamp in database here
-        # For now, we'll just pass through
+        if user is not None:
+            self._pending[user.id] = (user.username, datetime.utcnow())
+            if self._flush_task is None:
+                self._flush_task = asyncio.create_task(self._flush_periodically())
+        
+        return await handler(event, data)
+    
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def flush(self):
+        """Write all collected activity now"""
+        if not self._pending:
+            return
         
-        return await handler(event, data)
\ No newline at end of file
+        activity, self._pending = self._pending, {}
+        try:
+            async with async_session_maker() as session:
+                await flush_user_activity(session, activity)
+            logger.debug(f"Flushed activity of {len(activity)} users")
+            self._failed_flushes = 0
+        except Exception as e:
+            self._failed_flushes += 1
+            if self._failed_flushes > self.max_retries:
+                # Retrying forever would only keep newer activity from being written
+                logger.error(f"Dropping activity of {len(activity)} users after repeated flush errors: {e}")
+                self._failed_flushes = 0
+                return
+            logger.error(f"Error flushing user activity: {e}")
+            # Keep the data for the next attempt unless newer values arrived
+            for user_id, values in activity.items():
+                self._pending.setdefault(user_id, values)
+    
+    async def close(self):
+        """Stop the periodic flush and write what is left"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
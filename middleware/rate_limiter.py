@@ -0,0 +1,139 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText, TelegramMethod
+from aiogram.methods.base import TelegramType
+from utils.rate_limit import TokenBucket
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Methods that post into a chat and count against Telegram's flood limits
+_THROTTLED_PREFIXES = ("Send", "Edit", "Copy", "Forward")
+
+
+class _PendingEdit:
+    """An edit waiting for its turn that later edits may replace"""
+
+    def __init__(self, method: EditMessageText):
+        self.method = method
+        self.future = asyncio.get_running_loop().create_future()
+        # Superseded callers may all be gone - never warn about an unread error
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+class OutboundRateLimiter(BaseRequestMiddleware):
+    """Bot session middleware that paces outgoing messages
+
+    Every message-producing call waits for a token from a global bucket and
+    from a per-chat bucket (stricter for groups). `TelegramRetryAfter` is
+    handled by pausing the chat's bucket and retrying, so handlers only see
+    it after `max_retries`. While an `editMessageText` for a message waits
+    for its turn, newer edits of the same message replace it and every
+    caller receives the result of the single edit that is sent.
+
+    Handlers keep awaiting `message.answer` and friends as before; only the
+    update being throttled waits, the rest of the bot keeps running.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        max_retries: int = 3,
+        max_idle_buckets: int = 10000
+    ):
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_idle_buckets = max_idle_buckets
+        self._chat_buckets: Dict[Any, TokenBucket] = {}
+        self._pending_edits: Dict[Tuple[Any, int], _PendingEdit] = {}
+        self.retries = 0
+        self.coalesced_edits = 0
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_idle_buckets:
+                self._sweep_buckets()
+            # Private chats have positive ids; groups, channels and @usernames don't
+            is_private = isinstance(chat_id, int) and chat_id > 0
+            bucket = TokenBucket(self.chat_rate if is_private else self.group_rate)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _sweep_buckets(self):
+        """Forget full buckets - they behave exactly like fresh ones"""
+        for chat_id in [chat_id for chat_id, bucket in self._chat_buckets.items() if bucket.idle]:
+            del self._chat_buckets[chat_id]
+
+    async def _wait_turn(self, chat_id):
+        await self._chat_bucket(chat_id).acquire()
+        await self.global_bucket.acquire()
+
+    async def _send(self, make_request, bot: Bot, method: TelegramMethod, chat_id):
+        attempt = 0
+        while True:
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                self.retries += 1
+                logger.warning(
+                    f"Flood limit on {type(method).__name__} to chat {chat_id}: "
+                    f"retry {attempt}/{self.max_retries} in {e.retry_after}s"
+                )
+                self._chat_bucket(chat_id).pause(e.retry_after)
+                await self._wait_turn(chat_id)
+
+    async def _send_edit(self, make_request, bot: Bot, method: EditMessageText, chat_id):
+        key = (chat_id, method.message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None:
+            pending.method = method
+            self.coalesced_edits += 1
+            return await asyncio.shield(pending.future)
+
+        pending = _PendingEdit(method)
+        self._pending_edits[key] = pending
+        try:
+            await self._wait_turn(chat_id)
+        finally:
+            # From here on a newer edit must queue behind this one
+            del self._pending_edits[key]
+
+        try:
+            result = await self._send(make_request, bot, pending.method, chat_id)
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        except Exception as e:
+            pending.future.set_exception(e)
+            raise
+        pending.future.set_result(result)
+        return result
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType]
+    ) -> Any:
+        chat_id: Optional[Any] = getattr(method, "chat_id", None)
+
+        if chat_id is None or not type(method).__name__.startswith(_THROTTLED_PREFIXES):
+            # Callback answers, getUpdates, inline edits and the like
+            return await make_request(bot, method)
+
+        if isinstance(method, EditMessageText) and method.message_id is not None:
+            return await self._send_edit(make_request, bot, method, chat_id)
+
+        await self._wait_turn(chat_id)
+        return await self._send(make_request, bot, method, chat_id)
@@ -0,0 +1,126 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from typing import Callable, Dict, Any, Awaitable
+from metrics import REGISTRY
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+UPDATES_WAITING = REGISTRY.gauge(
+    "bot_updates_waiting", "Updates waiting for their user's previous update or a handler slot"
+)
+UPDATES_RUNNING = REGISTRY.gauge(
+    "bot_updates_running", "Updates being handled"
+)
+USER_LANES = REGISTRY.gauge(
+    "bot_user_lanes", "Users with an update running or waiting"
+)
+UPDATES_DROPPED = REGISTRY.counter(
+    "bot_updates_dropped_total", "Updates dropped because too many were waiting", ["reason"]
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "bot_update_queue_wait_seconds", "Time an update waited before its handler started"
+)
+
+
+class _Lane:
+    """Updates of one user: a FIFO lock and how many updates hold or wait for it"""
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class UpdateScheduler(BaseMiddleware):
+    """Outer update middleware ordering and limiting update handling
+
+    Each user gets a lane: their updates are handled one at a time, in the
+    order they arrived, so a double-tapped button or a description sent
+    while the title is still being saved never race. Register it before the
+    FSM middleware, so state is read only after the previous update of the
+    user is done.
+
+    At most `max_concurrency` handlers run at once; a user's updates waiting
+    in their lane do not take a slot. An update arriving while `max_pending`
+    updates are already waiting, or while the user already has
+    `max_pending_per_user` queued (running or waiting), is dropped. Lanes
+    are removed as soon as their last update is done, so memory follows the
+    number of busy users, not of users ever seen.
+    """
+
+    def __init__(self, max_concurrency: int = 20, max_pending: int = 1000, max_pending_per_user: int = 10):
+        self.max_pending = max_pending
+        self.max_pending_per_user = max_pending_per_user
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._lanes: Dict[int, _Lane] = {}
+        self._waiting = 0
+        self._running = 0
+
+    def is_busy(self) -> bool:
+        """Whether an update arriving now would be dropped for the total backlog"""
+        return self._waiting >= self.max_pending
+
+    async def _run(self, handler, event, data, queued_at: float):
+        QUEUE_WAIT.observe(time.perf_counter() - queued_at)
+        self._running += 1
+        UPDATES_RUNNING.set(self._running)
+        try:
+            return await handler(event, data)
+        finally:
+            self._running -= 1
+            UPDATES_RUNNING.set(self._running)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        queued_at = time.perf_counter()
+        user = data.get("event_from_user")
+        if user is None:
+            # Nothing to order it against, only the global limit applies
+            async with self._slots:
+                return await self._run(handler, event, data, queued_at)
+
+        lane = self._lanes.get(user.id)
+        if self._waiting >= self.max_pending:
+            reason = "backlog_full"
+        elif lane is not None and lane.depth >= self.max_pending_per_user:
+            reason = "user_backlog_full"
+        else:
+            reason = None
+        if reason is not None:
+            UPDATES_DROPPED.inc(reason=reason)
+            # A single flooding user would flood the log as well
+            log = logger.warning if reason == "backlog_full" else logger.debug
+            log(f"Dropped update of user {user.id}: {reason}")
+            return None
+
+        if lane is None:
+            lane = self._lanes[user.id] = _Lane()
+            USER_LANES.set(len(self._lanes))
+
+        lane.depth += 1
+        self._waiting += 1
+        UPDATES_WAITING.set(self._waiting)
+        waiting = True
+        try:
+            async with lane.lock:
+                async with self._slots:
+                    waiting = False
+                    self._waiting -= 1
+                    UPDATES_WAITING.set(self._waiting)
+                    return await self._run(handler, event, data, queued_at)
+        finally:
+            if waiting:
+                # Cancelled before it got its turn
+                self._waiting -= 1
+                UPDATES_WAITING.set(self._waiting)
+            lane.depth -= 1
+            if lane.depth == 0:
+                del self._lanes[user.id]
+                USER_LANES.set(len(self._lanes))
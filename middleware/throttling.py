@@ -0,0 +1,153 @@
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import TelegramObject, Update
+from metrics import REGISTRY
+from utils.rate_limit import TokenBucket
+import logging
+
+logger = logging.getLogger(__name__)
+
+THROTTLED = REGISTRY.counter(
+    "bot_throttled_updates_total", "Updates dropped by the per-user rate limit", ["update_class"]
+)
+DUPLICATE_CALLBACKS = REGISTRY.counter(
+    "bot_duplicate_callbacks_total", "Repeated button presses dropped before reaching a handler"
+)
+
+# Update classes with a bucket of their own
+CLASS_LIST = "list"          # commands that page through or export tasks
+CLASS_COMMAND = "command"    # any other command
+CLASS_MESSAGE = "message"    # text, files and other messages
+CLASS_CALLBACK = "callback"  # button presses
+
+LIST_COMMANDS = frozenset({"list", "completed", "search", "stats", "export"})
+
+
+def update_class(update: Update) -> Optional[str]:
+    """The throttling class of an update, None for updates that are not throttled"""
+    if update.callback_query is not None:
+        return CLASS_CALLBACK
+    message = update.message
+    if message is None:
+        return None
+    text = message.text or ""
+    if not text.startswith("/"):
+        return CLASS_MESSAGE
+    command = text[1:].split(maxsplit=1)[0].split("@", 1)[0].lower() if len(text) > 1 else ""
+    return CLASS_LIST if command in LIST_COMMANDS else CLASS_COMMAND
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Outer update middleware dropping floods before they reach the database
+
+    Each user has a token bucket per update class (`limits` maps a class to
+    its rate per second and burst; classes left out are not limited), so
+    spamming /list does not use up the budget for buttons. A button pressed
+    again within `duplicate_window` seconds, on a message that was not
+    edited in between, is dropped as well.
+
+    Dropped updates are answered through the Bot API only: a button press
+    gets a short toast (or just stops spinning when it was a duplicate), and
+    a message gets one "slow down" reply per burst. Register it before the
+    scheduler and the FSM middleware so no dropped update reads the database
+    or waits for a handler slot.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, float]],
+        duplicate_window: float = 1.0,
+        max_idle_buckets: int = 10000
+    ):
+        self.limits = {name: limit for name, limit in limits.items() if limit[0] > 0}
+        self.duplicate_window = duplicate_window
+        self.max_idle_buckets = max_idle_buckets
+        self._buckets: Dict[Tuple[int, str], TokenBucket] = {}
+        self._warned: Set[Tuple[int, str]] = set()
+        self._recent_callbacks: Dict[Hashable, float] = {}
+        self.throttled = 0
+        self.duplicates = 0
+
+    def _bucket(self, key: Tuple[int, str]) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_idle_buckets:
+                self._sweep_buckets()
+            rate, burst = self.limits[key[1]]
+            bucket = TokenBucket(rate, burst)
+            self._buckets[key] = bucket
+        return bucket
+
+    def _sweep_buckets(self):
+        """Forget full buckets - they behave exactly like fresh ones"""
+        for key in [key for key, bucket in self._buckets.items() if bucket.idle]:
+            del self._buckets[key]
+            self._warned.discard(key)
+
+    def _is_duplicate(self, update: Update) -> bool:
+        callback = update.callback_query
+        message = callback.message
+        if message is not None:
+            # A press after the message was re-rendered (e.g. toggling a
+            # task back) is a new press even with the same payload
+            key = (callback.from_user.id, message.message_id, getattr(message, "edit_date", None), callback.data)
+        else:
+            key = (callback.from_user.id, callback.inline_message_id, None, callback.data)
+        now = time.monotonic()
+
+        if len(self._recent_callbacks) >= self.max_idle_buckets:
+            expired = now - self.duplicate_window
+            for old in [old for old, seen in self._recent_callbacks.items() if seen < expired]:
+                del self._recent_callbacks[old]
+
+        seen = self._recent_callbacks.get(key)
+        self._recent_callbacks[key] = now
+        return seen is not None and now - seen < self.duplicate_window
+
+    async def _answer_throttled(self, bot: Bot, update: Update, key: Tuple[int, str]):
+        try:
+            if update.callback_query is not None:
+                await bot.answer_callback_query(update.callback_query.id, "⏳ Slow down a little, please.")
+            elif key not in self._warned:
+                # Once per burst, or the replies would be a flood of their own
+                self._warned.add(key)
+                await bot.send_message(
+                    update.message.chat.id, "⏳ You're sending too fast - please wait a moment."
+                )
+        except Exception as e:
+            logger.info(f"Could not answer throttled update of user {key[0]}: {e}")
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        name = update_class(event) if user is not None else None
+        if name is None:
+            return await handler(event, data)
+
+        bot: Bot = data["bot"]
+        if name == CLASS_CALLBACK and self.duplicate_window > 0 and self._is_duplicate(event):
+            self.duplicates += 1
+            DUPLICATE_CALLBACKS.inc()
+            try:
+                await bot.answer_callback_query(event.callback_query.id)
+            except Exception as e:
+                logger.info(f"Could not answer duplicate callback of user {user.id}: {e}")
+            return None
+
+        if name not in self.limits:
+            return await handler(event, data)
+
+        key = (user.id, name)
+        if not self._bucket(key).try_acquire():
+            self.throttled += 1
+            THROTTLED.inc(update_class=name)
+            await self._answer_throttled(bot, event, key)
+            return None
+
+        self._warned.discard(key)
+        return await handler(event, data)
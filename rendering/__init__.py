@@ -0,0 +1,35 @@
+from rendering.text import LOCAL_TIMEZONE, clip, format_date, format_datetime, format_local_datetime
+from rendering.tasks import (
+    render_pending_tasks,
+    render_completed_tasks,
+    render_search_results,
+    render_task_created,
+    render_task_completed,
+    render_task_deleted,
+    render_due_set,
+    render_reminder,
+    render_import_result,
+    render_stats
+)
+from rendering.messages import HELP_TEXT, render_welcome, render_broadcast_progress
+
+__all__ = [
+    'LOCAL_TIMEZONE',
+    'clip',
+    'format_date',
+    'format_datetime',
+    'format_local_datetime',
+    'render_pending_tasks',
+    'render_completed_tasks',
+    'render_search_results',
+    'render_task_created',
+    'render_task_completed',
+    'render_task_deleted',
+    'render_due_set',
+    'render_reminder',
+    'render_import_result',
+    'render_stats',
+    'HELP_TEXT',
+    'render_welcome',
+    'render_broadcast_progress'
+]
@@ -0,0 +1,85 @@
+"""Fixed bot messages, built once at import."""
+from rendering.text import clip
+
+_COMMANDS = (
+    "Available commands:\n"
+    "/add - Add a new task\n"
+    "/list - View your pending tasks\n"
+    "/completed - View completed tasks\n"
+    "/cancel - Cancel current operation"
+)
+
+_welcome_new = (
+    "👋 Hello, {}! Welcome to Task Tracker Bot!\n\n"
+    "I'll help you manage your tasks efficiently.\n\n"
+    + _COMMANDS +
+    "\n\nLet's get started! Use /add to create your first task."
+).format
+_welcome_back = ("👋 Welcome back, {}!\n\n" + _COMMANDS).format
+
+HELP_TEXT = (
+    "📚 <b>Task Tracker Bot - Help</b>\n\n"
+    "<b>Available Commands:</b>\n\n"
+    "🆕 <b>Creating Tasks:</b>\n"
+    "/add - Create a new task\n"
+    "   • You'll be asked for a title (required)\n"
+    "   • Then for a description (optional)\n"
+    "   • Use /cancel anytime to abort\n\n"
+    "📋 <b>Viewing Tasks:</b>\n"
+    "/list - View all pending tasks\n"
+    "/completed - View completed tasks\n"
+    "/search &lt;words&gt; - Find tasks by title or description\n"
+    "/stats - View your statistics\n\n"
+    "📦 <b>Import / Export:</b>\n"
+    "/import - Add many tasks from a CSV or JSON file\n"
+    "/export - Download all your tasks as CSV (/export json for JSON)\n\n"
+    "⚙️ <b>Task Actions:</b>\n"
+    "   • ✅ Complete - Mark task as done\n"
+    "   • ⏰ Due - Set a due date, you get a reminder before it\n"
+    "   • 🗑 Delete - Remove task permanently\n\n"
+    "🛠 <b>Other Commands:</b>\n"
+    "/cancel - Cancel current operation\n"
+    "/help - Show this help message\n"
+    "/start - Restart the bot\n\n"
+    "💡 <b>Tips:</b>\n"
+    "   • Tasks are saved automatically\n"
+    "   • Completed tasks are kept for your records\n"
+    "   • Each task can have a title up to 200 characters\n"
+    "   • Descriptions can be up to 1000 characters\n\n"
+    "Need more help? Contact @YourUsername"
+)
+
+
+def render_welcome(first_name: str, is_new: bool) -> str:
+    """/start greeting for a new or returning user"""
+    if is_new:
+        return _welcome_new(clip(first_name))
+    return _welcome_back(clip(first_name))
+
+
+_BROADCAST_STATES = {
+    "running": "⏳ sending...",
+    "finished": "✅ finished",
+    "cancelled": "⏹ cancelled",
+}
+_broadcast_progress = (
+    "📣 <b>Broadcast #{}</b> - {}\n\n"
+    "📨 Delivered: {}\n"
+    "⚠️ Failed: {}\n"
+    "🚫 Blocked the bot: {}\n"
+    "👥 Users: {} of {}"
+).format
+
+
+def render_broadcast_progress(broadcast) -> str:
+    """Progress of a /broadcast, edited into the admin's status message"""
+    done = broadcast.delivered + broadcast.failed + broadcast.blocked
+    return _broadcast_progress(
+        broadcast.id,
+        _BROADCAST_STATES[broadcast.status.value],
+        broadcast.delivered,
+        broadcast.failed,
+        broadcast.blocked,
+        done,
+        max(broadcast.total, done)
+    )
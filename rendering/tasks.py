@@ -0,0 +1,152 @@
+"""Texts showing tasks, built from templates compiled once at import.
+
+Every piece of user text goes through `clip`, so titles and descriptions
+are escaped for HTML parse mode and truncated the same way everywhere.
+"""
+from typing import Optional, Sequence
+from rendering.text import clip, format_date, format_datetime, format_local_datetime
+
+# Description previews in lists and task messages
+PENDING_DESCRIPTION_LIMIT = 150
+COMPLETED_DESCRIPTION_LIMIT = 100
+
+_pending_header = "📋 <b>Your Pending Tasks ({}):</b>\n\n".format
+_pending_item = "{}. 📝 <b>{}</b>\n{}{}   🕐 Created: {}\n\n".format
+_completed_header = "✅ <b>Completed Tasks ({}):</b>\n\n".format
+_completed_item = "{}. <b>{}</b>\n{}{}\n".format
+_search_header = "🔍 <b>Tasks matching “{}” ({}):</b>\n\n".format
+_search_item = "{}. {} <b>{}</b>\n{}\n".format
+_description_line = "   📋 {}\n".format
+_completed_at_line = "   ✅ Completed: {}\n".format
+_due_line = "   ⏰ Due: {}\n".format
+
+_task_created = "✅ Task created successfully!\n\n📝 <b>{}</b>\n{}\nUse /list to view all your tasks.".format
+_task_completed = "✅ <b>COMPLETED</b>\n\n📝 <s>{}</s>\n{}✅ Completed: {}".format
+_task_deleted = "🗑 <b>DELETED</b>\n\n📝 <s>{}</s>\n\nThis task has been permanently removed.".format
+_due_set = "⏰ <b>{}</b>\n\n📅 Due: {}\n🔔 Reminder: {}".format
+_due_cleared = "⏰ <b>{}</b>\n\nDue date removed.".format
+_reminder = "🔔 <b>Reminder</b>\n\n📝 <b>{}</b>\n📅 Due: {}".format
+
+_import_result = "📥 <b>Import finished</b>\n\n✅ Imported: {}\n⚠️ Skipped: {}\n".format
+_import_error = "   • Row {}: {}\n".format
+
+_stats = (
+    "📊 <b>Your Statistics</b>\n\n"
+    "👤 User: {}\n"
+    "📅 Member since: {}\n\n"
+    "📝 <b>Tasks Overview:</b>\n"
+    "   • Total tasks: {}\n"
+    "   • Pending: {} ⏳\n"
+    "   • Completed: {} ✅\n"
+    "   • Completion rate: {:.1f}%\n\n"
+).format
+_stats_last_completed = "🎯 Last completed: <b>{}</b>\n   ({})\n".format
+
+
+def render_pending_tasks(rows: Sequence, total: int) -> str:
+    """Numbered list of pending tasks with description previews"""
+    parts = [_pending_header(total)]
+    for number, task in enumerate(rows, 1):
+        description = task.description
+        parts.append(_pending_item(
+            number,
+            clip(task.title),
+            _description_line(clip(description, PENDING_DESCRIPTION_LIMIT)) if description else "",
+            _due_line(format_local_datetime(task.due_at)) if task.due_at else "",
+            format_datetime(task.created_at)
+        ))
+    return "".join(parts)
+
+
+def render_completed_tasks(rows: Sequence, total: int) -> str:
+    """Numbered list of completed tasks with completion times"""
+    parts = [_completed_header(total)]
+    for number, task in enumerate(rows, 1):
+        description = task.description
+        completed_at = task.completed_at
+        parts.append(_completed_item(
+            number,
+            clip(task.title),
+            _description_line(clip(description, COMPLETED_DESCRIPTION_LIMIT)) if description else "",
+            _completed_at_line(format_datetime(completed_at)) if completed_at else ""
+        ))
+    return "".join(parts)
+
+
+def render_search_results(rows: Sequence, total: int, query: str) -> str:
+    """Numbered /search results, pending and completed, with description previews"""
+    parts = [_search_header(clip(query, 50), total)]
+    for number, task in enumerate(rows, 1):
+        description = task.description
+        parts.append(_search_item(
+            number,
+            "✅" if task.completed_at else "📝",
+            clip(task.title),
+            _description_line(clip(description, COMPLETED_DESCRIPTION_LIMIT)) if description else ""
+        ))
+    return "".join(parts)
+
+
+def render_task_created(title: str, description: Optional[str] = None) -> str:
+    """Confirmation after /add"""
+    description_line = f"📋 {clip(description, COMPLETED_DESCRIPTION_LIMIT)}\n" if description else ""
+    return _task_created(clip(title), description_line)
+
+
+def render_task_completed(task) -> str:
+    """A single task message after its Complete button was pressed"""
+    description = (
+        f"📋 <s>{clip(task.description, PENDING_DESCRIPTION_LIMIT)}</s>\n" if task.description else ""
+    )
+    return _task_completed(clip(task.title), description, format_datetime(task.completed_at))
+
+
+def render_task_deleted(title: str) -> str:
+    """A single task message after its Delete button was pressed"""
+    return _task_deleted(clip(title))
+
+
+def render_due_set(task) -> str:
+    """Confirmation after a due date was set or cleared on a task"""
+    if task.due_at is None:
+        return _due_cleared(clip(task.title))
+    return _due_set(clip(task.title), format_local_datetime(task.due_at), format_local_datetime(task.remind_at))
+
+
+def render_reminder(task) -> str:
+    """Reminder message sent by the scheduler"""
+    return _reminder(clip(task.title), format_local_datetime(task.due_at))
+
+
+def render_import_result(
+    imported: int,
+    skipped: int,
+    errors: Sequence = (),
+    note: Optional[str] = None
+) -> str:
+    """/import summary: counts, the first skipped rows and why the import stopped early"""
+    text = _import_result(imported, skipped)
+    if errors:
+        text += "\n" + "".join(_import_error(error.row, clip(error.message.removeprefix("❌ "))) for error in errors)
+    if note:
+        text += "\n" + clip(note)
+    return text
+
+
+def render_stats(stats) -> str:
+    """/stats for a UserStats row"""
+    total = stats.total_count
+    completion_rate = (stats.completed_count / total * 100) if total > 0 else 0
+    text = _stats(
+        clip(stats.first_name),
+        format_date(stats.member_since),
+        total,
+        stats.pending_count,
+        stats.completed_count,
+        completion_rate
+    )
+    if stats.completed_count > 0 and stats.last_completed_at:
+        text += _stats_last_completed(
+            clip(stats.last_completed_title), format_datetime(stats.last_completed_at)
+        )
+    return text
@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from html import escape
+from typing import Optional
+from zoneinfo import ZoneInfo
+from config import BOT_TIMEZONE
+
+# Due dates are shown in the timezone users type them in
+LOCAL_TIMEZONE = ZoneInfo(BOT_TIMEZONE)
+
+
+def clip(text: Optional[str], limit: Optional[int] = None) -> str:
+    """HTML-escape user text, cutting it to `limit` characters first
+
+    Cutting before escaping keeps entities like `&amp;` intact and makes
+    the limit count what the user typed, not the escaped markup.
+    """
+    if not text:
+        return ""
+    if limit is not None and len(text) > limit:
+        return escape(text[:limit], quote=False) + "..."
+    return escape(text, quote=False)
+
+
+def format_datetime(value: datetime) -> str:
+    """`YYYY-MM-DD HH:MM`, without going through strftime"""
+    return value.isoformat(" ", "minutes")
+
+
+def format_date(value: datetime) -> str:
+    """`YYYY-MM-DD`"""
+    return value.date().isoformat()
+
+
+def format_local_datetime(value: datetime) -> str:
+    """`YYYY-MM-DD HH:MM` of a naive UTC timestamp in LOCAL_TIMEZONE"""
+    return format_datetime(value.replace(tzinfo=timezone.utc).astimezone(LOCAL_TIMEZONE).replace(tzinfo=None))
@@ -0,0 +1,7 @@
+from server.webhook import LimitedRequestHandler, create_webhook_app, run_webhook
+from server.metrics import create_metrics_app, start_metrics_server
+
+__all__ = [
+    'LimitedRequestHandler', 'create_webhook_app', 'run_webhook',
+    'create_metrics_app', 'start_metrics_server'
+]
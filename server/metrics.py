@@ -0,0 +1,27 @@
+from aiohttp import web
+from metrics import REGISTRY, Registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def create_metrics_app(registry: Registry = REGISTRY) -> web.Application:
+    """aiohttp application serving `registry` at /metrics"""
+    async def metrics_handler(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    return app
+
+
+async def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY) -> web.AppRunner:
+    """Start serving /metrics; call `cleanup()` on the returned runner to stop"""
+    runner = web.AppRunner(create_metrics_app(registry), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    logger.info(f"✓ Metrics available at http://{host}:{port}/metrics")
+    return runner
@@ -0,0 +1,115 @@
+import asyncio
+from typing import Any, Callable, Dict
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LimitedRequestHandler(SimpleRequestHandler):
+    """Webhook handler that answers 503 while the bot is backed up
+
+    Updates are acknowledged immediately and handled in the background;
+    how many run at once is up to the dispatcher's UpdateScheduler. While
+    `is_busy()` reports its backlog full the handler answers 503, so
+    Telegram backs off and redelivers later instead of the scheduler
+    dropping the update.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        is_busy: Callable[[], bool],
+        secret_token: str = None,
+        **data: Any
+    ):
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data
+        )
+        self.is_busy = is_busy
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        try:
+            await super()._background_feed_update(bot, update)
+        except Exception as e:
+            logger.error(f"Error handling webhook update {update.get('update_id')}: {e}", exc_info=True)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        # Only Telegram gets to learn whether the backlog is full
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+        if self.is_busy():
+            logger.warning("Update backlog is full - asking Telegram to retry")
+            return web.Response(status=503, text="Busy")
+        return await super().handle(request)
+
+    __call__ = handle
+
+
+def create_webhook_app(
+    dp: Dispatcher,
+    bot: Bot,
+    path: str,
+    is_busy: Callable[[], bool],
+    secret_token: str = None
+) -> web.Application:
+    """Build an aiohttp application serving the dispatcher at `path`"""
+    app = web.Application()
+    handler = LimitedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        is_busy=is_busy,
+        secret_token=secret_token
+    )
+    handler.register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    host: str,
+    port: int,
+    path: str,
+    is_busy: Callable[[], bool],
+    base_url: str = None,
+    secret_token: str = None,
+    max_connections: int = 40
+):
+    """Serve the webhook until cancelled
+
+    When `base_url` is empty the webhook is not registered with Telegram,
+    which is handy for feeding the server update JSON locally.
+    """
+    app = create_webhook_app(dp, bot, path, is_busy, secret_token=secret_token)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    logger.info(f"✓ Webhook server listening on http://{host}:{port}{path}")
+
+    if base_url:
+        await bot.set_webhook(
+            url=base_url.rstrip("/") + path,
+            secret_token=secret_token,
+            max_connections=max_connections,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        logger.info(f"✓ Webhook registered at {base_url.rstrip('/')}{path}")
+    else:
+        logger.info("WEBHOOK_BASE_URL not set - webhook not registered with Telegram")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
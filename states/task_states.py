@@ -4,4 +4,6 @@ from aiogram.fsm.state import State, StatesGroup
 class TaskStates(StatesGroup):
     """States for task creation flow"""
     waiting_for_title = State()
-    waiting_for_description = State()
\ No newline at end of file
+    waiting_for_description = State()
+    waiting_for_import_file = State()
+    waiting_for_due_date = State()
\ No newline at end of file
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# config.py refuses to import without these; tests never reach Telegram or
+# the database through them
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'task_bot_tests.db')}"
+)
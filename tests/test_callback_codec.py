@@ -0,0 +1,73 @@
+import base64
+from datetime import datetime
+import pytest
+from database.queries import VIEW_COMPLETED, VIEW_PENDING, VIEW_SEARCH
+from keyboard.callback_codec import (
+    CODEC_VERSION, MAX_CALLBACK_DATA, Action, CallbackPayload, decode_callback, encode_callback
+)
+
+BIG = 2 ** 63 - 1
+CURSOR = (datetime(2024, 5, 1, 14, 30, 5, 123456), 1234)
+
+
+def pack(*values: int) -> str:
+    """Callback data from raw payload bytes, the way encode_callback wraps them"""
+    return base64.urlsafe_b64encode(bytes(values)).rstrip(b"=").decode("ascii")
+
+
+@pytest.mark.parametrize("payload", [
+    CallbackPayload(Action.SKIP_DESCRIPTION),
+    CallbackPayload(Action.COMPLETE, id=42),
+    CallbackPayload(Action.COMPLETE, id=42, anchor=CURSOR),
+    CallbackPayload(Action.DELETE, id=42, anchor=20),
+    CallbackPayload(Action.DUE, id=0),
+    CallbackPayload(Action.PAGE_NEXT, view=VIEW_PENDING, anchor=CURSOR),
+    CallbackPayload(Action.PAGE_PREV, view=VIEW_SEARCH, anchor=0),
+    CallbackPayload(Action.SELECT, anchor=CURSOR),
+    CallbackPayload(Action.TOGGLE, id=BIG, anchor=(datetime(9999, 12, 31, 23, 59, 59, 999999), BIG)),
+    # Timestamps before the epoch are zigzag-encoded
+    CallbackPayload(Action.CANCEL_SELECTION, anchor=(datetime(1, 1, 1), 1)),
+    CallbackPayload(Action.CONFIRM_NO, view=VIEW_COMPLETED),
+    CallbackPayload(Action.CANCEL_BROADCAST, id=7),
+])
+def test_round_trip(payload):
+    data = encode_callback(payload.action, payload.id, payload.view, payload.anchor)
+
+    assert len(data) <= MAX_CALLBACK_DATA
+    assert decode_callback(data) == payload
+
+
+def test_every_action_decodes():
+    for action in Action:
+        data = encode_callback(action, id=1, view=VIEW_PENDING, anchor=CURSOR)
+        decoded = decode_callback(data)
+        # Fields an action does not take make the payload invalid, never wrong
+        assert decoded is None or decoded.action is action
+
+
+def test_negative_values_are_not_encoded():
+    with pytest.raises(ValueError):
+        encode_callback(Action.COMPLETE, id=-1)
+
+
+@pytest.mark.parametrize("data", [
+    None,
+    "",
+    "complete:42",                           # the old plain-text format
+    "AQIB*g",                                # not base64
+    pack(CODEC_VERSION, Action.DUE, 1, 42) + "=",
+    "A" * (MAX_CALLBACK_DATA + 1),
+    pack(CODEC_VERSION, Action.DUE),         # shorter than the header
+    pack(CODEC_VERSION + 1, Action.DUE, 1, 42),
+    pack(CODEC_VERSION, 200, 0),             # unknown action
+    pack(CODEC_VERSION, Action.DUE, 0),      # required id missing
+    pack(CODEC_VERSION, Action.DUE, 1 | 2, 42, 0),  # view not allowed
+    pack(CODEC_VERSION, Action.PAGE_NEXT, 2, 0),    # anchor missing
+    pack(CODEC_VERSION, Action.PAGE_NEXT, 2 | 4 | 8, 0, 1, 1, 1),  # two anchors
+    pack(CODEC_VERSION, Action.DUE, 1, 42, 0),      # trailing byte
+    pack(CODEC_VERSION, Action.DUE, 1, 0x80),       # varint cut off
+    pack(CODEC_VERSION, Action.DUE, 1, *[0xFF] * 10, 1),  # varint over 64 bits
+    pack(CODEC_VERSION, Action.CONFIRM_NO, 2, 9),   # unknown view
+])
+def test_malformed_data_is_rejected(data):
+    assert decode_callback(data) is None
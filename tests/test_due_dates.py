@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from utils.due_dates import parse_due_date, reminder_time
+
+# Wednesday 2024-05-01, 15:00 on the bot's clock
+NOW = datetime(2024, 5, 1, 10, 0)
+TZ = timezone(timedelta(hours=5))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("in 2h", datetime(2024, 5, 1, 12, 0)),
+    ("in 30 min", datetime(2024, 5, 1, 10, 30)),
+    ("in 3d", datetime(2024, 5, 4, 10, 0)),
+    ("in 1w", datetime(2024, 5, 8, 10, 0)),
+])
+def test_relative(text, expected):
+    assert parse_due_date(text, NOW, TZ) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    # A bare time is the next time the clock shows it
+    ("18:00", datetime(2024, 5, 1, 13, 0)),
+    ("14:00", datetime(2024, 5, 2, 9, 0)),
+    ("today 18.30", datetime(2024, 5, 1, 13, 30)),
+    ("tomorrow", datetime(2024, 5, 2, 4, 0)),
+    ("  Tomorrow   9:30 ", datetime(2024, 5, 2, 4, 30)),
+    ("fri", datetime(2024, 5, 3, 4, 0)),
+    ("friday 18:00", datetime(2024, 5, 3, 13, 0)),
+    # The same weekday means next week
+    ("wed", datetime(2024, 5, 8, 4, 0)),
+    ("2024-05-01 16:00", datetime(2024, 5, 1, 11, 0)),
+    ("25.12 10:00", datetime(2024, 12, 25, 5, 0)),
+    # A day and month already behind us this year is next year's
+    ("30.04", datetime(2025, 4, 30, 4, 0)),
+    ("30.04.2026", datetime(2026, 4, 30, 4, 0)),
+])
+def test_absolute_in_bot_timezone(text, expected):
+    assert parse_due_date(text, NOW, TZ) == expected
+
+
+@pytest.mark.parametrize("text", ["today 9:00", "2024-05-01 14:59", "01.05.2024", "2023-12-31"])
+def test_past(text):
+    with pytest.raises(ValueError, match="already passed"):
+        parse_due_date(text, NOW, TZ)
+
+
+@pytest.mark.parametrize("text", ["", "someday", "in 2 years", "next friday 9:00", "9"])
+def test_unreadable(text):
+    with pytest.raises(ValueError, match="can't read"):
+        parse_due_date(text, NOW, TZ)
+
+
+@pytest.mark.parametrize("text", ["2024-02-30", "31.06"])
+def test_date_that_does_not_exist(text):
+    with pytest.raises(ValueError, match="does not exist"):
+        parse_due_date(text, NOW, TZ)
+
+
+@pytest.mark.parametrize("text", ["tomorrow 25:00", "fri 9:75", "tomorrow noon"])
+def test_bad_time_of_day(text):
+    with pytest.raises(ValueError, match="not a time of day"):
+        parse_due_date(text, NOW, TZ)
+
+
+def test_reminder_time():
+    lead = timedelta(minutes=15)
+
+    assert reminder_time(NOW + timedelta(hours=1), NOW, lead) == NOW + timedelta(minutes=45)
+    # Due sooner than the lead: remind when it is due
+    assert reminder_time(NOW + timedelta(minutes=5), NOW, lead) == NOW + timedelta(minutes=5)
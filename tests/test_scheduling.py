@@ -0,0 +1,121 @@
+import asyncio
+from types import SimpleNamespace
+from middleware.scheduling import UpdateScheduler
+
+
+def from_user(user_id: int):
+    return {"event_from_user": SimpleNamespace(id=user_id)}
+
+
+def test_user_updates_run_in_arrival_order():
+    async def scenario():
+        scheduler = UpdateScheduler(max_concurrency=10)
+        order = []
+
+        async def handler(event, data):
+            # Later updates would finish first if they ran concurrently
+            await asyncio.sleep(0.01 * (5 - event))
+            order.append(event)
+
+        await asyncio.gather(*(scheduler(handler, event, from_user(1)) for event in range(5)))
+        return order, scheduler
+
+    order, scheduler = asyncio.run(scenario())
+    assert order == [0, 1, 2, 3, 4]
+    assert scheduler._lanes == {}
+
+
+def test_different_users_run_concurrently_up_to_the_limit():
+    async def scenario():
+        scheduler = UpdateScheduler(max_concurrency=2)
+        running = peak = 0
+
+        async def handler(event, data):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return event
+
+        results = await asyncio.gather(*(scheduler(handler, user, from_user(user)) for user in range(6)))
+        return results, peak
+
+    results, peak = asyncio.run(scenario())
+    assert results == list(range(6))
+    assert peak == 2
+
+
+def test_per_user_backlog_is_capped():
+    async def scenario():
+        scheduler = UpdateScheduler(max_concurrency=10, max_pending_per_user=3)
+        release = asyncio.Event()
+        handled = []
+
+        async def handler(event, data):
+            await release.wait()
+            handled.append(event)
+            return event
+
+        queued = [asyncio.create_task(scheduler(handler, event, from_user(1))) for event in range(3)]
+        await asyncio.sleep(0)
+        # The running update counts towards the cap, so a fourth one is dropped
+        dropped = await scheduler(handler, 3, from_user(1))
+        other_user = asyncio.create_task(scheduler(handler, 4, from_user(2)))
+        release.set()
+        results = await asyncio.gather(*queued, other_user)
+        # Once the backlog is done the user is accepted again
+        again = await scheduler(handler, 5, from_user(1))
+        return dropped, results, again, handled
+
+    dropped, results, again, handled = asyncio.run(scenario())
+    assert dropped is None
+    assert results == [0, 1, 2, 4]
+    assert again == 5
+    assert 3 not in handled
+
+
+def test_total_backlog_is_capped():
+    async def scenario():
+        scheduler = UpdateScheduler(max_concurrency=1, max_pending=2)
+        release = asyncio.Event()
+
+        async def handler(event, data):
+            await release.wait()
+            return event
+
+        accepted = [asyncio.create_task(scheduler(handler, user, from_user(user))) for user in range(3)]
+        await asyncio.sleep(0)
+        busy = scheduler.is_busy()
+        dropped = await scheduler(handler, 3, from_user(3))
+        release.set()
+        return busy, dropped, await asyncio.gather(*accepted), scheduler.is_busy()
+
+    busy, dropped, results, busy_after = asyncio.run(scenario())
+    # One update runs, two wait for the slot
+    assert busy and not busy_after
+    assert dropped is None
+    assert results == [0, 1, 2]
+
+
+def test_cancelled_update_leaves_the_backlog():
+    async def scenario():
+        scheduler = UpdateScheduler(max_concurrency=1)
+        release = asyncio.Event()
+
+        async def handler(event, data):
+            await release.wait()
+            return event
+
+        first = asyncio.create_task(scheduler(handler, 0, from_user(1)))
+        second = asyncio.create_task(scheduler(handler, 1, from_user(1)))
+        await asyncio.sleep(0)
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+        release.set()
+        await first
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler._waiting == 0
+    assert scheduler._lanes == {}
@@ -0,0 +1,148 @@
+import io
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from utils import task_files
+from utils.task_files import (
+    FORMAT_CSV, FORMAT_JSON, FORMAT_JSONL, RecordError, TaskFileError, TaskFileWriter, TaskRecord,
+    detect_format, read_tasks
+)
+
+
+def read(text: str, file_format: str):
+    return list(read_tasks(io.StringIO(text), file_format))
+
+
+def test_detect_format():
+    assert detect_format("Tasks.CSV") == FORMAT_CSV
+    assert detect_format("tasks.json") == FORMAT_JSON
+    assert detect_format("tasks.ndjson") == FORMAT_JSONL
+    assert detect_format("tasks.txt") is None
+    assert detect_format(None) is None
+
+
+def test_csv_rows():
+    records = read(
+        "Title,Description,Status,Created_At,Completed_At\n"
+        "Buy milk,,pending,2024-05-01 14:30,\n"
+        "Done thing,notes,completed,2024-05-01T12:00:00+02:00,2024-05-02 08:00\n"
+        "Implicitly done,,,,2024-05-02 08:00\n",
+        FORMAT_CSV
+    )
+
+    assert records[0] == TaskRecord("Buy milk", None, False, datetime(2024, 5, 1, 14, 30), None)
+    # Offsets are converted to naive UTC
+    assert records[1] == TaskRecord(
+        "Done thing", "notes", True, datetime(2024, 5, 1, 10, 0), datetime(2024, 5, 2, 8, 0)
+    )
+    assert records[2].completed
+
+
+def test_csv_bad_rows_are_skipped_with_their_line():
+    records = read(
+        "title,description,status,created_at\n"
+        ",no title,,\n"
+        f"{'x' * 201},,,\n"
+        f"ok,{'y' * 1001},,\n"
+        "ok,,maybe,\n"
+        "ok,,,yesterday\n"
+        "fine,,,\n",
+        FORMAT_CSV
+    )
+
+    assert [type(record) for record in records] == [RecordError] * 5 + [TaskRecord]
+    assert [record.row for record in records[:5]] == [2, 3, 4, 5, 6]
+    assert "Maximum is 200" in records[1].message
+    assert "Maximum is 1000" in records[2].message
+    assert "maybe" in records[3].message
+
+
+def test_csv_without_title_column():
+    with pytest.raises(TaskFileError):
+        read("name,description\nBuy milk,\n", FORMAT_CSV)
+
+
+def test_empty_csv():
+    assert read("", FORMAT_CSV) == []
+
+
+def test_json_lines():
+    records = read(
+        '{"title": "one"}\n'
+        '\n'
+        '["not", "an", "object"]\n'
+        '{"title": "two", "status": "completed"}\n',
+        FORMAT_JSONL
+    )
+
+    assert [getattr(record, "title", None) for record in records] == ["one", None, "two"]
+    assert records[1] == RecordError(3, "❌ Expected an object with a title.")
+    assert records[2].completed and records[2].completed_at is not None
+
+
+def test_json_lines_stop_at_broken_line():
+    rows = read_tasks(io.StringIO('{"title": "one"}\n{"title": \n{"title": "three"}\n'), FORMAT_JSONL)
+
+    assert next(rows).title == "one"
+    with pytest.raises(TaskFileError, match="line 2"):
+        next(rows)
+
+
+def test_json_file_with_one_object_per_line():
+    records = read('{"title": "one"}\n{"title": "two"}', FORMAT_JSON)
+
+    assert [record.title for record in records] == ["one", "two"]
+
+
+def test_json_array_across_chunks(monkeypatch):
+    # Items, strings and numbers cut at every possible chunk boundary
+    monkeypatch.setattr(task_files, "_CHUNK_SIZE", 7)
+    records = read(
+        ' [ {"title": "first task", "description": "a longer description"},\n'
+        '   42,\n'
+        '   {"title": "third", "status": "completed"} ]',
+        FORMAT_JSON
+    )
+
+    assert records[0].title == "first task"
+    assert records[0].description == "a longer description"
+    assert records[1] == RecordError(2, "❌ Expected an object with a title.")
+    assert records[2].completed
+
+
+def test_empty_json_array():
+    assert read("[]", FORMAT_JSON) == []
+
+
+@pytest.mark.parametrize("text", [
+    '[{"title": "one"}',
+    '[{"title": "one"} {"title": "two"}]',
+    '[{"title": "one"}, {"title": ]',
+])
+def test_broken_json_array(text):
+    with pytest.raises(TaskFileError):
+        read(text, FORMAT_JSON)
+
+
+@pytest.mark.parametrize("file_format", [FORMAT_CSV, FORMAT_JSON])
+def test_export_reads_back(file_format):
+    rows = [
+        SimpleNamespace(
+            title="Buy milk, eggs", description="2 \"big\" ones", status="pending",
+            created_at=datetime(2024, 5, 1, 14, 30), completed_at=None
+        ),
+        SimpleNamespace(
+            title="Done", description=None, status="completed",
+            created_at=datetime(2024, 5, 1, 9, 0), completed_at=datetime(2024, 5, 2, 8, 0)
+        ),
+    ]
+    stream = io.StringIO()
+    writer = TaskFileWriter(stream, file_format)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+
+    assert read(stream.getvalue(), file_format) == [
+        TaskRecord("Buy milk, eggs", '2 "big" ones', False, datetime(2024, 5, 1, 14, 30), None),
+        TaskRecord("Done", None, True, datetime(2024, 5, 1, 9, 0), datetime(2024, 5, 2, 8, 0)),
+    ]
@@ -1,4 +1,7 @@
 from utils.validators import validate_task_title, validate_task_description
 from utils.error_handlers import handle_errors
+from utils.rate_limit import TokenBucket
+from utils.cache import LRUCache
+from utils.logging_setup import setup_logging
 
-__all__ = ['validate_task_title', 'validate_task_description', 'handle_errors']
\ No newline at end of file
+__all__ = ['validate_task_title', 'validate_task_description', 'handle_errors', 'TokenBucket', 'LRUCache', 'setup_logging']
\ No newline at end of file
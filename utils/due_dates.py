@@ -0,0 +1,100 @@
+"""Due dates typed by users, e.g. `tomorrow 18:00`, `fri`, `in 2h`, `2024-05-01 14:30`.
+
+Dates are read in the bot's timezone and returned as naive UTC, the way
+all timestamps are stored.
+"""
+import re
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Optional
+
+# Time of day for dates typed without one
+DEFAULT_DUE_TIME = time(9, 0)
+
+_WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+_UNITS = {"m": "minutes", "min": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+_RELATIVE = re.compile(r"in\s+(\d{1,4})\s*(m|min|h|d|w)")
+_TIME = re.compile(r"(\d{1,2})[:.](\d{2})")
+_ISO_DATE = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+_DAY_MONTH = re.compile(r"(\d{1,2})\.(\d{1,2})(?:\.(\d{4}))?")
+
+DUE_DATE_HINT = (
+    "Examples: <code>in 2h</code>, <code>18:00</code>, <code>tomorrow 9:30</code>, "
+    "<code>fri</code>, <code>25.12 10:00</code>, <code>2024-05-01 14:30</code>"
+)
+
+
+def _parse_time(value: str) -> time:
+    match = _TIME.fullmatch(value)
+    if not match or int(match[1]) > 23 or int(match[2]) > 59:
+        raise ValueError(f"❌ '{value[:20]}' is not a time of day, use HH:MM.")
+    return time(int(match[1]), int(match[2]))
+
+
+def _parse_day(value: str, today: date) -> Optional[date]:
+    """The date a word names, or None if it is not a date"""
+    if value == "today":
+        return today
+    if value == "tomorrow":
+        return today + timedelta(days=1)
+    if value[:3] in _WEEKDAYS and value.isalpha():
+        # The next such day, a week ahead when it is today
+        days_ahead = (_WEEKDAYS.index(value[:3]) - today.weekday() - 1) % 7 + 1
+        return today + timedelta(days=days_ahead)
+
+    match = _ISO_DATE.fullmatch(value)
+    if match:
+        return date(int(match[1]), int(match[2]), int(match[3]))
+    match = _DAY_MONTH.fullmatch(value)
+    if match:
+        day = date(int(match[3] or today.year), int(match[2]), int(match[1]))
+        if match[3] is None and day < today:
+            day = day.replace(year=today.year + 1)
+        return day
+    return None
+
+
+def parse_due_date(text: str, now: datetime, tz: tzinfo) -> datetime:
+    """Parse a due date relative to `now` (naive UTC) into naive UTC
+
+    Raises ValueError with a message for the user when the text is not a
+    date or names a time in the past.
+    """
+    value = " ".join(text.lower().split())
+    local_now = now.replace(tzinfo=timezone.utc).astimezone(tz)
+
+    match = _RELATIVE.fullmatch(value)
+    if match:
+        return now + timedelta(**{_UNITS[match[2]]: int(match[1])})
+
+    words = value.split(" ")
+    if not value or len(words) > 2:
+        raise ValueError(f"❌ I can't read that date.\n\n{DUE_DATE_HINT}")
+
+    try:
+        day = _parse_day(words[0], local_now.date())
+    except ValueError:
+        raise ValueError("❌ That date does not exist.")
+
+    if day is None:
+        if len(words) > 1 or not _TIME.fullmatch(words[0]):
+            raise ValueError(f"❌ I can't read that date.\n\n{DUE_DATE_HINT}")
+        # A bare time: the next time the clock shows it
+        at = _parse_time(words[0])
+        due = datetime.combine(local_now.date(), at, tzinfo=tz)
+        if due <= local_now:
+            due += timedelta(days=1)
+    else:
+        at = _parse_time(words[1]) if len(words) > 1 else DEFAULT_DUE_TIME
+        due = datetime.combine(day, at, tzinfo=tz)
+
+    due = due.astimezone(timezone.utc).replace(tzinfo=None)
+    if due <= now:
+        raise ValueError("❌ That time has already passed.")
+    return due
+
+
+def reminder_time(due_at: datetime, now: datetime, lead: timedelta) -> datetime:
+    """When to remind about a task: `lead` before it is due, or when it is due if that is sooner"""
+    remind_at = due_at - lead
+    return remind_at if remind_at > now else due_at
@@ -0,0 +1,48 @@
+import atexit
+import logging
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+from typing import Optional
+from metrics import REGISTRY
+
+LOG_ERRORS = REGISTRY.counter(
+    "bot_log_errors_total", "Records logged at ERROR or above", ["logger"]
+)
+
+
+class _ErrorCounter(logging.Handler):
+    """Counts error records per logger, including errors handlers recover from"""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+
+    def emit(self, record: logging.LogRecord):
+        LOG_ERRORS.inc(logger=record.name)
+
+
+def setup_logging(fmt: str, level: int = logging.INFO) -> Optional[QueueListener]:
+    """Log to stdout from a background thread
+
+    The root logger only puts records on a queue; a listener thread does
+    the formatting and the blocking writes, so slow stdout never stalls the
+    event loop. Like `logging.basicConfig`, does nothing if the root logger
+    is already configured.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter(fmt))
+
+    queue = SimpleQueue()
+    listener = QueueListener(queue, stream, respect_handler_level=True)
+    root.addHandler(QueueHandler(queue))
+    root.addHandler(_ErrorCounter())
+    root.setLevel(level)
+
+    listener.start()
+    # Flush what is still queued when the process exits
+    atexit.register(listener.stop)
+    return listener
@@ -0,0 +1,53 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens per second
+
+    `acquire` reserves a token immediately and sleeps until it is due, so
+    waiters are served in arrival order without polling. `try_acquire`
+    never waits and is meant for dropping excess work.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def idle(self) -> bool:
+        """True when the bucket is full, i.e. nobody used it recently"""
+        self._refill(time.monotonic())
+        return self._tokens >= self.capacity
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        self._refill(time.monotonic())
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take tokens now, possibly going into debt; returns seconds to wait"""
+        self._refill(time.monotonic())
+        self._tokens -= tokens
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    async def acquire(self, tokens: float = 1.0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Make the next token available no sooner than `seconds` from now (e.g. after a 429)"""
+        self._refill(time.monotonic())
+        self._tokens = min(self._tokens, 1.0 - seconds * self.rate)
@@ -0,0 +1,247 @@
+"""Task import/export files: CSV, JSON Lines and JSON arrays.
+
+Files are read incrementally and written row by row, so memory use does
+not depend on how many tasks a file holds. Columns / keys are the ones
+/export writes: title, description, status, created_at, completed_at -
+only title is required.
+"""
+import csv
+import json
+from datetime import datetime, timezone
+from itertools import chain
+from typing import Any, Dict, Iterator, NamedTuple, Optional, TextIO, Union
+from utils.validators import validate_task_title, validate_task_description
+
+FORMAT_CSV = "csv"
+FORMAT_JSON = "json"     # a JSON array, or JSON Lines (detected from the content)
+FORMAT_JSONL = "jsonl"
+
+FIELDS = ("title", "description", "status", "created_at", "completed_at")
+
+_EXTENSIONS = {
+    ".csv": FORMAT_CSV,
+    ".json": FORMAT_JSON,
+    ".jsonl": FORMAT_JSONL,
+    ".ndjson": FORMAT_JSONL,
+}
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class TaskRecord(NamedTuple):
+    """One valid task read from an import file"""
+    title: str
+    description: Optional[str]
+    completed: bool
+    created_at: datetime
+    completed_at: Optional[datetime]
+
+
+class RecordError(NamedTuple):
+    """A row that was skipped, and why"""
+    row: int
+    message: str
+
+
+class TaskFileError(ValueError):
+    """The file itself cannot be read any further (bad JSON, bad CSV...)"""
+
+
+def detect_format(file_name: Optional[str]) -> Optional[str]:
+    """Import format for a file name, or None if it is not supported"""
+    name = (file_name or "").lower()
+    for extension, file_format in _EXTENSIONS.items():
+        if name.endswith(extension):
+            return file_format
+    return None
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if value in (None, ""):
+        return None
+    parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        # Stored timestamps are naive UTC
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _to_record(row: int, values: Any, now: datetime) -> Union[TaskRecord, RecordError]:
+    """Validate one row with the same rules as /add"""
+    if not isinstance(values, dict):
+        return RecordError(row, "❌ Expected an object with a title.")
+
+    title = str(values.get("title") or "").strip()
+    is_valid, error_message = validate_task_title(title)
+    if not is_valid:
+        return RecordError(row, error_message)
+
+    description = values.get("description")
+    description = str(description).strip() if description not in (None, "") else None
+    if description is not None:
+        is_valid, error_message = validate_task_description(description)
+        if not is_valid:
+            return RecordError(row, error_message)
+
+    try:
+        created_at = _parse_datetime(values.get("created_at")) or now
+        completed_at = _parse_datetime(values.get("completed_at"))
+    except ValueError:
+        return RecordError(row, "❌ Dates must be in ISO format, e.g. 2024-05-01 14:30.")
+
+    status = str(values.get("status") or "").strip().lower()
+    if status not in ("", "pending", "completed"):
+        return RecordError(row, f"❌ Unknown status '{status[:20]}' - use pending or completed.")
+    completed = status == "completed" or (not status and completed_at is not None)
+
+    return TaskRecord(
+        title=title,
+        description=description,
+        completed=completed,
+        created_at=created_at,
+        completed_at=(completed_at or now) if completed else None
+    )
+
+
+def _iter_csv(stream: TextIO) -> Iterator[tuple]:
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    if "title" not in reader.fieldnames:
+        raise TaskFileError("The CSV header has no 'title' column.")
+    try:
+        for values in reader:
+            yield reader.line_num, values
+    except csv.Error as e:
+        raise TaskFileError(f"Broken CSV at line {reader.line_num}: {e}")
+
+
+def _iter_json_lines(lines) -> Iterator[tuple]:
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            raise TaskFileError(f"Invalid JSON on line {line_number}: {e.msg}")
+
+
+def _iter_json_array(stream: TextIO, buffer: str) -> Iterator[tuple]:
+    """Items of a top-level JSON array, decoded one at a time from chunks"""
+    decoder = json.JSONDecoder()
+    buffer = buffer.lstrip()[1:]  # the opening bracket
+    eof = False
+    item = 0
+    expect_item = True
+
+    while True:
+        buffer = buffer.lstrip()
+        if not buffer:
+            if eof:
+                raise TaskFileError("The JSON array is not closed.")
+            chunk = stream.read(_CHUNK_SIZE)
+            eof = not chunk
+            buffer = chunk
+            continue
+
+        if buffer[0] == "]" and (not expect_item or item == 0):
+            return
+        if not expect_item:
+            if buffer[0] != ",":
+                raise TaskFileError(f"Expected ',' after item {item} of the JSON array.")
+            buffer = buffer[1:]
+            expect_item = True
+            continue
+
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise TaskFileError(f"Invalid JSON in item {item + 1}: {e.msg}")
+            # The item continues in the next chunk
+            chunk = stream.read(_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        if end == len(buffer) and not eof and not isinstance(value, (dict, list)):
+            # A bare number or literal may be cut off at the chunk boundary
+            chunk = stream.read(_CHUNK_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+
+        item += 1
+        yield item, value
+        buffer = buffer[end:]
+        expect_item = False
+
+
+def read_tasks(stream: TextIO, file_format: str) -> Iterator[Union[TaskRecord, RecordError]]:
+    """Parse an import file lazily, yielding a record or an error per row
+
+    Raises TaskFileError (or UnicodeDecodeError) when the rest of the file
+    cannot be parsed.
+    """
+    now = datetime.utcnow()
+
+    if file_format == FORMAT_CSV:
+        rows = _iter_csv(stream)
+    elif file_format == FORMAT_JSONL:
+        rows = _iter_json_lines(stream)
+    else:
+        # .json files hold either one array or one object per line
+        head = stream.read(_CHUNK_SIZE)
+        if head.lstrip().startswith("["):
+            rows = _iter_json_array(stream, head)
+        else:
+            if head and not head.endswith("\n"):
+                head += stream.readline()  # complete the line cut by the chunk
+            rows = _iter_json_lines(chain(head.splitlines(True), stream))
+
+    for row, values in rows:
+        yield _to_record(row, values, now)
+
+
+def _format_datetime(value: Optional[datetime]) -> str:
+    return value.isoformat(" ", "seconds") if value else ""
+
+
+class TaskFileWriter:
+    """Writes exported tasks one at a time in a format /import reads back"""
+
+    def __init__(self, stream: TextIO, file_format: str):
+        self.stream = stream
+        self.file_format = file_format
+        self.count = 0
+        if file_format == FORMAT_CSV:
+            self._csv = csv.writer(stream)
+            self._csv.writerow(FIELDS)
+        else:
+            stream.write("[")
+
+    def write(self, row) -> None:
+        """Write a row with the FIELDS columns (status may be a TaskStatus)"""
+        status = getattr(row.status, "value", row.status)
+        if self.file_format == FORMAT_CSV:
+            self._csv.writerow((
+                row.title, row.description or "", status,
+                _format_datetime(row.created_at), _format_datetime(row.completed_at)
+            ))
+        else:
+            item: Dict[str, Any] = {
+                "title": row.title,
+                "description": row.description,
+                "status": status,
+                "created_at": _format_datetime(row.created_at) or None,
+                "completed_at": _format_datetime(row.completed_at) or None,
+            }
+            self.stream.write(("\n" if self.count == 0 else ",\n") + json.dumps(item, ensure_ascii=False))
+        self.count += 1
+
+    def close(self) -> None:
+        """Finish the file (closes the JSON array)"""
+        if self.file_format != FORMAT_CSV:
+            self.stream.write("\n]\n")
+        self.stream.flush()
@@ -0,0 +1,3 @@
+from workers.supervisor import Supervisor, update_shard_key
+
+__all__ = ['Supervisor', 'update_shard_key']
@@ -0,0 +1,226 @@
+import asyncio
+import multiprocessing
+import time
+from queue import Full
+from typing import Any, Dict, List, Optional, Tuple
+import aiohttp
+from aiogram import Bot
+from workers.worker import worker_main
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Update kinds whose payload carries the sender in "from"
+_USER_KEYS = (
+    "message", "edited_message", "callback_query", "inline_query",
+    "chosen_inline_result", "shipping_query", "pre_checkout_query",
+    "my_chat_member", "chat_member", "chat_join_request",
+)
+
+
+def update_shard_key(update: Dict[str, Any]) -> int:
+    """User id an update belongs to, used to pick its worker
+
+    Updates without a sender fall back to the chat id and finally to the
+    update id, which spreads them evenly.
+    """
+    for key in _USER_KEYS:
+        payload = update.get(key)
+        if payload is None:
+            continue
+        sender = payload.get("from")
+        if sender:
+            return sender["id"]
+        chat = payload.get("chat")
+        if chat:
+            return chat["id"]
+    return update["update_id"]
+
+
+class Supervisor:
+    """Receives updates once and dispatches them to N worker processes
+
+    Updates are partitioned by `user_id % workers`, so every update of a
+    user lands on the same worker and is handled in order there.
+
+    Workers ack every update they are done with. A crashed worker is
+    restarted on a fresh queue that first gets all of its unacked updates
+    back, in their original order, so none are lost; an update the crash
+    interrupted may be handled twice.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int,
+        allowed_updates: List[str],
+        queue_size: int = 1000,
+        stats_interval: float = 30.0,
+        poll_timeout: int = 30
+    ):
+        self.bot = bot
+        self.workers = workers
+        self.allowed_updates = allowed_updates
+        self.queue_size = queue_size
+        self.stats_interval = stats_interval
+        self.poll_timeout = poll_timeout
+        # Spawn, not fork: children must not inherit the parent's event loop
+        # or database connections
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._stats_queue = self._context.Queue()
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        # Per worker: update_id -> (user_id, update) dispatched but not acked yet
+        self._unacked: List[Dict[int, Tuple[int, Dict[str, Any]]]] = [{} for _ in range(workers)]
+        self._dispatched = [0] * workers
+        self._restarts = [0] * workers
+
+    # -- worker processes ----------------------------------------------------
+
+    def _start_worker(self, index: int):
+        process = self._context.Process(
+            target=worker_main,
+            args=(index, self._queues[index], self._stats_queue, self.stats_interval),
+            name=f"task-bot-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self._processes[index] = process
+        logger.info(f"Started worker {index} (pid {process.pid})")
+
+    def _restart_worker(self, index: int):
+        # The dead process may still hold the old queue's read lock, so the
+        # replacement gets a new queue, starting with the unacked updates
+        unacked = list(self._unacked[index].values())
+        old_queue = self._queues[index]
+        old_queue.cancel_join_thread()
+        old_queue.close()
+        queue = self._context.Queue(maxsize=max(self.queue_size, len(unacked)))
+        for item in unacked:
+            queue.put_nowait(item)
+        self._queues[index] = queue
+        if unacked:
+            logger.warning(f"Worker {index}: handing {len(unacked)} unacked updates to its replacement")
+        self._start_worker(index)
+
+    async def _watch_workers(self):
+        while True:
+            await asyncio.sleep(1)
+            for index, process in enumerate(self._processes):
+                if process is not None and not process.is_alive():
+                    self._restarts[index] += 1
+                    logger.error(
+                        f"Worker {index} (pid {process.pid}) exited with code {process.exitcode} - "
+                        f"restarting (restart #{self._restarts[index]})"
+                    )
+                    self._restart_worker(index)
+
+    async def _report_stats(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            stats = await loop.run_in_executor(None, self._stats_queue.get)
+            if stats is None:
+                return
+            index = stats["worker"]
+            if "acks" in stats:
+                unacked = self._unacked[index]
+                for update_id in stats["acks"]:
+                    unacked.pop(update_id, None)
+                continue
+            rate = stats["processed"] / self.stats_interval
+            utilisation = stats["busy_seconds"] / self.stats_interval
+            logger.info(
+                f"Worker {index}: {stats['processed']} updates ({rate:.1f}/s), "
+                f"{stats['errors']} errors, handler time {utilisation:.2f}s/s, "
+                f"queued {self._queue_depth(index)}, restarts {self._restarts[index]}"
+            )
+
+    def _queue_depth(self, index: int):
+        try:
+            return self._queues[index].qsize()
+        except NotImplementedError:  # macOS
+            return "n/a"
+
+    # -- update source -------------------------------------------------------
+
+    async def _dispatch(self, update: Dict[str, Any]):
+        user_id = update_shard_key(update)
+        index = user_id % self.workers
+        item = (user_id, update)
+        self._unacked[index][update["update_id"]] = item
+        queue = self._queues[index]
+        while True:
+            try:
+                queue.put_nowait(item)
+                break
+            except Full:
+                # Worker is behind - wait for room instead of dropping
+                await asyncio.sleep(0.05)
+                if self._queues[index] is not queue:
+                    # Restarted meanwhile; the new queue got it with the unacked ones
+                    break
+        self._dispatched[index] += 1
+
+    async def _poll(self):
+        url = self.bot.session.api.api_url(token=self.bot.token, method="getUpdates")
+        offset = None
+        timeout = aiohttp.ClientTimeout(total=self.poll_timeout + 10)
+
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            while True:
+                payload = {"timeout": self.poll_timeout, "allowed_updates": self.allowed_updates}
+                if offset is not None:
+                    payload["offset"] = offset
+                try:
+                    async with http.post(url, json=payload) as response:
+                        body = await response.json()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    logger.warning(f"getUpdates failed: {e} - retrying")
+                    await asyncio.sleep(1)
+                    continue
+
+                if not body.get("ok"):
+                    retry_after = body.get("parameters", {}).get("retry_after", 5)
+                    logger.error(f"getUpdates error: {body.get('description')} - retrying in {retry_after}s")
+                    await asyncio.sleep(retry_after)
+                    continue
+
+                for update in body["result"]:
+                    await self._dispatch(update)
+                    offset = update["update_id"] + 1
+
+    # -- lifecycle -----------------------------------------------------------
+
+    async def run(self):
+        """Run workers and poll Telegram until cancelled"""
+        for index in range(self.workers):
+            self._start_worker(index)
+
+        # getUpdates does not work while a webhook is set
+        await self.bot.delete_webhook()
+
+        watcher = asyncio.create_task(self._watch_workers())
+        reporter = asyncio.create_task(self._report_stats())
+        started = time.monotonic()
+        try:
+            await self._poll()
+        finally:
+            watcher.cancel()
+            await self._stop_workers()
+            self._stats_queue.put(None)
+            await asyncio.gather(reporter, return_exceptions=True)
+            elapsed = time.monotonic() - started
+            for index, count in enumerate(self._dispatched):
+                logger.info(f"Worker {index}: dispatched {count} updates in {elapsed:.0f}s")
+
+    async def _stop_workers(self, timeout: float = 10.0):
+        loop = asyncio.get_running_loop()
+        for queue in self._queues:
+            await loop.run_in_executor(None, queue.put, None)
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Worker {index} did not stop in {timeout}s - terminating")
+                process.terminate()
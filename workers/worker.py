@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Set
+from utils.logging_setup import setup_logging
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between acks sent to the supervisor; updates finished since the
+# last ack are handled again if the worker dies
+ACK_INTERVAL = 0.2
+
+
+class WorkerStats:
+    """Counters a worker reports to the supervisor every interval"""
+
+    def __init__(self):
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+
+    def snapshot(self, index: int) -> Dict[str, Any]:
+        snapshot = {
+            "worker": index,
+            "processed": self.processed,
+            "errors": self.errors,
+            "busy_seconds": self.busy_seconds,
+        }
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        return snapshot
+
+
+class UpdateWorker:
+    """Feeds raw updates from the supervisor into a local dispatcher
+
+    Updates are fed in the order the supervisor queued them; the
+    dispatcher's UpdateScheduler runs those of one user one after another.
+    While the scheduler's backlog is full the worker stops reading, so the
+    supervisor's queue fills up and it stops polling. Finished update ids
+    are acked back over the stats queue.
+    """
+
+    def __init__(self, index: int, updates, stats, stats_interval: float):
+        self.index = index
+        self.updates = updates
+        self.stats_queue = stats
+        self.stats_interval = stats_interval
+        self.stats = WorkerStats()
+        self._running: Set[asyncio.Task] = set()
+        self._acks: List[int] = []
+
+    async def _handle(self, bot, dp, update: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            await dp.feed_raw_update(bot, update)
+            self.stats.processed += 1
+        except Exception as e:
+            self.stats.errors += 1
+            logger.error(f"Worker {self.index} failed on update {update.get('update_id')}: {e}", exc_info=True)
+        finally:
+            self.stats.busy_seconds += time.perf_counter() - started
+            self._acks.append(update["update_id"])
+
+    def _schedule(self, bot, dp, update: Dict[str, Any], slots: asyncio.Semaphore):
+        task = asyncio.create_task(self._handle(bot, dp, update))
+        self._running.add(task)
+
+        def _forget(done: asyncio.Task):
+            self._running.discard(done)
+            slots.release()
+
+        task.add_done_callback(_forget)
+
+    async def _report_stats(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            self.stats_queue.put(self.stats.snapshot(self.index))
+
+    def _flush_acks(self):
+        if self._acks:
+            self.stats_queue.put({"worker": self.index, "acks": self._acks})
+            self._acks = []
+
+    async def _send_acks(self):
+        while True:
+            await asyncio.sleep(ACK_INTERVAL)
+            self._flush_acks()
+
+    async def run(self):
+        # Imported in the child process so every worker builds its own
+        # engine, bot session and dispatcher
+        from bot import create_bot, create_dispatcher
+        from config import (
+            METRICS_HOST, METRICS_PORT, WORKER_PROCESSES, UPDATE_CONCURRENCY, UPDATE_MAX_PENDING,
+            REMINDER_WINDOW, REMINDER_MAX_LOADED, REMINDER_BATCH_SIZE, REMINDER_SENDERS
+        )
+        from jobs import start_reminders, stop_reminders, stop_broadcasts
+        from server import start_metrics_server
+
+        metrics_server = None
+        if METRICS_PORT > 0:
+            metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT + 1 + self.index)
+
+        bot = create_bot()
+        dp = create_dispatcher()
+        await dp.emit_startup(bot=bot)
+        reporter = asyncio.create_task(self._report_stats())
+        acker = asyncio.create_task(self._send_acks())
+        if REMINDER_WINDOW > 0:
+            # Reminders of the users this worker handles updates for
+            start_reminders(
+                bot, REMINDER_WINDOW, REMINDER_MAX_LOADED, REMINDER_BATCH_SIZE, REMINDER_SENDERS,
+                shard=self.index, shards=WORKER_PROCESSES
+            )
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(UPDATE_CONCURRENCY + UPDATE_MAX_PENDING)
+        logger.info(f"Worker {self.index} ready")
+
+        try:
+            while True:
+                await slots.acquire()
+                item = await loop.run_in_executor(None, self.updates.get)
+                if item is None:
+                    break
+                _, update = item
+                self._schedule(bot, dp, update, slots)
+
+            # Drain what is already running before exiting
+            if self._running:
+                await asyncio.gather(*self._running, return_exceptions=True)
+        finally:
+            reporter.cancel()
+            acker.cancel()
+            self._flush_acks()
+            await stop_reminders()
+            await stop_broadcasts()
+            if metrics_server is not None:
+                await metrics_server.cleanup()
+            await dp.emit_shutdown(bot=bot)
+            await dp.storage.close()
+            await bot.session.close()
+            logger.info(f"Worker {self.index} stopped")
+
+
+def worker_main(index: int, updates, stats, stats_interval: float):
+    """Entry point of a worker process"""
+    setup_logging(f'%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(UpdateWorker(index, updates, stats, stats_interval).run())
+    except KeyboardInterrupt:
+        pass